@@ -0,0 +1,196 @@
+"""
+CONTROLE DE ADMISSÃO
+Decide, antes de executar uma request, se ela entra:
+- TokenBuckets: limite por cliente (token bucket); quem passa do limite
+  recebe 429 com o tempo até a próxima ficha;
+- InFlight: requests em andamento por classe de prioridade, somadas entre
+  todos os workers, para descartar leituras públicas antes que elas
+  ocupem os workers de que o painel precisa;
+- ConnectionLimit: teto de conexões longas simultâneas (long-poll, SSE)
+  no processo e por cliente;
+- queue_seconds: quanto a request esperou na fila do proxy/roteador
+  (header X-Request-Start) antes de chegar à API.
+"""
+
+import mmap
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def queue_seconds(header, now=None):
+    """Espera na fila a partir do X-Request-Start; None se não der para ler
+
+    Aceita "t=<instante>" ou só o número, em segundos (nginx $msec),
+    milissegundos (Heroku) ou microssegundos (Apache).
+    """
+    now = time.time() if now is None else now
+    value = header.strip()
+    if value.startswith('t='):
+        value = value[2:]
+    try:
+        started = float(value)
+    except ValueError:
+        return None
+    while started > now * 100:
+        started /= 1000
+    return max(0.0, now - started)
+
+
+class TokenBuckets:
+    """Um balde por cliente: rate fichas por segundo, até burst acumuladas
+
+    Guarda no máximo max_clients baldes; sai primeiro o usado há mais tempo
+    (o cliente volta com o balde cheio, como se tivesse ficado parado).
+    Os baldes são do processo: com N workers o limite vale em cada um.
+    """
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # cliente -> [fichas, instante]
+        self._lock = threading.Lock()
+
+    def take(self, client, now=None):
+        """Gasta uma ficha; retorna 0 se pode seguir ou os segundos até a próxima"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = [self.burst, now]
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / self.rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class ConnectionLimit:
+    """Conexões longas simultâneas: até total no processo, per_client por cliente
+
+    Cada conexão aceita prende uma thread do worker até terminar; o teto
+    garante que sobrem threads para as demais requests. Os contadores são
+    do processo: com N workers o limite vale em cada um.
+    """
+
+    def __init__(self, total, per_client):
+        self.total = total
+        self.per_client = per_client
+        self._clients = {}  # cliente -> conexões abertas
+        self._open = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, client):
+        """Reserva uma conexão; False se o processo ou o cliente está no teto"""
+        with self._lock:
+            opened = self._clients.get(client, 0)
+            if self._open >= self.total or opened >= self.per_client:
+                return False
+            self._clients[client] = opened + 1
+            self._open += 1
+            return True
+
+    def release(self, client):
+        with self._lock:
+            opened = self._clients.pop(client, 0) - 1
+            if opened > 0:
+                self._clients[client] = opened
+            self._open = max(0, self._open - 1)
+
+    def __len__(self):
+        return self._open
+
+
+class InFlight:
+    """Requests em andamento por classe, somadas entre os processos
+
+    A tabela fica num arquivo temporário mapeado em memória compartilhada:
+    criada antes do fork (gunicorn com preload_app), é a mesma em todos os
+    workers. Cada processo ocupa uma linha (pid + um contador por classe),
+    escreve só nela e lê a soma de todas. Quem ocupa uma linha zera as de
+    processos que morreram. Sem preload cada processo vê só as suas.
+    """
+
+    def __init__(self, classes, slots=128):
+        self.classes = tuple(classes)
+        self.slots = slots
+        self._width = len(self.classes) + 1
+        self._column = {name: i + 1 for i, name in enumerate(self.classes)}
+        size = slots * self._width * 8
+        self._file = tempfile.TemporaryFile()
+        self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._cells = memoryview(self._map).cast('q')
+        self._lock = threading.Lock()
+        self._pid = None
+        self._row = None
+
+    def enter(self, name):
+        self._add(name, 1)
+
+    def leave(self, name):
+        self._add(name, -1)
+
+    def count(self, name=None):
+        """Requests em andamento em todos os processos (na classe ou no total)"""
+        cells = self._cells
+        if name is not None:
+            return sum(cells[self._column[name]::self._width])
+        return sum(sum(cells[column::self._width]) for column in self._column.values())
+
+    def _add(self, name, amount):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._claim()
+            if self._row is not None:
+                self._cells[self._row + self._column[name]] += amount
+
+    def _claim(self):
+        """Ocupa uma linha livre para este processo (com self._lock)"""
+        self._pid = os.getpid()
+        self._row = None
+        cells, width = self._cells, self._width
+        if fcntl is not None:
+            fcntl.lockf(self._file, fcntl.LOCK_EX)  # Entre processos
+        try:
+            for row in range(0, self.slots * width, width):
+                pid = cells[row]
+                if pid and pid != self._pid and _alive(pid):
+                    continue
+                # Livre, deste processo (herdada) ou de um processo que morreu
+                for column in range(1, width):
+                    cells[row + column] = 0
+                if self._row is None:
+                    self._row = row
+                    cells[row] = self._pid
+                else:
+                    cells[row] = 0
+        finally:
+            if fcntl is not None:
+                fcntl.lockf(self._file, fcntl.LOCK_UN)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
@@ -3,25 +3,715 @@ API BACKEND FLASK - SISTEMA DE IMÓVEIS
 Sistema completo para gerenciamento de propriedades
 """
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import (Flask, request, jsonify, send_from_directory, g, make_response,
+                   Response, stream_with_context, has_request_context, abort)
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from werkzeug.datastructures import MultiDict
+from werkzeug.middleware.proxy_fix import ProxyFix
+import click
+from admission import ConnectionLimit, InFlight, TokenBuckets, queue_seconds
+from counters import WriteBehindCounters, apply_increments
+from facets import FacetIndex, popcount
+import images as image_store
+from maintenance import MaintenanceScheduler
+from metrics import Metrics, HTTP_BUCKETS, SQL_BUCKETS
+from writer import WriteQueue, WriteQueueFull, private_directory
 import sqlite3
 import json
+import atexit
+import base64
+import contextvars
+import csv
+import gzip
+import hashlib
+import html
+import io
+import math
 import os
-from datetime import datetime
+import queue
+import re
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
 import uuid
 
+try:
+    import orjson  # Opcional: encoder JSON mais rápido para o modo streaming
+except ImportError:
+    orjson = None
+
 app = Flask(__name__)
 CORS(app)  # Permite requests do frontend
 
 # Configuração do banco de dados
-DATABASE = 'properties.db'
+DATABASE = os.environ.get('DATABASE', 'properties.db')
 
-def init_db():
-    """Inicializa o banco de dados"""
-    conn = sqlite3.connect(DATABASE)
+# Configuração do SQLite (pode ser sobrescrita por variáveis de ambiente)
+app.config.update(
+    DATABASE=DATABASE,
+    SQLITE_POOL_SIZE=int(os.environ.get('SQLITE_POOL_SIZE', 8)),
+    SQLITE_JOURNAL_MODE=os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    SQLITE_SYNCHRONOUS=os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    SQLITE_MMAP_SIZE=int(os.environ.get('SQLITE_MMAP_SIZE', 64 * 1024 * 1024)),
+    SQLITE_CACHE_SIZE=int(os.environ.get('SQLITE_CACHE_SIZE', -16000)),  # negativo = KiB
+    SQLITE_BUSY_TIMEOUT=int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),  # ms
+    SQLITE_CACHED_STATEMENTS=int(os.environ.get('SQLITE_CACHED_STATEMENTS', 256)),
+    # Por quanto tempo (s) cada worker reaproveita a versão do catálogo lida
+    # do banco antes de consultá-la de novo para responder 304
+    CATALOG_VERSION_TTL=float(os.environ.get('CATALOG_VERSION_TTL', 1.0)),
+    # Token das rotas /admin (header X-Admin-Token); vazio = sem verificação
+    ADMIN_TOKEN=os.environ.get('ADMIN_TOKEN', ''),
+    # Linhas por transação na importação em lote
+    IMPORT_CHUNK_SIZE=int(os.environ.get('IMPORT_CHUNK_SIZE', 500)),
+    # Fila de escritas (group commit): profundidade máxima, escritas por
+    # transação, janela (ms) para juntar escritas num lote e quanto tempo
+    # (s) uma request espera por vaga antes de receber 503
+    WRITE_QUEUE_DEPTH=int(os.environ.get('WRITE_QUEUE_DEPTH', 256)),
+    WRITE_BATCH_MAX=int(os.environ.get('WRITE_BATCH_MAX', 64)),
+    WRITE_BATCH_WINDOW_MS=float(os.environ.get('WRITE_BATCH_WINDOW_MS', 2)),
+    WRITE_QUEUE_TIMEOUT=float(os.environ.get('WRITE_QUEUE_TIMEOUT', 5)),
+    # Socket Unix pelo qual os workers entregam escritas ao escritor eleito
+    # (vazio = pasta privada <banco>-writer, um por processo mestre; "off" =
+    # cada worker grava com sua própria thread)
+    WRITE_QUEUE_SOCKET=os.environ.get('WRITE_QUEUE_SOCKET', ''),
+    # PID do processo mestre, informado aos workers pelo servidor
+    # (gunicorn.conf.py, async_server.py); 0 = o próprio processo
+    SERVER_PID=0,
+    # Aquecimento de caches no create_app() e de conexões em cada worker
+    WARMUP=os.environ.get('WARMUP', '1') not in ('0', 'false'),
+    # Controle de admissão das rotas públicas: fichas por segundo e rajada
+    # de cada cliente (0 = sem limite; vale em cada worker) e quantos
+    # proxies confiáveis ficam à frente da API para achar o IP do cliente
+    # no X-Forwarded-For (0 = IP da conexão; 1 = roteador do Heroku/Render
+    # ou nginx, ligado pelo gunicorn.conf.py). Sem proxy de verdade à
+    # frente, o cliente escolhe o próprio X-Forwarded-For e escaparia do limite
+    RATE_LIMIT_RPS=float(os.environ.get('RATE_LIMIT_RPS', 20)),
+    RATE_LIMIT_BURST=int(os.environ.get('RATE_LIMIT_BURST', 60)),
+    TRUSTED_PROXIES=int(os.environ.get('TRUSTED_PROXIES', 0)),
+    # Descarte de carga: requests simultâneas que a API aguenta somando os
+    # workers (0 = informado pelo servidor: workers x threads), fração que
+    # as rotas públicas podem ocupar (o resto fica reservado ao painel;
+    # 1 = desliga), espera máxima (ms) na fila do proxy (X-Request-Start;
+    # 0 = desliga) e o Retry-After (s) das requests descartadas
+    SHED_CAPACITY=int(os.environ.get('SHED_CAPACITY', 0)),
+    SHED_PUBLIC_SHARE=float(os.environ.get('SHED_PUBLIC_SHARE', 0.75)),
+    SHED_QUEUE_MS=float(os.environ.get('SHED_QUEUE_MS', 250)),
+    SHED_RETRY_AFTER=int(os.environ.get('SHED_RETRY_AFTER', 2)),
+    # Máximo de operações aceitas em um POST /batch
+    BATCH_MAX_OPERATIONS=int(os.environ.get('BATCH_MAX_OPERATIONS', 500)),
+    # Feed de mudanças: por quanto tempo guardar exclusões e de quanto em
+    # quanto tempo (s) cada worker compacta o log
+    CHANGES_RETENTION_DAYS=float(os.environ.get('CHANGES_RETENTION_DAYS', 30)),
+    CHANGES_COMPACT_INTERVAL=float(os.environ.get('CHANGES_COMPACT_INTERVAL', 300)),
+    # Tempo máximo (s) de espera do long-poll e de uma conexão SSE. Exigem
+    # workers com threads (gthread, o padrão do gunicorn.conf.py): com
+    # workers síncronos o post_fork limita os dois ao timeout do gunicorn
+    CHANGES_MAX_WAIT=float(os.environ.get('CHANGES_MAX_WAIT', 25)),
+    CHANGES_STREAM_DURATION=float(os.environ.get('CHANGES_STREAM_DURATION', 300)),
+    # Conexões simultâneas de long-poll/SSE em cada worker (cada uma prende
+    # uma thread; o gunicorn.conf.py limita à metade das threads) e de um
+    # mesmo cliente; acima disso a resposta é 503
+    CHANGES_MAX_CONNECTIONS=int(os.environ.get('CHANGES_MAX_CONNECTIONS', 4)),
+    CHANGES_MAX_PER_CLIENT=int(os.environ.get('CHANGES_MAX_PER_CLIENT', 2)),
+    # Manutenção em segundo plano (feita por um único worker): de quanto em
+    # quanto tempo (s) procurar tarefas vencidas, intervalo (s) de cada
+    # tarefa (0 = só pelo comando "flask maintenance"), linhas
+    # lidas por índice no ANALYZE por amostragem do "optimize", pasta e
+    # quantidade de backups guardados, páginas copiadas por passo do backup
+    # e pausa (ms) entre os passos
+    MAINTENANCE_CHECK_INTERVAL=float(os.environ.get('MAINTENANCE_CHECK_INTERVAL', 30)),
+    MAINTENANCE_CHECKPOINT_INTERVAL=float(os.environ.get('MAINTENANCE_CHECKPOINT_INTERVAL', 300)),
+    MAINTENANCE_OPTIMIZE_INTERVAL=float(os.environ.get('MAINTENANCE_OPTIMIZE_INTERVAL', 3600)),
+    MAINTENANCE_ANALYZE_INTERVAL=float(os.environ.get('MAINTENANCE_ANALYZE_INTERVAL', 7 * 86400)),
+    MAINTENANCE_BACKUP_INTERVAL=float(os.environ.get('MAINTENANCE_BACKUP_INTERVAL', 86400)),
+    MAINTENANCE_ANALYSIS_LIMIT=int(os.environ.get('MAINTENANCE_ANALYSIS_LIMIT', 1000)),
+    # Espera máxima (ms) do checkpoint TRUNCATE por leitores e pelo lock de
+    # escrita; enquanto ele espera, o escritor da fila também espera
+    MAINTENANCE_CHECKPOINT_BUSY_MS=int(os.environ.get('MAINTENANCE_CHECKPOINT_BUSY_MS', 100)),
+    BACKUP_DIR=os.environ.get('BACKUP_DIR', 'backups'),
+    BACKUP_KEEP=int(os.environ.get('BACKUP_KEEP', 7)),
+    BACKUP_STEP_PAGES=int(os.environ.get('BACKUP_STEP_PAGES', 256)),
+    BACKUP_STEP_SLEEP_MS=float(os.environ.get('BACKUP_STEP_SLEEP_MS', 5)),
+    # Contadores de views/leads: gravação em lote a cada N ms ou M eventos
+    COUNTER_FLUSH_INTERVAL_MS=int(os.environ.get('COUNTER_FLUSH_INTERVAL_MS', 2000)),
+    COUNTER_FLUSH_EVENTS=int(os.environ.get('COUNTER_FLUSH_EVENTS', 500)),
+    # Imagens enviadas (gravadas pelo hash do conteúdo)
+    UPLOAD_FOLDER=os.environ.get('UPLOAD_FOLDER', 'uploads'),
+    MAX_IMAGE_SIZE=int(os.environ.get('MAX_IMAGE_SIZE', 5 * 1024 * 1024)),
+    # URL pública da API usada nos links das imagens; vazio = host da request
+    PUBLIC_URL=os.environ.get('PUBLIC_URL', ''),
+    # Compressão gzip das respostas (bytes mínimos e nível do zlib)
+    COMPRESS_MIN_SIZE=int(os.environ.get('COMPRESS_MIN_SIZE', 1024)),
+    COMPRESS_LEVEL=int(os.environ.get('COMPRESS_LEVEL', 6)),
+    # Métricas em /metrics: pasta compartilhada pelos workers (vazio = pasta
+    # temporária por processo mestre), intervalo (s) entre gravações dos
+    # números de cada worker e a cada quantas instruções da VM do SQLite
+    # o progress handler é chamado (0 = desligado)
+    METRICS_ENABLED=os.environ.get('METRICS_ENABLED', '1') not in ('0', 'false'),
+    METRICS_DIR=os.environ.get('METRICS_DIR', ''),
+    METRICS_FLUSH_INTERVAL=float(os.environ.get('METRICS_FLUSH_INTERVAL', 1.0)),
+    SQL_PROGRESS_STEPS=int(os.environ.get('SQL_PROGRESS_STEPS', 1000)),
+)
+
+def connect_db(instrumented=None):
+    """Abre uma nova conexão com os PRAGMAs de desempenho configurados
+
+    instrumented=False dispensa as métricas (ex.: no processo mestre,
+    antes do fork, onde nenhuma thread deve ser iniciada).
+    """
+    config = app.config
+    if instrumented is None:
+        instrumented = config['METRICS_ENABLED']
+    conn = sqlite3.connect(
+        config['DATABASE'],
+        timeout=config['SQLITE_BUSY_TIMEOUT'] / 1000,
+        cached_statements=config['SQLITE_CACHED_STATEMENTS'],
+        check_same_thread=False,  # A conexão circula entre threads pelo pool
+        factory=InstrumentedConnection if instrumented else sqlite3.Connection
+    )
+    conn.row_factory = sqlite3.Row  # Permite acessar por nome da coluna
+    conn.create_function('distance_km', 4, distance_km, deterministic=True)
+    conn.create_function('highlight_snippet', 1, highlight_snippet, deterministic=True)
+    if instrumented:
+        instrument_connection(conn)
+
+    if config['SQLITE_JOURNAL_MODE']:
+        conn.execute(f"PRAGMA journal_mode = {config['SQLITE_JOURNAL_MODE']}")
+    if config['SQLITE_SYNCHRONOUS']:
+        conn.execute(f"PRAGMA synchronous = {config['SQLITE_SYNCHRONOUS']}")
+    conn.execute(f"PRAGMA busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT'])}")
+    conn.execute(f"PRAGMA mmap_size = {int(config['SQLITE_MMAP_SIZE'])}")
+    conn.execute(f"PRAGMA cache_size = {int(config['SQLITE_CACHE_SIZE'])}")
+    return conn
+
+class ConnectionPool:
+    """Pool de conexões SQLite por processo (worker do gunicorn)
+
+    Cada request pega uma conexão ociosa (ou abre uma nova) e a devolve no
+    teardown. Após um fork o pool detecta o novo PID e descarta as conexões
+    herdadas do processo pai, que não podem ser compartilhadas.
+    """
+
+    def __init__(self, max_idle):
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue(maxsize=self.max_idle)
+
+    def acquire(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return connect_db()
+
+    def release(self, conn):
+        # Transações esquecidas abertas (ex.: retorno antecipado) são desfeitas
+        if conn.in_transaction:
+            conn.rollback()
+        if self._pid != os.getpid():
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+_pool = ConnectionPool(app.config['SQLITE_POOL_SIZE'])
+atexit.register(_pool.close_all)
+
+def _stats_upsert(dimension, key, delta, amount='0'):
+    """Trecho de trigger que soma delta/amount em stats_counters"""
+    return f'''
+            INSERT INTO stats_counters (dimension, key, count, amount)
+            VALUES ('{dimension}', COALESCE({key}, ''), {delta}, {amount})
+            ON CONFLICT (dimension, key) DO UPDATE SET
+                count = count + excluded.count,
+                amount = amount + excluded.amount;'''
+
+STATS_TRIGGERS = [
+    f'''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_property_insert
+        AFTER INSERT ON properties
+        BEGIN{_stats_upsert('total', "'all'", 1)}{_stats_upsert('category', 'NEW.category', 1)}{_stats_upsert('status', 'NEW.status', 1)}
+        END
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_property_delete
+        AFTER DELETE ON properties
+        BEGIN{_stats_upsert('total', "'all'", -1)}{_stats_upsert('category', 'OLD.category', -1)}{_stats_upsert('status', 'OLD.status', -1)}
+        END
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_property_category
+        AFTER UPDATE OF category ON properties
+        WHEN OLD.category IS NOT NEW.category
+        BEGIN{_stats_upsert('category', 'OLD.category', -1)}{_stats_upsert('category', 'NEW.category', 1)}
+        END
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_property_status
+        AFTER UPDATE OF status ON properties
+        WHEN OLD.status IS NOT NEW.status
+        BEGIN{_stats_upsert('status', 'OLD.status', -1)}{_stats_upsert('status', 'NEW.status', 1)}
+        END
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_sale_insert
+        AFTER INSERT ON sales
+        BEGIN{_stats_upsert('sales', "'all'", 1, 'NEW.sale_price')}
+        END
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_sale_delete
+        AFTER DELETE ON sales
+        BEGIN{_stats_upsert('sales', "'all'", -1, '-OLD.sale_price')}
+        END
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_sale_price
+        AFTER UPDATE OF sale_price ON sales
+        BEGIN{_stats_upsert('sales', "'all'", 0, 'NEW.sale_price - OLD.sale_price')}
+        END
+    ''',
+]
+
+def count_stats(conn):
+    """Recontagem completa (varre properties e sales)"""
     cursor = conn.cursor()
     
+    cursor.execute('SELECT COUNT(*) FROM properties')
+    total_properties = cursor.fetchone()[0]
+    
+    cursor.execute('''
+        SELECT COALESCE(category, ''), COUNT(*) FROM properties GROUP BY 1
+    ''')
+    by_category = dict(cursor.fetchall())
+    
+    cursor.execute('''
+        SELECT COALESCE(status, ''), COUNT(*) FROM properties GROUP BY 1
+    ''')
+    by_status = dict(cursor.fetchall())
+    
+    cursor.execute('SELECT COUNT(*), SUM(sale_price) FROM sales')
+    sales_data = cursor.fetchone()
+    
+    return {
+        'total_properties': total_properties,
+        'total_sales': sales_data[0] or 0,
+        'total_revenue': sales_data[1] or 0,
+        'by_category': by_category,
+        'by_status': by_status
+    }
+
+def read_stats(conn):
+    """Lê as estatísticas já agregadas em stats_counters"""
+    stats = {
+        'total_properties': 0,
+        'total_sales': 0,
+        'total_revenue': 0,
+        'by_category': {},
+        'by_status': {}
+    }
+    rows = conn.execute(
+        'SELECT dimension, key, count, amount FROM stats_counters WHERE count != 0'
+    )
+    for dimension, key, count, amount in rows:
+        if dimension == 'total':
+            stats['total_properties'] = count
+        elif dimension == 'sales':
+            stats['total_sales'] = count
+            stats['total_revenue'] = amount
+        else:
+            stats[f'by_{dimension}'][key] = count
+    return stats
+
+def rebuild_stats(conn):
+    """Recalcula stats_counters do zero (não faz commit)"""
+    conn.execute('DELETE FROM stats_counters')
+    conn.execute('''
+        INSERT INTO stats_counters (dimension, key, count)
+        SELECT 'total', 'all', COUNT(*) FROM properties
+    ''')
+    for column in ('category', 'status'):
+        conn.execute(f'''
+            INSERT INTO stats_counters (dimension, key, count)
+            SELECT '{column}', COALESCE({column}, ''), COUNT(*)
+            FROM properties GROUP BY 2
+        ''')
+    conn.execute('''
+        INSERT INTO stats_counters (dimension, key, count, amount)
+        SELECT 'sales', 'all', COUNT(*), COALESCE(SUM(sale_price), 0) FROM sales
+    ''')
+
+# Vendas agregadas por período e categoria do imóvel (sales_rollups),
+# mantidas por triggers: um gráfico de um ano por mês lê ~12 linhas por
+# categoria em vez de varrer sales. Os buckets são em UTC, como o
+# CURRENT_TIMESTAMP de sale_date, e cada um é identificado pela data de
+# início (a semana começa na segunda-feira).
+SALES_PERIODS = {
+    'day': "date({0})",
+    'week': "date({0}, 'weekday 0', '-6 days')",
+    'month': "strftime('%Y-%m-01', {0})",
+}
+
+def _sales_rollup_upsert(sale, category, sign, source='WHERE 1'):
+    """Trecho de trigger que soma (sign=1) ou tira (sign=-1) vendas dos rollups"""
+    return ''.join(f'''
+            INSERT INTO sales_rollups (period, bucket, category, count, revenue, commission)
+            SELECT '{period}', COALESCE({expr.format(sale + '.sale_date')}, ''),
+                   COALESCE({category}, ''), {sign},
+                   {sign} * COALESCE({sale}.sale_price, 0), {sign} * COALESCE({sale}.commission, 0)
+            {source}
+            ON CONFLICT (period, bucket, category) DO UPDATE SET
+                count = count + excluded.count,
+                revenue = revenue + excluded.revenue,
+                commission = commission + excluded.commission;''' for period, expr in SALES_PERIODS.items())
+
+# Categoria atual do imóvel da venda. Quando o imóvel muda de categoria
+# ou é excluído, as vendas dele migram junto, para que os rollups sempre
+# batam com uma recontagem (rebuild_sales_rollups).
+_SALE_CATEGORY = '(SELECT category FROM properties WHERE id = {0}.property_id)'
+_PROPERTY_SALES = 'FROM sales AS s WHERE s.property_id = OLD.id'
+
+SALES_ROLLUP_TRIGGERS = [
+    f'''
+        CREATE TRIGGER IF NOT EXISTS trg_sales_rollup_insert
+        AFTER INSERT ON sales
+        BEGIN{_sales_rollup_upsert('NEW', _SALE_CATEGORY.format('NEW'), 1)}
+        END
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS trg_sales_rollup_delete
+        AFTER DELETE ON sales
+        BEGIN{_sales_rollup_upsert('OLD', _SALE_CATEGORY.format('OLD'), -1)}
+        END
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS trg_sales_rollup_update
+        AFTER UPDATE OF sale_price, commission, sale_date, property_id ON sales
+        BEGIN{_sales_rollup_upsert('OLD', _SALE_CATEGORY.format('OLD'), -1)}{_sales_rollup_upsert('NEW', _SALE_CATEGORY.format('NEW'), 1)}
+        END
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS trg_sales_rollup_property_category
+        AFTER UPDATE OF category ON properties
+        WHEN OLD.category IS NOT NEW.category
+        BEGIN{_sales_rollup_upsert('s', 'OLD.category', -1, _PROPERTY_SALES)}{_sales_rollup_upsert('s', 'NEW.category', 1, _PROPERTY_SALES)}
+        END
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS trg_sales_rollup_property_delete
+        AFTER DELETE ON properties
+        BEGIN{_sales_rollup_upsert('s', 'OLD.category', -1, _PROPERTY_SALES)}{_sales_rollup_upsert('s', 'NULL', 1, _PROPERTY_SALES)}
+        END
+    ''',
+]
+
+def create_sales_rollups(conn):
+    """Cria sales_rollups e os triggers; preenche a tabela se for nova"""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'sales_rollups'"
+    ).fetchone()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sales_rollups (
+            period TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            category TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            commission REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (period, bucket, category)
+        ) WITHOUT ROWID
+    ''')
+    for trigger in SALES_ROLLUP_TRIGGERS:
+        conn.execute(trigger)
+    if not exists:
+        rebuild_sales_rollups(conn)
+
+def rebuild_sales_rollups(conn):
+    """Recalcula sales_rollups do zero a partir de sales (não faz commit)"""
+    conn.execute('DELETE FROM sales_rollups')
+    for period, expr in SALES_PERIODS.items():
+        conn.execute(f'''
+            INSERT INTO sales_rollups (period, bucket, category, count, revenue, commission)
+            SELECT '{period}', COALESCE({expr.format('s.sale_date')}, ''),
+                   COALESCE(p.category, ''), COUNT(*),
+                   COALESCE(SUM(s.sale_price), 0), COALESCE(SUM(s.commission), 0)
+            FROM sales AS s LEFT JOIN properties AS p ON p.id = s.property_id
+            GROUP BY 2, 3
+        ''')
+
+# Índice FTS5 com conteúdo externo (lê as colunas da própria properties).
+# unicode61 + remove_diacritics faz "maceio" casar com "Maceió".
+# Obs.: um VACUUM pode renumerar o rowid de properties; depois dele rode
+# INSERT INTO properties_fts(properties_fts) VALUES ('rebuild').
+FTS_COLUMNS = ('title', 'description', 'location', 'features')
+
+def create_fts(conn):
+    """Cria a tabela FTS5 e os triggers que a mantêm sincronizada"""
+    columns = ', '.join(FTS_COLUMNS)
+    new_values = ', '.join(f'NEW.{c}' for c in FTS_COLUMNS)
+    old_values = ', '.join(f'OLD.{c}' for c in FTS_COLUMNS)
+    
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'properties_fts'"
+    ).fetchone()
+    
+    conn.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS properties_fts USING fts5(
+            {columns},
+            content='properties',
+            content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_fts_property_insert
+        AFTER INSERT ON properties
+        BEGIN
+            INSERT INTO properties_fts (rowid, {columns})
+            VALUES (NEW.rowid, {new_values});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_fts_property_delete
+        AFTER DELETE ON properties
+        BEGIN
+            INSERT INTO properties_fts (properties_fts, rowid, {columns})
+            VALUES ('delete', OLD.rowid, {old_values});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_fts_property_update
+        AFTER UPDATE OF {columns} ON properties
+        BEGIN
+            INSERT INTO properties_fts (properties_fts, rowid, {columns})
+            VALUES ('delete', OLD.rowid, {old_values});
+            INSERT INTO properties_fts (rowid, {columns})
+            VALUES (NEW.rowid, {new_values});
+        END
+    ''')
+    
+    if not exists:
+        # Indexa os imóveis que já existiam antes da tabela FTS
+        conn.execute("INSERT INTO properties_fts (properties_fts) VALUES ('rebuild')")
+
+_fts_available = None
+
+def fts_available(conn):
+    """Indica (com cache por processo) se a tabela FTS5 existe"""
+    global _fts_available
+    if _fts_available is None:
+        _fts_available = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'properties_fts'"
+        ).fetchone() is not None
+    return _fts_available
+
+def build_fts_query(text):
+    """Converte o texto digitado em uma expressão MATCH segura
+
+    Cada palavra vira um termo entre aspas (todas obrigatórias) e a última
+    aceita prefixo, para a busca funcionar enquanto o usuário digita.
+    """
+    words = [w.replace('"', '') for w in text.split()]
+    words = [w for w in words if w]
+    if not words:
+        return None
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+# O snippet() do FTS5 marca os trechos encontrados com caracteres de
+# controle; highlight_snippet (função SQL) escapa o texto do imóvel e só
+# então troca as marcas por <mark>, para o cliente poder usar innerHTML
+SNIPPET_OPEN, SNIPPET_CLOSE = '\x02', '\x03'
+
+def highlight_snippet(text):
+    """Trecho da busca em HTML seguro: texto escapado + <mark> nos termos"""
+    if text is None:
+        return None
+    return (html.escape(text)
+            .replace(SNIPPET_OPEN, '<mark>')
+            .replace(SNIPPET_CLOSE, '</mark>'))
+
+# Índice espacial R*Tree das coordenadas (id = rowid de properties). Cada
+# imóvel é um "retângulo" de um ponto só; imóveis sem latitude/longitude
+# ficam fora do índice.
+GEO_TRIGGER_INSERT = '''
+            INSERT INTO properties_geo (id, min_lat, max_lat, min_lon, max_lon)
+            SELECT NEW.rowid, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude
+            WHERE NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL;'''
+
+def create_geo_index(conn):
+    """Cria a tabela R*Tree e os triggers que a mantêm sincronizada"""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'properties_geo'"
+    ).fetchone()
+    
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS properties_geo USING rtree(
+            id, min_lat, max_lat, min_lon, max_lon
+        )
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_geo_insert
+        AFTER INSERT ON properties
+        BEGIN{GEO_TRIGGER_INSERT}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_geo_update
+        AFTER UPDATE OF latitude, longitude ON properties
+        BEGIN
+            DELETE FROM properties_geo WHERE id = OLD.rowid;{GEO_TRIGGER_INSERT}
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_geo_delete
+        AFTER DELETE ON properties
+        BEGIN
+            DELETE FROM properties_geo WHERE id = OLD.rowid;
+        END
+    ''')
+    
+    if not exists:
+        conn.execute('''
+            INSERT INTO properties_geo (id, min_lat, max_lat, min_lon, max_lon)
+            SELECT rowid, latitude, latitude, longitude, longitude FROM properties
+            WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+        ''')
+
+_geo_available = None
+
+def geo_available(conn):
+    """Indica (com cache por processo) se a tabela R*Tree existe"""
+    global _geo_available
+    if _geo_available is None:
+        _geo_available = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'properties_geo'"
+        ).fetchone() is not None
+    return _geo_available
+
+EARTH_RADIUS_KM = 6371.0088
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """Distância em km pela fórmula de haversine (função SQL distance_km)"""
+    if None in (lat1, lon1, lat2, lon2):
+        return None
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def radius_box(lat, lon, radius_km):
+    """Retângulo (min_lat, max_lat, min_lon, max_lon) que contém o círculo"""
+    delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    # Perto dos polos o círculo cobre todas as longitudes
+    cos_lat = math.cos(math.radians(lat))
+    delta_lon = math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)) if cos_lat > 1e-6 else 180
+    return lat - delta_lat, lat + delta_lat, lon - delta_lon, lon + delta_lon
+
+# Colunas cuja alteração gera evento no feed (views/leads ficam de fora)
+CHANGE_TRACKED_COLUMNS = (
+    'title', 'price', 'location', 'category', 'status', 'bedrooms',
+    'bathrooms', 'area', 'type', 'description', 'features', 'images',
+    'latitude', 'longitude'
+)
+
+def _change_event(op, ref):
+    """Trecho de trigger: registra o evento e descarta os anteriores do imóvel"""
+    return f'''
+            DELETE FROM property_changes WHERE property_id = {ref}.id;
+            INSERT INTO property_changes (property_id, op, changed_at)
+            VALUES ({ref}.id, '{op}', (julianday('now') - 2440587.5) * 86400.0);'''
+
+def create_change_log(conn):
+    """Cria o log de mudanças e os triggers que o alimentam
+
+    version é monotônica (AUTOINCREMENT). Só o último evento de cada imóvel
+    é mantido: quem pede ?since=v recebe o estado final de tudo que mudou
+    depois de v, sem o histórico intermediário.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS property_changes (
+            version INTEGER PRIMARY KEY AUTOINCREMENT,
+            property_id TEXT NOT NULL,
+            op TEXT NOT NULL,
+            changed_at REAL NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_property_changes_property
+        ON property_changes (property_id)
+    ''')
+    # Até onde o log já foi compactado: clientes com since abaixo disso
+    # precisam recarregar tudo
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS change_log_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            compacted_through INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO change_log_state (id) VALUES (1)')
+    
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_changes_property_insert
+        AFTER INSERT ON properties
+        BEGIN{_change_event('insert', 'NEW')}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_changes_property_update
+        AFTER UPDATE OF {', '.join(CHANGE_TRACKED_COLUMNS)} ON properties
+        BEGIN{_change_event('update', 'NEW')}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_changes_property_delete
+        AFTER DELETE ON properties
+        BEGIN{_change_event('delete', 'OLD')}
+        END
+    ''')
+
+def compact_changes(conn):
+    """Remove exclusões mais antigas que o período de retenção"""
+    cutoff = time.time() - app.config['CHANGES_RETENTION_DAYS'] * 86400
+    row = conn.execute('''
+        SELECT MAX(version) FROM property_changes
+        WHERE op = 'delete' AND changed_at < ?
+    ''', (cutoff,)).fetchone()
+    if row[0] is None:
+        return 0
+    conn.execute('''
+        UPDATE change_log_state SET compacted_through = MAX(compacted_through, ?)
+        WHERE id = 1
+    ''', (row[0],))
+    return conn.execute('''
+        DELETE FROM property_changes WHERE op = 'delete' AND version <= ?
+    ''', (row[0],)).rowcount
+
+# ==================== MIGRAÇÕES ====================
+
+def _migrate_base_schema(conn):
+    """Esquema base; também adota bancos criados antes do versionamento"""
+    cursor = conn.cursor()
     # Tabela de propriedades
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS properties (
@@ -40,10 +730,20 @@ def init_db():
             images TEXT,
             date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             views INTEGER DEFAULT 0,
-            leads INTEGER DEFAULT 0
+            leads INTEGER DEFAULT 0,
+            latitude REAL,
+            longitude REAL
         )
     ''')
     
+    # Bancos criados antes das coordenadas: adiciona as colunas e recria o
+    # trigger do feed de mudanças, que passa a observá-las também
+    existing = {row[1] for row in cursor.execute('PRAGMA table_info(properties)')}
+    for column in ('latitude', 'longitude'):
+        if column not in existing:
+            cursor.execute(f'ALTER TABLE properties ADD COLUMN {column} REAL')
+            cursor.execute('DROP TRIGGER IF EXISTS trg_changes_property_update')
+    
     # Tabela de vendas
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS sales (
@@ -57,75 +757,1723 @@ def init_db():
         )
     ''')
     
-    conn.commit()
-    conn.close()
+    # Índices compostos usados pelos filtros de GET /properties. Todos
+    # terminam em id para servir a paginação por keyset (coluna, id).
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_properties_date
+        ON properties (date_added, id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_properties_category_date
+        ON properties (category, date_added, id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_properties_category_status_date
+        ON properties (category, status, date_added, id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_properties_category_price
+        ON properties (category, price, id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_properties_status_date
+        ON properties (status, date_added, id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sales_date
+        ON sales (sale_date)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sales_property
+        ON sales (property_id)
+    ''')
+    
+    # Busca textual (FTS5) sobre title, description, location e features
+    try:
+        create_fts(conn)
+    except sqlite3.OperationalError as e:
+        print(f"⚠️  FTS5 indisponível, busca textual desativada: {e}")
+    
+    # Índice espacial (R*Tree) para near=/bbox= em GET /properties
+    try:
+        create_geo_index(conn)
+    except sqlite3.OperationalError as e:
+        print(f"⚠️  R*Tree indisponível, busca por localização desativada: {e}")
+    
+    # Estatísticas mantidas por triggers: /stats vira uma leitura direta.
+    # dimension: 'total' | 'category' | 'status' | 'sales'
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats_counters (
+            dimension TEXT NOT NULL,
+            key TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            amount REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, key)
+        ) WITHOUT ROWID
+    ''')
+    for trigger in STATS_TRIGGERS:
+        cursor.execute(trigger)
+    rebuild_stats(conn)
+    
+    # Séries de vendas por dia/semana/mês (GET /analytics/sales)
+    create_sales_rollups(conn)
+    
+    # Feed de mudanças (GET /changes), também mantido por triggers
+    create_change_log(conn)
+    
+    # Versão do catálogo (uma linha só), incrementada a cada escrita.
+    # Base dos ETags / Last-Modified das rotas de leitura.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at REAL NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        INSERT OR IGNORE INTO catalog_version (id, version, updated_at)
+        VALUES (1, 0, ?)
+    ''', (time.time(),))
+
+# Migrações em ordem: (versão, descrição, função(conn)). A versão aplicada
+# fica em PRAGMA user_version; nunca altere uma migração já publicada,
+# acrescente outra no fim.
+def _migrate_maintenance_runs(conn):
+    """Histórico das tarefas de manutenção (maintenance.py)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS maintenance_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task TEXT NOT NULL,
+            started_at REAL NOT NULL,
+            duration_ms REAL NOT NULL,
+            ok INTEGER NOT NULL,
+            details TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_maintenance_runs_task
+        ON maintenance_runs (task, started_at)
+    ''')
+
+def _migrate_counters_version(conn):
+    """Versão própria dos contadores de views/leads
+
+    Os lotes de contadores não sobem a versão do catálogo (invalidariam os
+    ETags de /stats e relatórios a cada poucos segundos); sobem esta, que
+    só entra no ETag de GET /properties.
+    """
+    conn.execute('ALTER TABLE catalog_version ADD COLUMN counters_version INTEGER NOT NULL DEFAULT 0')
+    conn.execute('ALTER TABLE catalog_version ADD COLUMN counters_updated_at REAL NOT NULL DEFAULT 0')
+
+MIGRATIONS = (
+    (1, 'esquema base (imóveis, vendas, busca, mapa, estatísticas, feed)', _migrate_base_schema),
+    (2, 'histórico da manutenção', _migrate_maintenance_runs),
+    (3, 'versão dos contadores', _migrate_counters_version),
+)
+
+def schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate_db(conn):
+    """Aplica as migrações pendentes; retorna as versões aplicadas
+
+    Cada migração roda numa transação BEGIN IMMEDIATE junto com a troca do
+    user_version: ou entra inteira ou não entra. Se vários processos
+    sobem ao mesmo tempo, o primeiro aplica e os outros, ao conseguirem o
+    lock, veem a versão nova e pulam.
+    """
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        if schema_version(conn) >= version:
+            continue
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            migrate(conn)
+            conn.execute(f'PRAGMA user_version = {int(version)}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"✅ Migração {version} aplicada: {description}")
+        applied.append(version)
+    return applied
+
+def init_db():
+    """Inicializa o banco de dados (aplica as migrações pendentes)"""
+    conn = connect_db(instrumented=False)
+    try:
+        migrate_db(conn)
+    finally:
+        conn.close()
     print("✅ Banco de dados inicializado")
 
 def get_db():
-    """Conecta ao banco de dados"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row  # Permite acessar por nome da coluna
-    return conn
+    """Retorna a conexão do pool vinculada ao contexto atual da aplicação"""
+    if 'db' not in g:
+        if app.config['SQLITE_POOL_SIZE'] > 0:
+            g.db = _pool.acquire()
+        else:
+            g.db = connect_db()
+    return g.db
+
+@app.teardown_appcontext
+def release_db(exception):
+    """Devolve a conexão ao pool ao final de cada request"""
+    conn = g.pop('db', None)
+    if conn is None:
+        return
+    if app.config['SQLITE_POOL_SIZE'] > 0:
+        _pool.release(conn)
+    else:
+        conn.close()
+
+# Cache da versão do catálogo neste worker:
+# ((versão, updated_at), (versão dos contadores, updated_at), lido_em)
+_catalog_version = None
+
+def read_versions():
+    """Versões do catálogo e dos contadores, com cache curto por worker"""
+    global _catalog_version
+    cached = _catalog_version
+    now = time.monotonic()
+    if cached and now - cached[2] < app.config['CATALOG_VERSION_TTL']:
+        return cached[0], cached[1]
+    
+    row = get_db().execute('''
+        SELECT version, updated_at, counters_version, counters_updated_at
+        FROM catalog_version WHERE id = 1
+    ''').fetchone()
+    row = tuple(row) if row else (0, 0.0, 0, 0.0)
+    _catalog_version = (row[:2], row[2:], now)
+    return row[:2], row[2:]
+
+def get_catalog_version():
+    """Retorna (versão, updated_at) do catálogo"""
+    return read_versions()[0]
+
+def get_counters_version():
+    """Retorna (versão, updated_at) dos contadores de views/leads"""
+    return read_versions()[1]
+
+def forget_catalog_version():
+    """Descarta a versão do catálogo em cache neste worker
+
+    Chamado depois de cada escrita enviada à fila: se o commit foi feito
+    por outro worker (o escritor), o cache daqui ainda teria a versão
+    antiga e responderia 304 até o fim do CATALOG_VERSION_TTL.
+    """
+    global _catalog_version
+    _catalog_version = None
+
+# Última compactação do feed de mudanças feita por este worker
+_last_changes_compaction = 0.0
+
+def bump_catalog_version(conn):
+    """Incrementa a versão do catálogo dentro da transação de escrita
+
+    Aproveita a transação para compactar o feed de mudanças de tempos em
+    tempos (CHANGES_COMPACT_INTERVAL).
+    """
+    global _catalog_version, _last_changes_compaction
+    conn.execute('''
+        UPDATE catalog_version SET version = version + 1, updated_at = ?
+        WHERE id = 1
+    ''', (time.time(),))
+    _catalog_version = None
+    
+    now = time.monotonic()
+    if now - _last_changes_compaction >= app.config['CHANGES_COMPACT_INTERVAL']:
+        _last_changes_compaction = now
+        compact_changes(conn)
+
+def conditional_get(cache_control, counters=False):
+    """Responde 304 quando o cliente já tem a versão atual do catálogo
+
+    O ETag combina a versão do catálogo com a URL (filtros/paginação), e o
+    Last-Modified é o horário da última escrita. Com counters=True (rotas
+    que mostram views/leads) entram também a versão e o horário do último
+    lote de contadores. Se o cliente envia um
+    If-None-Match ou If-Modified-Since ainda válido, a view nem é executada.
+    O Last-Modified só tem segundos inteiros: o If-Modified-Since só vale
+    se a última escrita foi antes do início daquele segundo (uma escrita
+    no mesmo segundo da leitura anterior não pode virar 304).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            (version, updated_at), (counted, counted_at) = read_versions()
+            url_hash = hashlib.sha1(request.full_path.encode()).hexdigest()[:12]
+            etag = f'v{version}-{url_hash}'
+            if counters:
+                etag = f'v{version}.{counted}-{url_hash}'
+                updated_at = max(updated_at, counted_at)
+            last_modified = datetime.fromtimestamp(int(updated_at), tz=timezone.utc)
+            
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                since = request.if_modified_since
+                not_modified = since is not None and updated_at < since.timestamp()
+            
+            if not_modified:
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            
+            response.set_etag(etag, weak=True)
+            response.last_modified = last_modified
+            response.headers['Cache-Control'] = cache_control
+            return response
+        return wrapper
+    return decorator
+
+# ==================== COMPRESSÃO ====================
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/x-ndjson', 'application/javascript',
+    'text/csv', 'text/css', 'text/html', 'text/plain'
+}
+
+def gzip_stream(chunks, level, flush_size=16 * 1024):
+    """Comprime uma resposta em streaming sem esperar o fim do corpo
+
+    O primeiro pedaço sai imediatamente (tempo até o primeiro byte) e
+    depois o compressor é esvaziado a cada flush_size bytes de entrada.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31 = formato gzip
+    pending = 0
+    first = True
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compressor.compress(chunk)
+        pending += len(chunk)
+        if first or pending >= flush_size:
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+            first = False
+        if data:
+            yield data
+    yield compressor.flush()
+
+@app.after_request
+def compress_response(response):
+    """Aplica gzip quando o cliente aceita e a resposta vale a pena"""
+    if (response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or response.status_code != 200
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers):
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    if request.accept_encodings['gzip'] <= 0:
+        return response
+    
+    level = app.config['COMPRESS_LEVEL']
+    if response.is_streamed:
+        response.response = gzip_stream(response.response, level)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < app.config['COMPRESS_MIN_SIZE']:
+            return response
+        response.set_data(gzip.compress(data, level))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+# ==================== MÉTRICAS ====================
+
+metrics = Metrics(app.config['METRICS_DIR'] or None, app.config['METRICS_FLUSH_INTERVAL'])
+metrics.describe('http_requests_total', 'counter',
+                 'Requests atendidas por rota, método e status')
+metrics.describe('http_request_duration_seconds', 'histogram',
+                 'Duração das requests até o fim do corpo da resposta', HTTP_BUCKETS)
+metrics.describe('http_requests_in_flight', 'gauge',
+                 'Requests em andamento')
+metrics.describe('http_request_phase_seconds_total', 'counter',
+                 'Tempo gasto por rota em cada fase: sql, decode, serialize, other')
+metrics.describe('sqlite_query_duration_seconds', 'histogram',
+                 'Duração de execute/fetch/commit no SQLite por rota e comando', SQL_BUCKETS)
+metrics.describe('sqlite_statements_total', 'counter',
+                 'Comandos executados pelo SQLite por rota (inclui os disparados por triggers)')
+metrics.describe('sqlite_vm_instructions_total', 'counter',
+                 'Instruções da VM do SQLite por rota (aprox., em passos de SQL_PROGRESS_STEPS)')
+
+SQL_KINDS = {'SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE',
+             'BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE', 'PRAGMA'}
+
+class _RequestSample:
+    """Números de SQL da request em andamento"""
+    __slots__ = ('route', 'sql_seconds', 'statements', 'vm_steps')
+
+    def __init__(self, route):
+        self.route = route
+        self.sql_seconds = 0.0
+        self.statements = 0
+        self.vm_steps = 0
+
+# Fica numa ContextVar (e não em threading.local) para acompanhar a request
+# mesmo quando ela troca de thread, como no servidor asyncio (async_server.py)
+_current_sample = contextvars.ContextVar('request_sample')
+_background_sample = _RequestSample('background')  # Ex.: gravação dos contadores
+
+def _sql_kind(sql):
+    word = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ''
+    return word if word in SQL_KINDS else 'OTHER'
+
+def _record_sql(kind, elapsed):
+    sample = _current_sample.get(_background_sample)
+    sample.sql_seconds += elapsed
+    metrics.observe('sqlite_query_duration_seconds',
+                    {'route': sample.route, 'kind': kind}, elapsed)
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor que mede o tempo de execute() e dos fetch*()"""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record_sql(_sql_kind(sql), time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record_sql(_sql_kind(sql), time.perf_counter() - start)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            _record_sql('FETCH', time.perf_counter() - start)
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        try:
+            return super().fetchmany(self.arraysize if size is None else size)
+        finally:
+            _record_sql('FETCH', time.perf_counter() - start)
+
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            _record_sql('FETCH', time.perf_counter() - start)
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Conexão cujos cursores e commits alimentam as métricas de SQL"""
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or InstrumentedCursor)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            _record_sql('COMMIT', time.perf_counter() - start)
+
+def _trace_statement(sql):
+    _current_sample.get(_background_sample).statements += 1
+
+def _count_vm_steps():
+    _current_sample.get(_background_sample).vm_steps += 1
+    return 0  # Diferente de zero interromperia a consulta
+
+def instrument_connection(conn):
+    """Liga os hooks de trace/progress do SQLite na conexão"""
+    conn.set_trace_callback(_trace_statement)
+    if app.config['SQL_PROGRESS_STEPS'] > 0:
+        conn.set_progress_handler(_count_vm_steps, app.config['SQL_PROGRESS_STEPS'])
+
+@contextmanager
+def timed(phase):
+    """Soma a duração do bloco na fase informada da request atual"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_request_context() and 'metrics_phases' in g:
+            g.metrics_phases[phase] = (g.metrics_phases.get(phase, 0.0)
+                                       + time.perf_counter() - start)
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Provider do jsonify que contabiliza a fase de serialização"""
+
+    def dumps(self, obj, **kwargs):
+        with timed('serialize'):
+            return super().dumps(obj, **kwargs)
+
+if app.config['METRICS_ENABLED']:
+    app.json = TimedJSONProvider(app)
+
+@app.before_request
+def start_request_metrics():
+    if not app.config['METRICS_ENABLED']:
+        return
+    g.metrics_start = time.perf_counter()
+    g.metrics_phases = {}
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    _current_sample.set(_RequestSample(route))
+    metrics.gauge_add('http_requests_in_flight', {'route': route})
+
+@app.after_request
+def keep_response_status(response):
+    if 'metrics_start' in g:
+        g.metrics_status = response.status_code
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exception):
+    """Registra latência, status e a divisão do tempo da request
+
+    Roda depois do fim do corpo, então respostas em streaming contam o
+    tempo total e não só até os headers.
+    """
+    start = g.pop('metrics_start', None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    sample = _current_sample.get(_background_sample)
+    route = sample.route
+    status = g.pop('metrics_status', 500)
+    phases = g.pop('metrics_phases', {})
+    phases['sql'] = sample.sql_seconds
+    phases['other'] = max(0.0, elapsed - sum(phases.values()))
+
+    metrics.gauge_add('http_requests_in_flight', {'route': route}, -1)
+    metrics.inc('http_requests_total',
+                {'route': route, 'method': request.method, 'status': str(status)})
+    metrics.observe('http_request_duration_seconds',
+                    {'route': route, 'method': request.method}, elapsed)
+    for phase, seconds in phases.items():
+        metrics.inc('http_request_phase_seconds_total', {'route': route, 'phase': phase}, seconds)
+    metrics.inc('sqlite_statements_total', {'route': route}, sample.statements)
+    metrics.inc('sqlite_vm_instructions_total', {'route': route},
+                sample.vm_steps * app.config['SQL_PROGRESS_STEPS'])
+    _current_sample.set(_background_sample)
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Métricas de todos os workers no formato texto do Prometheus"""
+    response = Response(metrics.render(), mimetype='text/plain')
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Verifica se a API está funcionando"""
-    return jsonify({
+    response = jsonify({
         'status': 'OK',
         'message': 'API Backend funcionando',
         'timestamp': datetime.now().isoformat()
     })
+    # Sonda de disponibilidade: nunca deve ser respondida por um cache
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+# ==================== CONTROLE DE ADMISSÃO ====================
+
+# Classes de prioridade: "critical" nunca é barrada nem contada; "dashboard"
+# (escritas e relatórios do painel) nunca é descartada e tem reservada a
+# parte da capacidade que "public" (leituras do site, views/leads) não pode
+# ocupar. "feed" (long-poll e SSE de /changes) passa pelo limite por
+# cliente, mas não entra na conta: conexões longas têm teto próprio
+# (CHANGES_MAX_CONNECTIONS / CHANGES_MAX_PER_CLIENT). Rotas fora deste
+# mapa: GET/HEAD = public, demais = dashboard.
+REQUEST_PRIORITIES = {
+    'health_check': 'critical',
+    'get_metrics': 'critical',
+    'register_view': 'public',
+    'register_lead': 'public',
+    'get_changes': 'feed',
+    'stream_changes': 'feed',
+    'export_properties': 'dashboard',
+    'get_sales_analytics': 'dashboard',
+}
+
+metrics.describe('admission_rejected_total', 'counter',
+                 'Requests recusadas pelo controle de admissão, por rota e motivo')
+metrics.describe('http_request_queue_seconds', 'histogram',
+                 'Espera na fila do proxy antes da API (header X-Request-Start)', HTTP_BUCKETS)
+
+if app.config['TRUSTED_PROXIES'] > 0:
+    # request.remote_addr passa a ser o IP do cliente, e não o do proxy
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'])
+
+rate_limiter = TokenBuckets(app.config['RATE_LIMIT_RPS'], app.config['RATE_LIMIT_BURST'])
+# Criada no import: com preload_app os workers herdam a mesma tabela
+requests_in_flight = InFlight(('public', 'dashboard'))
+feed_connections = ConnectionLimit(app.config['CHANGES_MAX_CONNECTIONS'],
+                                   app.config['CHANGES_MAX_PER_CLIENT'])
+
+def request_priority():
+    if request.method == 'OPTIONS':
+        return 'critical'  # Preflight de CORS
+    priority = REQUEST_PRIORITIES.get(request.endpoint)
+    if priority:
+        return priority
+    return 'public' if request.method in ('GET', 'HEAD') else 'dashboard'
+
+def admission_rejected(status, error, retry_after, reason):
+    if app.config['METRICS_ENABLED']:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.inc('admission_rejected_total', {'route': route, 'reason': reason})
+    response = jsonify({
+        'success': False,
+        'error': error
+    })
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response, status
+
+@app.before_request
+def admit_request():
+    """Limita clientes e descarta leituras públicas quando a API satura
+
+    Recusar cedo custa ~1 ms de worker; aceitar uma leitura que não cabe
+    prende um worker de que as escritas do painel precisam.
+    """
+    priority = request_priority()
+    if priority == 'critical':
+        return None
+    config = app.config
+
+    if priority in ('public', 'feed') and config['RATE_LIMIT_RPS'] > 0:
+        wait = rate_limiter.take(request.remote_addr)
+        if wait:
+            return admission_rejected(429, 'Muitas requisições, tente novamente em instantes',
+                                      wait, 'rate_limit')
+
+    start = request.headers.get('X-Request-Start')
+    waited = queue_seconds(start) if start else None
+    if waited is not None and config['METRICS_ENABLED']:
+        metrics.observe('http_request_queue_seconds', {}, waited)
+
+    if priority == 'feed':
+        if not feed_connections.acquire(request.remote_addr):
+            return admission_rejected(503, 'Muitas conexões abertas no feed, tente novamente em instantes',
+                                      config['SHED_RETRY_AFTER'], 'feed_connections')
+        g.feed_client = request.remote_addr  # Liberada no teardown
+        return None
+
+    requests_in_flight.enter(priority)
+    g.admission_priority = priority  # Sai da contagem no teardown
+    if priority != 'public':
+        return None
+
+    if config['SHED_QUEUE_MS'] > 0 and waited is not None and waited * 1000 > config['SHED_QUEUE_MS']:
+        return admission_rejected(503, 'Servidor sobrecarregado, tente novamente em instantes',
+                                  config['SHED_RETRY_AFTER'], 'queue_time')
+    capacity = config['SHED_CAPACITY']
+    if capacity > 0 and config['SHED_PUBLIC_SHARE'] < 1:
+        # Conta as requests do painel também: elas têm prioridade sobre a
+        # mesma parte da capacidade
+        limit = max(1, int(capacity * config['SHED_PUBLIC_SHARE']))
+        if requests_in_flight.count() > limit:
+            return admission_rejected(503, 'Servidor sobrecarregado, tente novamente em instantes',
+                                      config['SHED_RETRY_AFTER'], 'concurrency')
+    return None
+
+@app.teardown_request
+def release_admission(exception):
+    if 'feed_client' in g:
+        feed_connections.release(g.pop('feed_client'))
+    priority = g.pop('admission_priority', None)
+    if priority is not None:
+        requests_in_flight.leave(priority)
+
+# Ordenações aceitas em ?sort= (chave -> coluna, direção). O id entra
+# sempre como desempate para que a paginação por cursor seja estável.
+PROPERTY_SORTS = {
+    'relevance': ('rank', 'ASC'),  # só com ?q= (bm25: menor = melhor)
+    'recent': ('date_added', 'DESC'),
+    'oldest': ('date_added', 'ASC'),
+    'price_asc': ('price', 'ASC'),
+    'price_desc': ('price', 'DESC'),
+    'area_asc': ('area', 'ASC'),
+    'area_desc': ('area', 'DESC'),
+    'distance': ('distance', 'ASC'),  # só com ?near= (km até o ponto)
+}
+
+def encode_cursor(sort, row):
+    """Gera o cursor opaco (chave do último item da página)"""
+    column = PROPERTY_SORTS[sort][0]
+    payload = json.dumps([sort, row[column], row['id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, sort):
+    """Lê o cursor opaco; retorna (valor, id) ou levanta ValueError"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_sort, value, last_id = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception:
+        raise ValueError('Cursor inválido')
+    if cursor_sort != sort:
+        raise ValueError('Cursor pertence a outra ordenação')
+    return value, last_id
+
+def _split_list_arg(args, name):
+    """Aceita tanto ?type=a,b quanto ?type=a&type=b"""
+    values = []
+    for raw in args.getlist(name):
+        values.extend(v.strip() for v in raw.split(',') if v.strip())
+    return values
+
+def build_property_filters(args):
+    """Monta a cláusula WHERE de listagem a partir da query string"""
+    clauses = ['1=1']
+    params = []
+    
+    category = args.get('category')
+    if category and category != 'all':
+        clauses.append('category = ?')
+        params.append(category)
+    
+    status = args.get('status')
+    if status and status != 'all':
+        clauses.append('status = ?')
+        params.append(status)
+    
+    # Faixas (limites inclusivos)
+    for column in ('price', 'area'):
+        minimum = args.get(f'{column}_min', type=float)
+        maximum = args.get(f'{column}_max', type=float)
+        if minimum is not None:
+            clauses.append(f'{column} >= ?')
+            params.append(minimum)
+        if maximum is not None:
+            clauses.append(f'{column} <= ?')
+            params.append(maximum)
+    
+    # Mínimos ("2+ quartos")
+    for column in ('bedrooms', 'bathrooms'):
+        minimum = args.get(column, type=int)
+        if minimum:
+            clauses.append(f'{column} >= ?')
+            params.append(minimum)
+    
+    types = _split_list_arg(args, 'type')
+    if types:
+        clauses.append(f"type IN ({', '.join('?' for _ in types)})")
+        params.extend(types)
+    
+    location = args.get('location')
+    if location:
+        clauses.append('location LIKE ?')
+        params.append(f'%{location}%')
+    
+    # Filtros geográficos: o R*Tree reduz os candidatos a um retângulo e
+    # só eles passam pelo cálculo exato de distância
+    near = parse_near(args)
+    radius = args.get('radius_km', type=float)
+    if near:
+        if radius is not None:
+            if radius <= 0:
+                raise ValueError('radius_km deve ser maior que zero')
+            clauses.append(GEO_BOX_CLAUSE)
+            params.extend(radius_box(*near, radius))
+            clauses.append('distance_km(latitude, longitude, ?, ?) <= ?')
+            params.extend([*near, radius])
+        else:
+            clauses.append('latitude IS NOT NULL AND longitude IS NOT NULL')
+    elif radius is not None:
+        raise ValueError('radius_km exige near=lat,lon')
+    
+    bbox = args.get('bbox')
+    if bbox:
+        min_lon, min_lat, max_lon, max_lat = _parse_coordinates(bbox, 4, 'bbox')
+        if min_lat > max_lat or min_lon > max_lon:
+            raise ValueError('bbox deve ser min_lon,min_lat,max_lon,max_lat')
+        clauses.append(GEO_BOX_CLAUSE)
+        params.extend([min_lat, max_lat, min_lon, max_lon])
+        # O R*Tree guarda float32 e arredonda para fora: confere o valor exato
+        clauses.append('latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?')
+        params.extend([min_lat, max_lat, min_lon, max_lon])
+    
+    return ' AND '.join(clauses), params
+
+GEO_BOX_CLAUSE = '''properties.rowid IN (
+    SELECT id FROM properties_geo
+    WHERE max_lat >= ? AND min_lat <= ? AND max_lon >= ? AND min_lon <= ?
+)'''
+
+def _parse_coordinates(value, count, name):
+    """Lê count números separados por vírgula; levanta ValueError"""
+    try:
+        numbers = [float(v) for v in value.split(',')]
+    except ValueError:
+        numbers = []
+    if len(numbers) != count or not all(math.isfinite(n) for n in numbers):
+        raise ValueError(f'{name} inválido')
+    return numbers
+
+def parse_near(args):
+    """Lê ?near=lat,lon; retorna (lat, lon) ou None"""
+    near = args.get('near')
+    if not near:
+        return None
+    lat, lon = _parse_coordinates(near, 2, 'near')
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError('near fora do intervalo de latitude/longitude')
+    return lat, lon
+
+def uses_geo_filters(args):
+    return any(args.get(name) for name in ('near', 'bbox'))
+
+# Colunas de properties que podem ser pedidas em ?fields=
+PROPERTY_COLUMNS = (
+    'id', 'title', 'price', 'location', 'category', 'status',
+    'bedrooms', 'bathrooms', 'area', 'type', 'description',
+    'features', 'images', 'date_added', 'views', 'leads',
+    'latitude', 'longitude'
+)
+
+# Campos calculados no próprio SQL (sem trazer/decodificar o JSON inteiro)
+PROPERTY_DERIVED_FIELDS = {
+    'cover_image': "json_extract(properties.images, '$[0]')",
+}
+
+JSON_COLUMNS = ('features', 'images')
+
+def parse_fields(args):
+    """Lê ?fields=a,b,c; retorna None (todos os campos) ou a lista pedida"""
+    fields = _split_list_arg(args, 'fields')
+    if not fields:
+        return None
+    unknown = [f for f in fields if f not in PROPERTY_COLUMNS and f not in PROPERTY_DERIVED_FIELDS]
+    if unknown:
+        raise ValueError(f"Campos inválidos: {', '.join(unknown)}")
+    # id sempre acompanha o registro
+    return ['id'] + [f for f in dict.fromkeys(fields) if f != 'id']
+
+def select_columns(fields, sort_column):
+    """Lista de colunas do SELECT para a projeção pedida"""
+    if fields is None:
+        return 'properties.*'
+    columns = [
+        f'{PROPERTY_DERIVED_FIELDS[f]} AS {f}' if f in PROPERTY_DERIVED_FIELDS
+        else f'properties.{f}'
+        for f in fields
+    ]
+    # A coluna de ordenação é necessária para montar o cursor
+    if sort_column in PROPERTY_COLUMNS and sort_column not in fields:
+        columns.append(f'properties.{sort_column}')
+    return ', '.join(columns)
+
+def row_to_property(row, fields=None):
+    """Converte uma linha de properties no dicionário da resposta
+
+    Com fields, devolve só os campos pedidos (mais rank/snippet da busca
+    e distance da busca por proximidade).
+    As colunas JSON só são decodificadas quando fazem parte da resposta.
+    """
+    property_data = dict(row)
+    if fields is not None:
+        property_data = {
+            key: value for key, value in property_data.items()
+            if key in fields or key in ('rank', 'snippet', 'distance')
+        }
+    # Converte strings JSON de volta para arrays/objetos
+    for column in JSON_COLUMNS:
+        if column in property_data:
+            property_data[column] = decode_json_column(property_data[column])
+    return property_data
+
+def decode_json_column(value):
+    try:
+        return json.loads(value or '[]')
+    except (TypeError, ValueError):
+        return []
+
+# Formatos de resposta de GET /properties (?format=)
+RESPONSE_FORMATS = ('rows', 'columnar')
+
+# Colunas com poucos valores distintos: no formato colunar vão como
+# índices numa lista de valores (dicionário), sem repetir o texto
+DICTIONARY_COLUMNS = ('category', 'status', 'type', 'location')
+
+def rows_to_columns(rows, fields=None):
+    """Formato colunar: {campo: [valor de cada linha]} e os dicionários
+
+    Mesmos campos e valores de row_to_property, na ordem das linhas. Nas
+    colunas de DICTIONARY_COLUMNS cada valor é o índice dele em
+    dictionaries[coluna].
+    """
+    columns, dictionaries = {}, {}
+    if not rows:
+        return columns, dictionaries
+    for index, name in enumerate(rows[0].keys()):
+        if fields is not None and name not in fields and name not in ('rank', 'snippet', 'distance'):
+            continue
+        values = [row[index] for row in rows]
+        if name in JSON_COLUMNS:
+            values = [decode_json_column(value) for value in values]
+        elif name in DICTIONARY_COLUMNS:
+            codes = {}
+            values = [codes.setdefault(value, len(codes)) for value in values]
+            dictionaries[name] = list(codes)
+        columns[name] = values
+    return columns, dictionaries
+
+if orjson is not None:
+    def encode_json(value):
+        return orjson.dumps(value).decode()
+else:
+    def encode_json(value):
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+def stream_properties(cursor, limit, sort, fields=None, batch_size=500):
+    """Gera o mesmo envelope de GET /properties aos poucos
+
+    As linhas saem do cursor em lotes (fetchmany), então o primeiro byte
+    é enviado logo e a memória não cresce com o tamanho do catálogo.
+    Como o total só é conhecido no fim, count e next_cursor vêm depois
+    da lista (campos "trailer" do objeto JSON).
+    """
+    yield '{"success":true,"properties":['
+    count = 0
+    last_row = None
+    next_cursor = None
+    while next_cursor is None:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        chunk = []
+        for row in rows:
+            if limit and count == limit:
+                # Linha extra buscada só para saber se há próxima página
+                next_cursor = encode_cursor(sort, last_row)
+                break
+            chunk.append(encode_json(row_to_property(row, fields)))
+            count += 1
+            last_row = row
+        if chunk:
+            yield (',' if count > len(chunk) else '') + ','.join(chunk)
+    yield f'],"count":{count},"next_cursor":{encode_json(next_cursor)}}}'
 
 @app.route('/properties', methods=['GET'])
+@conditional_get('public, no-cache', counters=True)
 def get_properties():
-    """Lista todas as propriedades"""
+    """Lista propriedades com filtros opcionais
+
+    Filtros: category, status, price_min/price_max, area_min/area_max,
+    bedrooms e bathrooms (mínimo), type (lista), location (trecho) e
+    sort (recent, oldest, price_asc, price_desc, area_asc, area_desc).
+    
+    Localização: near=lat,lon traz só imóveis com coordenadas, cada um com
+    "distance" (km); radius_km= limita o raio e sort=distance ordena do
+    mais perto para o mais longe. bbox=min_lon,min_lat,max_lon,max_lat
+    filtra pelo retângulo visível de um mapa. Combinam com os demais filtros.
+    
+    Busca textual: q= procura em título, descrição, localização e
+    características (sem diferenciar acentos), ordena por relevância e
+    devolve um trecho destacado em "snippet" (HTML: texto escapado e os
+    termos encontrados entre <mark>).
+    
+    Paginação: informe limit (>= 1) e repita a chamada com cursor=next_cursor
+    até next_cursor vir nulo.
+    
+    stream=1 envia a resposta em streaming (recomendado para listas grandes).
+    
+    fields=id,title,price,cover_image limita as colunas lidas e enviadas;
+    cover_image é a primeira imagem, extraída no próprio SQL.
+    
+    format=columnar troca a lista de imóveis por "columns" (uma lista por
+    campo) e "dictionaries" (valores de category, status, type e location,
+    que nas colunas vêm como índices); decodeProperties() em
+    js/api-config.js volta ao formato de linhas. Não combina com stream=1.
+    """
     try:
         conn = get_db()
         cursor = conn.cursor()
         
-        # Parâmetros opcionais
-        category = request.args.get('category')
-        status = request.args.get('status')
+        match = build_fts_query(request.args.get('q', ''))
+        try:
+            fields = parse_fields(request.args)
+            near = parse_near(request.args)
+            where, params = build_property_filters(request.args)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        response_format = request.args.get('format', 'rows')
+        if response_format not in RESPONSE_FORMATS:
+            return jsonify({
+                'success': False,
+                'error': f"Formato inválido. Use: {', '.join(RESPONSE_FORMATS)}"
+            }), 400
+        stream = request.args.get('stream') in ('1', 'true')
+        if stream and response_format == 'columnar':
+            return jsonify({
+                'success': False,
+                'error': 'format=columnar não pode ser usado com stream=1'
+            }), 400
+        
+        sort = request.args.get('sort', 'relevance' if match else 'recent')
+        if (sort not in PROPERTY_SORTS
+                or (sort == 'relevance' and not match)
+                or (sort == 'distance' and not near)):
+            return jsonify({
+                'success': False,
+                'error': f"Ordenação inválida. Use: {', '.join(PROPERTY_SORTS)}"
+            }), 400
+        
+        if match and not fts_available(conn):
+            return jsonify({
+                'success': False,
+                'error': 'Busca textual indisponível neste servidor'
+            }), 501
+        
+        if uses_geo_filters(request.args) and not geo_available(conn):
+            return jsonify({
+                'success': False,
+                'error': 'Busca por localização indisponível neste servidor'
+            }), 501
+        
         limit = request.args.get('limit', type=int)
+        if limit is not None and limit < 1:
+            return jsonify({
+                'success': False,
+                'error': 'limit deve ser um número inteiro maior que zero'
+            }), 400
         
-        query = 'SELECT * FROM properties WHERE 1=1'
-        params = []
+        column, direction = PROPERTY_SORTS[sort]
+        columns = select_columns(fields, column)
+        select_params = []
+        if near:
+            columns += ', distance_km(properties.latitude, properties.longitude, ?, ?) AS distance'
+            select_params.extend(near)
         
-        if category and category != 'all':
-            query += ' AND category = ?'
-            params.append(category)
+        # Paginação por keyset: continua depois da chave (coluna, id) do cursor
+        page_cursor = request.args.get('cursor')
+        if page_cursor:
+            try:
+                value, last_id = decode_cursor(page_cursor, sort)
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 400
+            where += f" AND ({column}, id) {'<' if direction == 'DESC' else '>'} (?, ?)"
+            params.extend([value, last_id])
         
-        if status and status != 'all':
-            query += ' AND status = ?'
-            params.append(status)
+        if match:
+            # Pesos do bm25 por coluna: title, description, location, features
+            select = f'''
+                WITH matches AS (
+                    SELECT rowid AS fts_rowid,
+                           bm25(properties_fts, 10.0, 1.0, 5.0, 3.0) AS rank,
+                           highlight_snippet(snippet(properties_fts, -1, char(2), char(3),
+                                                    '…', 12)) AS snippet
+                    FROM properties_fts
+                    WHERE properties_fts MATCH ?
+                )
+                SELECT {columns}, matches.rank, matches.snippet
+                FROM matches JOIN properties ON properties.rowid = matches.fts_rowid
+            '''
+            select_params.insert(0, match)
+        else:
+            select = f'SELECT {columns} FROM properties'
+        params = select_params + params
         
-        query += ' ORDER BY date_added DESC'
+        query = (f'{select} WHERE {where} '
+                 f'ORDER BY {column} {direction}, id {direction}')
         
         if limit:
+            # Busca um item a mais só para saber se existe próxima página
             query += ' LIMIT ?'
-            params.append(limit)
+            params.append(limit + 1)
         
         cursor.execute(query, params)
-        properties = []
         
-        for row in cursor.fetchall():
-            property_data = dict(row)
-            # Converte strings JSON de volta para arrays/objetos
-            try:
-                property_data['features'] = json.loads(property_data['features'] or '[]')
-                property_data['images'] = json.loads(property_data['images'] or '[]')
-            except:
-                property_data['features'] = []
-                property_data['images'] = []
+        if stream:
+            return Response(
+                stream_with_context(stream_properties(cursor, limit, sort, fields)),
+                mimetype='application/json'
+            )
+        
+        rows = cursor.fetchall()
+        
+        next_cursor = None
+        if limit and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(sort, rows[-1])
+        
+        if response_format == 'columnar':
+            with timed('decode'):
+                columns, dictionaries = rows_to_columns(rows, fields)
+            return jsonify({
+                'success': True,
+                'format': 'columnar',
+                'columns': columns,
+                'dictionaries': dictionaries,
+                'count': len(rows),
+                'next_cursor': next_cursor
+            })
+        
+        with timed('decode'):
+            properties = [row_to_property(row, fields) for row in rows]
+        
+        return jsonify({
+            'success': True,
+            'properties': properties,
+            'count': len(properties),
+            'next_cursor': next_cursor
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+# ==================== FACETAS ====================
+
+# Intervalos das facetas de preço (R$) e área (m²); o último é aberto
+FACET_PRICE_EDGES = (0, 150000, 250000, 400000, 600000, 800000, 1000000,
+                     1500000, 2000000, 3000000, 5000000)
+FACET_AREA_EDGES = (0, 40, 60, 80, 100, 150, 200, 300, 500)
+
+# Colunas lidas para montar o índice e facetas devolvidas por /properties/facets
+FACET_COLUMNS = ('id', 'category', 'status', 'type', 'bedrooms', 'bathrooms',
+                 'location', 'price', 'area')
+FACET_NAMES = ('category', 'status', 'type', 'neighbourhood', 'bedrooms',
+               'bathrooms', 'price', 'area')
+
+# Acima disso, recarregar tudo sai mais barato que aplicar mudança por mudança
+FACET_RELOAD_CHANGES = 2000
+
+def neighbourhood_of(row):
+    """Bairro de uma localização no formato "Bairro - Cidade/UF" """
+    location = row['location']
+    return location.split(' - ')[0].strip() if location else None
+
+facet_index = FacetIndex(
+    values={
+        'category': 'category',
+        'status': 'status',
+        'type': 'type',
+        'bedrooms': 'bedrooms',
+        'bathrooms': 'bathrooms',
+        'neighbourhood': neighbourhood_of,
+        'location': 'location',  # Só para o filtro location= (LIKE)
+    },
+    ranges={
+        'price': ('price', FACET_PRICE_EDGES),
+        'area': ('area', FACET_AREA_EDGES),
+    }
+)
+
+def sync_facet_index(conn):
+    """Põe o índice de facetas deste worker em dia com o banco
+
+    O feed de mudanças registra inserts, updates e deletes de todas as rotas
+    (e de todos os workers), então basta aplicar os eventos com versão acima
+    da última vista. Recarrega tudo na primeira vez, quando o log já foi
+    compactado além dessa versão ou quando há mudanças demais.
+    """
+    # Uma transação de leitura: posição do log e linhas do mesmo retrato
+    conn.execute('BEGIN')
+    try:
+        latest, compacted_through = change_log_position(conn)
+        version = facet_index.version
+        if version == latest:
+            return
+        if (version is None or version < compacted_through or version > latest
+                or latest - version > FACET_RELOAD_CHANGES):
+            facet_index.load(
+                conn.execute(f"SELECT {', '.join(FACET_COLUMNS)} FROM properties"),
+                latest
+            )
+            return
+        rows = conn.execute(f'''
+            SELECT c.property_id, {', '.join(f'p.{column}' for column in FACET_COLUMNS)}
+            FROM property_changes c
+            LEFT JOIN properties p ON p.id = c.property_id
+            WHERE c.version > ?
+        ''', (version,))
+        for row in rows:
+            if row['id'] is None:
+                facet_index.remove(row['property_id'])
+            else:
+                facet_index.upsert(row)
+        facet_index.version = latest
+    finally:
+        conn.rollback()
+
+def like_pattern(text):
+    """Regex equivalente a LIKE '%text%' do SQLite (sem caixa só em ASCII)"""
+    pattern = ''.join(
+        '.*' if char == '%' else '.' if char == '_' else re.escape(char)
+        for char in text
+    )
+    return re.compile(pattern, re.ASCII | re.IGNORECASE | re.DOTALL)
+
+def facet_filters(args):
+    """Bitmap de cada filtro de GET /properties, pela faceta que ele restringe
+
+    Mesma semântica de build_property_filters. Chame com facet_index.lock.
+    """
+    index = facet_index
+    filters = {}
+    
+    for name in ('category', 'status'):
+        value = args.get(name)
+        if value and value != 'all':
+            filters[name] = index.match(name, lambda key: key == value)
+    
+    for name in ('price', 'area'):
+        minimum = args.get(f'{name}_min', type=float)
+        maximum = args.get(f'{name}_max', type=float)
+        if minimum is not None or maximum is not None:
+            filters[name] = index.match_range(name, minimum, maximum)
+    
+    for name in ('bedrooms', 'bathrooms'):
+        minimum = args.get(name, type=int)
+        if minimum:
+            filters[name] = index.match(
+                name, lambda key: isinstance(key, (int, float)) and key >= minimum
+            )
+    
+    types = set(_split_list_arg(args, 'type'))
+    if types:
+        filters['type'] = index.match('type', lambda key: key in types)
+    
+    location = args.get('location')
+    if location:
+        # A faceta de bairros mostra as alternativas ao trecho escolhido
+        pattern = like_pattern(location)
+        filters['neighbourhood'] = index.match(
+            'location', lambda key: isinstance(key, str) and pattern.search(key) is not None
+        )
+    
+    return filters
+
+def search_filter_ids(conn, args):
+    """Ids que passam por q=, near=/radius_km= e bbox= (feitos no SQL)
+
+    Retorna None quando nenhum desses filtros foi pedido.
+    """
+    geo_args = MultiDict(
+        (name, value) for name, value in args.items(multi=True)
+        if name in ('near', 'radius_km', 'bbox')
+    )
+    match = build_fts_query(args.get('q', ''))
+    if not match and not geo_args:
+        return None
+    
+    where, params = build_property_filters(geo_args)
+    if match:
+        where += ' AND properties.rowid IN (SELECT rowid FROM properties_fts WHERE properties_fts MATCH ?)'
+        params.append(match)
+    return [row[0] for row in conn.execute(f'SELECT properties.id FROM properties WHERE {where}', params)]
+
+@app.route('/properties/facets', methods=['GET'])
+@conditional_get('public, no-cache')
+def get_property_facets():
+    """Contagens por valor de cada faceta para os filtros atuais
+
+    Aceita os mesmos filtros de GET /properties. A contagem de cada faceta
+    ignora o próprio filtro dela (ex.: com type=casa, a faceta type ainda
+    mostra quantos apartamentos há), para a barra lateral exibir as
+    alternativas; "total" considera todos os filtros. price e area vêm
+    como faixas [{min, max, count}] (max nulo = sem limite).
+    
+    As contagens saem de um índice de bitmaps em memória (facets.py),
+    mantido em dia pelo feed de mudanças.
+    """
+    try:
+        conn = get_db()
+        
+        if request.args.get('q') and not fts_available(conn):
+            return jsonify({
+                'success': False,
+                'error': 'Busca textual indisponível neste servidor'
+            }), 501
+        
+        if uses_geo_filters(request.args) and not geo_available(conn):
+            return jsonify({
+                'success': False,
+                'error': 'Busca por localização indisponível neste servidor'
+            }), 501
+        
+        try:
+            ids = search_filter_ids(conn, request.args)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        with facet_index.lock:
+            sync_facet_index(conn)
+            filters = facet_filters(request.args)
+            base = facet_index.all if ids is None else facet_index.from_ids(ids)
             
-            properties.append(property_data)
+            facets = {}
+            for name in FACET_NAMES:
+                within = base
+                for other, bitmap in filters.items():
+                    if other != name:
+                        within &= bitmap
+                if name in facet_index.ranges:
+                    facets[name] = facet_index.range_counts(name, within)
+                else:
+                    facets[name] = {
+                        key: count for key, count in facet_index.counts(name, within).items()
+                        if key is not None
+                    }
+            
+            matching = base
+            for bitmap in filters.values():
+                matching &= bitmap
         
-        conn.close()
+        return jsonify({
+            'success': True,
+            'total': popcount(matching),
+            'facets': facets
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+# ==================== FILA DE ESCRITAS ====================
+
+metrics.describe('write_batch_size', 'histogram',
+                 'Escritas gravadas por transação da fila (group commit)',
+                 buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+metrics.describe('write_queue_wait_seconds', 'histogram',
+                 'Tempo de uma escrita entre entrar na fila e o commit', buckets=HTTP_BUCKETS)
+metrics.describe('write_queue_rejected_total', 'counter',
+                 'Escritas recusadas com a fila cheia (503)')
+
+def record_write_batch(size, waits):
+    if not app.config['METRICS_ENABLED']:
+        return
+    metrics.observe('write_batch_size', {}, size)
+    for wait in waits:
+        metrics.observe('write_queue_wait_seconds', {}, wait)
+
+# Limite do caminho de um socket Unix (108 bytes no Linux, 104 no macOS)
+UNIX_SOCKET_PATH_MAX = 100
+
+def write_queue_socket():
+    """Caminho do socket do escritor, calculado em cada worker após o fork
+
+    Padrão: pasta privada (0700) ao lado do banco, com um socket por
+    processo mestre, para deploys diferentes não dividirem o escritor. Se
+    o caminho ficar longo demais para um socket, usa uma pasta privada em
+    XDG_RUNTIME_DIR (ou na pasta temporária).
+    """
+    path = app.config['WRITE_QUEUE_SOCKET']
+    if path == 'off':
+        return None
+    if path:
+        return path
+    server_pid = app.config['SERVER_PID'] or os.getpid()
+    database = os.path.abspath(app.config['DATABASE'])
+    path = os.path.join(database + '-writer', f'{server_pid}.sock')
+    if len(path) <= UNIX_SOCKET_PATH_MAX:
+        private_directory(os.path.dirname(path))
+        return path
+    runtime = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    directory = private_directory(os.path.join(runtime, f'api-writer-{os.getuid()}'))
+    database = hashlib.sha1(database.encode()).hexdigest()[:8]
+    return os.path.join(directory, f'{database}-{server_pid}.sock')
+
+# Rotas de escrita enviam a operação para cá em vez de gravar na conexão
+# da request: um único escritor grava as escritas de todos os workers, em
+# lotes de uma transação (a versão do catálogo sobe uma vez por lote)
+write_queue = WriteQueue(
+    connect_db,
+    max_depth=app.config['WRITE_QUEUE_DEPTH'],
+    max_batch=app.config['WRITE_BATCH_MAX'],
+    batch_window=app.config['WRITE_BATCH_WINDOW_MS'] / 1000,
+    submit_timeout=app.config['WRITE_QUEUE_TIMEOUT'],
+    before_commit=bump_catalog_version,
+    on_batch=record_write_batch,
+    socket_path=write_queue_socket,
+    after_commit=forget_catalog_version
+)
+
+def with_stored_images(data):
+    """Grava as imagens inline (data URLs) ainda na request
+
+    O escritor pode ser outro worker, que não tem a request para montar
+    os links; ali as imagens já chegam como URLs e ficam como estão.
+    """
+    if isinstance(data, dict) and isinstance(data.get('images'), list):
+        data = {**data, 'images': externalize_images(data['images'])[0]}
+    return data
+
+def write_queue_full(error):
+    """Resposta 503 para escritas recusadas pela fila cheia"""
+    if app.config['METRICS_ENABLED']:
+        metrics.inc('write_queue_rejected_total')
+    response = jsonify({
+        'success': False,
+        'error': str(error)
+    })
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+# ==================== IMAGENS ====================
+
+def image_url(name):
+    """URL pública de uma imagem armazenada"""
+    base = app.config['PUBLIC_URL']
+    if not base and has_request_context():
+        base = request.url_root
+    return f"{base.rstrip('/')}/images/{name}"
+
+def externalize_images(images):
+    """Grava data URLs inline em disco e devolve a lista só com URLs"""
+    return image_store.externalize_images(
+        images, app.config['UPLOAD_FOLDER'], app.config['MAX_IMAGE_SIZE'], image_url
+    )
+
+@app.route('/images', methods=['POST'])
+def upload_images():
+    """Recebe uma ou mais imagens (multipart, campo "file") e devolve as URLs"""
+    files = request.files.getlist('file') or request.files.getlist('image')
+    if not files:
+        return jsonify({
+            'success': False,
+            'error': 'Envie as imagens no campo "file" (multipart/form-data)'
+        }), 400
+    
+    uploaded = []
+    max_size = app.config['MAX_IMAGE_SIZE']
+    for file in files:
+        try:
+            # Lê no máximo 1 byte além do limite: o bastante para recusar
+            # o arquivo sem trazer o corpo inteiro para a memória
+            name = image_store.store_image(
+                app.config['UPLOAD_FOLDER'], file.read(max_size + 1), max_size
+            )
+        except image_store.ImageError as e:
+            return jsonify({
+                'success': False,
+                'error': f'{file.filename}: {e}'
+            }), 415
+        uploaded.append({'url': image_url(name), 'name': name})
+    
+    return jsonify({
+        'success': True,
+        'images': uploaded
+    }), 201
+
+@app.route('/images/<name>', methods=['GET'])
+def serve_image(name):
+    """Serve a imagem com cache imutável, ETag e suporte a Range"""
+    match = image_store.IMAGE_NAME_PATTERN.match(name)
+    if not match:
+        abort(404)
+    response = send_from_directory(
+        os.path.abspath(app.config['UPLOAD_FOLDER']),
+        image_store.image_path(name),
+        mimetype=image_store.IMAGE_MIMETYPES[match.group('ext')],
+        etag=match.group('digest'),
+        conditional=True,
+        max_age=31536000
+    )
+    # O nome é o hash do conteúdo: a URL nunca aponta para outra imagem
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+def replace_images(conn, updates):
+    """Grava [(novas imagens, id, imagens lidas, convertidas)]; retorna as aplicadas
+
+    Só atualiza o imóvel se a coluna ainda tem o valor lido, para não
+    desfazer uma edição feita enquanto as imagens eram convertidas.
+    """
+    applied = []
+    for images, property_id, previous, converted in updates:
+        cursor = conn.execute('UPDATE properties SET images = ? WHERE id = ? AND images = ?',
+                              (images, property_id, previous))
+        if cursor.rowcount:
+            applied.append((property_id, converted))
+    return applied
+
+@app.cli.command('migrate-inline-images')
+@click.option('--batch-size', type=int, default=100)
+def migrate_inline_images_command(batch_size):
+    """Move para disco os data URLs gravados na coluna images
+
+    Fora de uma request as URLs usam PUBLIC_URL (ex.: a URL do Render);
+    sem ela ficam relativas (/images/...).
+    """
+    conn = connect_db()
+    migrated_properties = 0
+    migrated_images = 0
+    last_id = ''
+    while True:
+        rows = conn.execute('''
+            SELECT id, images FROM properties
+            WHERE id > ? AND images LIKE '%data:image%'
+            ORDER BY id LIMIT ?
+        ''', (last_id, batch_size)).fetchall()
+        if not rows:
+            break
+        updates = []
+        for row in rows:
+            last_id = row['id']
+            try:
+                images, converted = externalize_images(json.loads(row['images']))
+            except (ValueError, image_store.ImageError) as e:
+                print(f"⚠️  {row['id']}: {e}")
+                continue
+            if converted:
+                updates.append((json.dumps(images), row['id'], row['images'], converted))
+        # Grava pela fila de escritas; só troca as imagens de quem não mudou
+        # desde a leitura acima
+        for property_id, converted in write_queue.submit(replace_images, updates):
+            migrated_properties += 1
+            migrated_images += converted
+    conn.close()
+    print(f"✅ {migrated_images} imagens de {migrated_properties} imóveis movidas para "
+          f"{app.config['UPLOAD_FOLDER']}")
+
+# Colunas gravadas no INSERT (na ordem de property_values)
+PROPERTY_INSERT_COLUMNS = (
+    'id', 'title', 'price', 'location', 'category', 'status',
+    'bedrooms', 'bathrooms', 'area', 'type', 'description',
+    'features', 'images', 'views', 'leads', 'latitude', 'longitude',
+    'date_added'
+)
+
+INSERT_PROPERTY_SQL = f'''
+    INSERT INTO properties ({', '.join(PROPERTY_INSERT_COLUMNS)})
+    VALUES ({', '.join('?' for _ in PROPERTY_INSERT_COLUMNS[:-1])},
+            COALESCE(?, CURRENT_TIMESTAMP))
+'''
+
+REQUIRED_PROPERTY_FIELDS = ('title', 'price', 'location', 'category')
+
+# Colunas aceitas em PATCH (views/leads são dos contadores; id e
+# date_added não mudam)
+PATCHABLE_COLUMNS = tuple(
+    column for column in PROPERTY_INSERT_COLUMNS
+    if column not in ('id', 'views', 'leads', 'date_added')
+)
+
+class PropertyNotFound(LookupError):
+    """Imóvel inexistente (respondido com 404)"""
+
+def validate_property(data):
+    """Retorna a mensagem de erro de um novo imóvel, ou None se for válido"""
+    if not isinstance(data, dict):
+        return 'Registro inválido'
+    for field in REQUIRED_PROPERTY_FIELDS:
+        if not data.get(field):
+            return f'Campo obrigatório: {field}'
+    return validate_coordinates(data)
+
+def coordinate(value):
+    """Latitude/longitude como float (vazio = sem coordenada)"""
+    return None if value in ('', None) else float(value)
+
+def validate_coordinates(data):
+    """Latitude e longitude são opcionais, mas vêm juntas e dentro do globo"""
+    try:
+        lat, lon = coordinate(data.get('latitude')), coordinate(data.get('longitude'))
+    except (TypeError, ValueError):
+        return 'Latitude/longitude inválidas'
+    if lat is None and lon is None:
+        return None
+    if lat is None or lon is None:
+        return 'Informe latitude e longitude juntas'
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return 'Latitude/longitude fora do intervalo'
+    return None
+
+def property_values(data, property_id, date_added=None):
+    """Tupla de valores para INSERT_PROPERTY_SQL (date_added None = agora)"""
+    # Converte arrays/objetos para JSON
+    features = json.dumps(data.get('features', []))
+    images = json.dumps(data.get('images', []))
+    return (
+        property_id,
+        data['title'],
+        data['price'],
+        data['location'],
+        data['category'],
+        data.get('status', 'disponivel'),
+        data.get('bedrooms', 0),
+        data.get('bathrooms', 0),
+        data.get('area', 0),
+        data.get('type', 'apartamento'),
+        data.get('description', ''),
+        features,
+        images,
+        data.get('views', 0),
+        data.get('leads', 0),
+        coordinate(data.get('latitude')),
+        coordinate(data.get('longitude')),
+        date_added
+    )
+
+# Operações de escrita sem commit, executadas pela fila de escritas
+# (write_queue.submit) nas rotas individuais e no POST /batch. Erros de
+# validação levantam ValueError (400) e imóveis inexistentes,
+# PropertyNotFound (404).
+
+def create_property(conn, data):
+    """Valida e insere um imóvel; retorna o id gerado"""
+    error = validate_property(data)
+    if error:
+        raise ValueError(error)
+    data = dict(data)
+    data['images'], _ = externalize_images(data.get('images', []))
+    property_id = str(uuid.uuid4())
+    conn.execute(INSERT_PROPERTY_SQL, property_values(data, property_id))
+    return property_id
+
+def patch_property(conn, property_id, data):
+    """Atualiza só as colunas enviadas; retorna o registro já atualizado (dict)
+
+    Um único UPDATE ... RETURNING confere a existência, grava e devolve o
+    registro novo. Só os triggers das colunas alteradas são disparados.
+    """
+    if not isinstance(data, dict) or not data:
+        raise ValueError('Nenhum campo para atualizar')
+    unknown = [field for field in data if field not in PATCHABLE_COLUMNS]
+    if unknown:
+        raise ValueError(f"Campos inválidos: {', '.join(unknown)}")
+    for field in REQUIRED_PROPERTY_FIELDS:
+        if field in data and not data[field]:
+            raise ValueError(f'Campo obrigatório: {field}')
+    if ('latitude' in data) != ('longitude' in data):
+        raise ValueError('Informe latitude e longitude juntas')
+    error = validate_coordinates(data)
+    if error:
+        raise ValueError(error)
+    
+    values = dict(data)
+    if 'images' in values:
+        values['images'], _ = externalize_images(values['images'])
+    for column in JSON_COLUMNS:
+        if column in values:
+            values[column] = json.dumps(values[column])
+    for column in ('latitude', 'longitude'):
+        if column in values:
+            values[column] = coordinate(values[column])
+    
+    assignments = ', '.join(f'{column} = ?' for column in values)
+    rows = conn.execute(
+        f'UPDATE properties SET {assignments} WHERE id = ? RETURNING *',
+        (*values.values(), property_id)
+    ).fetchall()
+    if not rows:
+        raise PropertyNotFound('Propriedade não encontrada')
+    return dict(rows[0])
+
+def replace_property(conn, property_id, data):
+    """Regrava todos os campos editáveis (PUT); ausentes voltam ao padrão"""
+    if not conn.execute('SELECT 1 FROM properties WHERE id = ?', (property_id,)).fetchone():
+        raise PropertyNotFound('Propriedade não encontrada')
+    if not isinstance(data, dict):
+        raise ValueError('Registro inválido')
+    error = validate_coordinates(data)
+    if error:
+        raise ValueError(error)
+    
+    # Converte arrays/objetos para JSON (data URLs viram arquivos)
+    images, _ = externalize_images(data.get('images', []))
+    conn.execute('''
+        UPDATE properties SET
+            title = ?, price = ?, location = ?, category = ?,
+            status = ?, bedrooms = ?, bathrooms = ?, area = ?,
+            type = ?, description = ?, features = ?, images = ?,
+            latitude = ?, longitude = ?
+        WHERE id = ?
+    ''', (
+        data.get('title'),
+        data.get('price'),
+        data.get('location'),
+        data.get('category'),
+        data.get('status', 'disponivel'),
+        data.get('bedrooms', 0),
+        data.get('bathrooms', 0),
+        data.get('area', 0),
+        data.get('type', 'apartamento'),
+        data.get('description', ''),
+        json.dumps(data.get('features', [])),
+        json.dumps(images),
+        coordinate(data.get('latitude')),
+        coordinate(data.get('longitude')),
+        property_id
+    ))
+
+def remove_property(conn, property_id):
+    """Exclui o imóvel"""
+    if conn.execute('DELETE FROM properties WHERE id = ?', (property_id,)).rowcount == 0:
+        raise PropertyNotFound('Propriedade não encontrada')
+
+def record_sale(conn, data):
+    """Registra a venda e marca o imóvel como vendido; retorna o id da venda"""
+    if not isinstance(data, dict):
+        raise ValueError('Registro inválido')
+    for field in ('property_id', 'sale_price'):
+        if field not in data:
+            raise ValueError(f'Campo obrigatório: {field}')
+    
+    sale_id = str(uuid.uuid4())
+    conn.execute('''
+        INSERT INTO sales (id, property_id, sale_price, commission, client_name)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (
+        sale_id,
+        data['property_id'],
+        data['sale_price'],
+        data.get('commission', 0),
+        data.get('client_name', '')
+    ))
+    conn.execute('''
+        UPDATE properties SET status = 'vendido' WHERE id = ?
+    ''', (data['property_id'],))
+    return sale_id
+
+@app.route('/properties', methods=['POST'])
+def add_property():
+    """Adiciona nova propriedade"""
+    try:
+        try:
+            property_id = write_queue.submit(create_property, with_stored_images(request.get_json()))
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        except WriteQueueFull as e:
+            return write_queue_full(e)
         
         return jsonify({
             'success': True,
-            'properties': properties,
-            'count': len(properties)
+            'message': 'Propriedade adicionada com sucesso',
+            'property_id': property_id
         })
         
     except Exception as e:
@@ -134,119 +2482,331 @@ def get_properties():
             'error': str(e)
         }), 500
 
-@app.route('/properties', methods=['POST'])
-def add_property():
-    """Adiciona nova propriedade"""
+# ==================== IMPORTAÇÃO / EXPORTAÇÃO EM LOTE ====================
+
+# Conversões aplicadas a cada linha importada (CSV chega tudo como texto)
+IMPORT_NUMERIC_FIELDS = {
+    'price': float, 'area': float, 'latitude': float, 'longitude': float,
+    'bedrooms': int, 'bathrooms': int, 'views': int, 'leads': int
+}
+IMPORT_LIST_FIELDS = ('features', 'images')
+# Colunas de texto: aceitam só valores escalares (o SQLite não grava dict/lista)
+IMPORT_TEXT_FIELDS = ('id', 'title', 'location', 'category', 'status', 'type',
+                      'description', 'date_added')
+MAX_REPORTED_ERRORS = 100
+
+def normalize_import_row(data):
+    """Converte tipos de uma linha importada; levanta ValueError se inválida"""
+    error = validate_property(data)
+    if error:
+        raise ValueError(error)
+    
+    row = {k: v for k, v in data.items() if v not in ('', None)}
+    for field in IMPORT_TEXT_FIELDS:
+        if isinstance(row.get(field), (dict, list)):
+            raise ValueError(f'Valor inválido em {field}: {row[field]!r}')
+    for field, cast in IMPORT_NUMERIC_FIELDS.items():
+        if field in row:
+            try:
+                row[field] = cast(float(row[field]))
+            except (TypeError, ValueError):
+                raise ValueError(f'Valor inválido em {field}: {row[field]!r}')
+    for field in IMPORT_LIST_FIELDS:
+        value = row.get(field)
+        if isinstance(value, str):
+            # CSV: aceita JSON (como na exportação) ou itens separados por ";"
+            if value.lstrip().startswith('['):
+                row[field] = json.loads(value)
+            else:
+                row[field] = [item.strip() for item in value.split(';') if item.strip()]
     try:
-        data = request.get_json()
-        
-        # Validação básica
-        required_fields = ['title', 'price', 'location', 'category']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({
-                    'success': False,
-                    'error': f'Campo obrigatório: {field}'
-                }), 400
-        
-        # Gera ID único
-        property_id = str(uuid.uuid4())
+        row['images'], _ = externalize_images(row.get('images', []))
+    except image_store.ImageError as e:
+        raise ValueError(str(e))
+    return row
+
+def iter_ndjson(lines):
+    """Gera (número da linha, registro ou exceção) a partir de NDJSON"""
+    for line_no, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError as e:
+            yield line_no, ValueError(f'JSON inválido: {e}')
+
+def iter_csv(text_stream):
+    """Gera (número da linha, registro) a partir de CSV com cabeçalho"""
+    reader = csv.DictReader(text_stream)
+    for record in reader:
+        yield reader.line_num, record
+
+# Erros de um registro isolado (conflito ou valor que o SQLite não aceita)
+IMPORT_ROW_ERRORS = (sqlite3.IntegrityError, sqlite3.InterfaceError,
+                     sqlite3.ProgrammingError)
+
+def insert_import_chunk(conn, chunk):
+    """Grava um bloco [(linha, valores)] da importação; retorna as falhas
+
+    Roda no escritor da fila. Se algum registro do bloco for recusado (ex.:
+    id repetido), refaz o bloco linha a linha para saber exatamente quais
+    falharam; retorna [(linha, mensagem)].
+    """
+    conn.execute('SAVEPOINT import_chunk')
+    try:
+        conn.executemany(INSERT_PROPERTY_SQL, [values for _, values in chunk])
+    except IMPORT_ROW_ERRORS:
+        conn.execute('ROLLBACK TO import_chunk')
+        failures = []
+        for line_no, values in chunk:
+            try:
+                conn.execute('SAVEPOINT import_row')
+                conn.execute(INSERT_PROPERTY_SQL, values)
+                conn.execute('RELEASE import_row')
+            except IMPORT_ROW_ERRORS as e:
+                conn.execute('ROLLBACK TO import_row')
+                conn.execute('RELEASE import_row')
+                failures.append((line_no, str(e)))
+        conn.execute('RELEASE import_chunk')
+        return failures
+    conn.execute('RELEASE import_chunk')
+    return []
+
+def import_properties(records, chunk_size):
+    """Insere registros em transações de até chunk_size linhas
+
+    records é um iterável de (linha, dict) — vindo de iter_ndjson/iter_csv —
+    consumido aos poucos, sem carregar o arquivo inteiro. Cada bloco vai
+    para a fila de escritas (write_queue). Linhas inválidas são
+    reportadas e não impedem a gravação das demais.
+    """
+    result = {'imported': 0, 'failed': 0, 'errors': []}
+    
+    def fail(line_no, error):
+        result['failed'] += 1
+        if len(result['errors']) < MAX_REPORTED_ERRORS:
+            result['errors'].append({'line': line_no, 'error': str(error)})
+    
+    def flush(chunk):
+        if not chunk:
+            return
+        failures = write_queue.submit(insert_import_chunk, chunk)
+        for line_no, error in failures:
+            fail(line_no, error)
+        result['imported'] += len(chunk) - len(failures)
+    
+    chunk = []
+    for line_no, data in records:
+        try:
+            if isinstance(data, Exception):
+                raise data
+            row = normalize_import_row(data)
+            values = property_values(row, row.get('id') or str(uuid.uuid4()),
+                                     row.get('date_added'))
+        except ValueError as e:
+            fail(line_no, e)
+            continue
+        chunk.append((line_no, values))
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    flush(chunk)
+    return result
+
+def is_csv_request(fmt, content_type):
+    return fmt == 'csv' or (not fmt and 'csv' in (content_type or ''))
+
+@app.route('/properties/import', methods=['POST'])
+def import_properties_endpoint():
+    """Importa imóveis em lote (NDJSON ou CSV) lendo o corpo como stream
+
+    Formato pelo Content-Type (application/x-ndjson ou text/csv) ou por
+    ?format=ndjson|csv. Responde com o total importado e os erros por linha.
+    """
+    try:
+        fmt = request.args.get('format')
         
-        conn = get_db()
-        cursor = conn.cursor()
+        if is_csv_request(fmt, request.content_type):
+            text = io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline='')
+            records = iter_csv(text)
+        else:
+            records = iter_ndjson(request.stream)
         
-        # Converte arrays/objetos para JSON
-        features = json.dumps(data.get('features', []))
-        images = json.dumps(data.get('images', []))
-        
-        cursor.execute('''
-            INSERT INTO properties (
-                id, title, price, location, category, status,
-                bedrooms, bathrooms, area, type, description,
-                features, images, views, leads
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            property_id,
-            data['title'],
-            data['price'],
-            data['location'],
-            data['category'],
-            data.get('status', 'disponivel'),
-            data.get('bedrooms', 0),
-            data.get('bathrooms', 0),
-            data.get('area', 0),
-            data.get('type', 'apartamento'),
-            data.get('description', ''),
-            features,
-            images,
-            data.get('views', 0),
-            data.get('leads', 0)
-        ))
-        
-        conn.commit()
-        conn.close()
+        result = import_properties(records, app.config['IMPORT_CHUNK_SIZE'])
         
         return jsonify({
             'success': True,
-            'message': 'Propriedade adicionada com sucesso',
-            'property_id': property_id
+            **result
         })
         
+    except WriteQueueFull as e:
+        return write_queue_full(e)
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+EXPORT_COLUMNS = PROPERTY_INSERT_COLUMNS
+
+def export_record(row):
+    """Registro NDJSON de um imóvel (listas decodificadas)"""
+    record = dict(row)
+    record['features'] = json.loads(record['features'] or '[]')
+    record['images'] = json.loads(record['images'] or '[]')
+    return json.dumps(record, ensure_ascii=False) + '\n'
+
+def iter_export_rows(conn, where, params, batch_size=500):
+    """Percorre a tabela em lotes via fetchmany (memória constante)"""
+    cursor = conn.execute(
+        f"SELECT {', '.join(EXPORT_COLUMNS)} FROM properties WHERE {where} "
+        f"ORDER BY date_added, id",
+        params
+    )
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield from rows
+
+@app.route('/properties/export', methods=['GET'])
+def export_properties():
+    """Exporta imóveis como NDJSON (padrão) ou CSV, em streaming
+
+    Aceita os mesmos filtros de GET /properties. O resultado pode ser
+    reimportado em POST /properties/import preservando ids e datas.
+    """
+    try:
+        where, params = build_property_filters(request.args)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    fmt = request.args.get('format', 'ndjson')
+    
+    def generate_ndjson():
+        for row in iter_export_rows(get_db(), where, params):
+            yield export_record(row)
+    
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        for row in iter_export_rows(get_db(), where, params):
+            writer.writerow(tuple(row))
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    
+    if fmt == 'csv':
+        body, mimetype, extension = generate_csv(), 'text/csv', 'csv'
+    else:
+        body, mimetype, extension = generate_ndjson(), 'application/x-ndjson', 'ndjson'
+    
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=properties.{extension}'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@app.cli.command('import-properties')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']),
+              help='Padrão: deduzido pela extensão do arquivo')
+@click.option('--chunk-size', type=int, default=None)
+def import_properties_command(path, fmt, chunk_size):
+    """Importa imóveis de um arquivo NDJSON ou CSV"""
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+    chunk_size = chunk_size or app.config['IMPORT_CHUNK_SIZE']
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        records = iter_csv(f) if fmt == 'csv' else iter_ndjson(f)
+        result = import_properties(records, chunk_size)
+    
+    print(f"✅ {result['imported']} imóveis importados, {result['failed']} com erro")
+    for error in result['errors']:
+        print(f"   linha {error['line']}: {error['error']}")
+
+@app.cli.command('export-properties')
+@click.argument('path', type=click.Path(dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']),
+              help='Padrão: deduzido pela extensão do arquivo')
+def export_properties_command(path, fmt):
+    """Exporta todos os imóveis para um arquivo NDJSON ou CSV"""
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+    conn = connect_db()
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            writer = csv.writer(f)
+            writer.writerow(EXPORT_COLUMNS)
+        for row in iter_export_rows(conn, '1=1', []):
+            if fmt == 'csv':
+                writer.writerow(tuple(row))
+            else:
+                f.write(export_record(row))
+            count += 1
+    conn.close()
+    print(f"✅ {count} imóveis exportados para {path}")
+
 @app.route('/properties/<property_id>', methods=['PUT'])
 def update_property(property_id):
     """Atualiza propriedade existente"""
     try:
-        data = request.get_json()
+        try:
+            write_queue.submit(replace_property, property_id,
+                               with_stored_images(request.get_json()))
+        except PropertyNotFound as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 404
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        except WriteQueueFull as e:
+            return write_queue_full(e)
         
-        conn = get_db()
-        cursor = conn.cursor()
+        return jsonify({
+            'success': True,
+            'message': 'Propriedade atualizada com sucesso'
+        })
         
-        # Verifica se a propriedade existe
-        cursor.execute('SELECT id FROM properties WHERE id = ?', (property_id,))
-        if not cursor.fetchone():
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/properties/<property_id>', methods=['PATCH'])
+def patch_property_endpoint(property_id):
+    """Atualiza só os campos enviados e devolve o imóvel atualizado"""
+    try:
+        try:
+            row = write_queue.submit(patch_property, property_id,
+                                     with_stored_images(request.get_json()))
+        except PropertyNotFound as e:
             return jsonify({
                 'success': False,
-                'error': 'Propriedade não encontrada'
+                'error': str(e)
             }), 404
-        
-        # Converte arrays/objetos para JSON
-        features = json.dumps(data.get('features', []))
-        images = json.dumps(data.get('images', []))
-        
-        cursor.execute('''
-            UPDATE properties SET
-                title = ?, price = ?, location = ?, category = ?,
-                status = ?, bedrooms = ?, bathrooms = ?, area = ?,
-                type = ?, description = ?, features = ?, images = ?
-            WHERE id = ?
-        ''', (
-            data.get('title'),
-            data.get('price'),
-            data.get('location'),
-            data.get('category'),
-            data.get('status', 'disponivel'),
-            data.get('bedrooms', 0),
-            data.get('bathrooms', 0),
-            data.get('area', 0),
-            data.get('type', 'apartamento'),
-            data.get('description', ''),
-            features,
-            images,
-            property_id
-        ))
-        
-        conn.commit()
-        conn.close()
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        except WriteQueueFull as e:
+            return write_queue_full(e)
         
         return jsonify({
             'success': True,
-            'message': 'Propriedade atualizada com sucesso'
+            'message': 'Propriedade atualizada com sucesso',
+            'property': row_to_property(row)
         })
         
     except Exception as e:
@@ -259,20 +2819,15 @@ def update_property(property_id):
 def delete_property(property_id):
     """Remove propriedade"""
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        # Verifica se a propriedade existe
-        cursor.execute('SELECT id FROM properties WHERE id = ?', (property_id,))
-        if not cursor.fetchone():
+        try:
+            write_queue.submit(remove_property, property_id)
+        except PropertyNotFound as e:
             return jsonify({
                 'success': False,
-                'error': 'Propriedade não encontrada'
+                'error': str(e)
             }), 404
-        
-        cursor.execute('DELETE FROM properties WHERE id = ?', (property_id,))
-        conn.commit()
-        conn.close()
+        except WriteQueueFull as e:
+            return write_queue_full(e)
         
         return jsonify({
             'success': True,
@@ -289,45 +2844,144 @@ def delete_property(property_id):
 def add_sale():
     """Registra uma venda"""
     try:
-        data = request.get_json()
-        
-        required_fields = ['property_id', 'sale_price']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({
-                    'success': False,
-                    'error': f'Campo obrigatório: {field}'
-                }), 400
+        try:
+            sale_id = write_queue.submit(record_sale, request.get_json())
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        except WriteQueueFull as e:
+            return write_queue_full(e)
         
-        sale_id = str(uuid.uuid4())
+        return jsonify({
+            'success': True,
+            'message': 'Venda registrada com sucesso',
+            'sale_id': sale_id
+        })
         
-        conn = get_db()
-        cursor = conn.cursor()
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+# ==================== LOTE DE OPERAÇÕES ====================
+
+BATCH_OPERATIONS = ('create', 'patch', 'delete', 'sale')
+
+def _resolve_reference(value, created):
+    """Troca "$<n>" pelo id do imóvel criado na operação n do mesmo lote"""
+    if isinstance(value, str) and value.startswith('$'):
+        index = value[1:]
+        if not index.isdigit() or int(index) not in created:
+            raise ValueError(f'Referência inválida: {value}')
+        return created[int(index)]
+    return value
+
+def apply_operation(conn, operation, created):
+    """Executa uma operação do lote; retorna os campos do resultado dela"""
+    if not isinstance(operation, dict):
+        raise ValueError('Operação inválida')
+    op = operation.get('op')
+    data = operation.get('data')
+    
+    if op == 'create':
+        return {'property_id': create_property(conn, data)}
+    if op == 'patch':
+        property_id = _resolve_reference(operation.get('id'), created)
+        return {'property': row_to_property(patch_property(conn, property_id, data))}
+    if op == 'delete':
+        property_id = _resolve_reference(operation.get('id'), created)
+        remove_property(conn, property_id)
+        return {'property_id': property_id}
+    if op == 'sale':
+        if isinstance(data, dict) and 'property_id' in data:
+            data = {**data, 'property_id': _resolve_reference(data['property_id'], created)}
+        return {'sale_id': record_sale(conn, data)}
+    raise ValueError(f"op deve ser um de: {', '.join(BATCH_OPERATIONS)}")
+
+class BatchFailed(Exception):
+    """Uma operação do lote falhou (todo o lote é desfeito)"""
+    
+    def __init__(self, index, error, results):
+        super().__init__(str(error))
+        self.index = index
+        self.error = error
+        self.results = results
+    
+    def __reduce__(self):
+        # Atravessa o socket da fila de escritas (pickle)
+        return BatchFailed, (self.index, self.error, self.results)
+
+def apply_batch(conn, operations):
+    """Executa as operações em ordem; levanta BatchFailed na primeira que falhar"""
+    results = []
+    created = {}
+    for index, operation in enumerate(operations):
+        op = operation.get('op') if isinstance(operation, dict) else None
+        try:
+            result = apply_operation(conn, operation, created)
+        except (ValueError, PropertyNotFound) as e:
+            # As anteriores são desfeitas junto: sem os ids que deixam de existir
+            results = [{'index': r['index'], 'op': r['op'], 'success': False, 'rolled_back': True}
+                       for r in results]
+            results.append({'index': index, 'op': op, 'success': False, 'error': str(e)})
+            raise BatchFailed(index, e, results)
+        if op == 'create':
+            created[index] = result['property_id']
+        results.append({'index': index, 'op': op, 'success': True, **result})
+    return results
+
+@app.route('/batch', methods=['POST'])
+def batch_operations():
+    """Aplica várias operações numa única transação (tudo ou nada)
+
+    Corpo: {"operations": [{"op": "create", "data": {...}},
+    {"op": "patch", "id": "...", "data": {...}}, {"op": "delete", "id": "..."},
+    {"op": "sale", "data": {...}}]}. Uma operação pode citar o imóvel
+    criado por outra anterior com "$<índice>" (ex.: {"id": "$0"}).
+    Se alguma falhar, nada é gravado e a resposta indica qual foi.
+    """
+    try:
+        body = request.get_json(silent=True)
+        operations = body.get('operations') if isinstance(body, dict) else None
+        if not isinstance(operations, list) or not operations:
+            return jsonify({
+                'success': False,
+                'error': 'Envie {"operations": [...]} com ao menos uma operação'
+            }), 400
+        if len(operations) > app.config['BATCH_MAX_OPERATIONS']:
+            return jsonify({
+                'success': False,
+                'error': f"Máximo de {app.config['BATCH_MAX_OPERATIONS']} operações por lote"
+            }), 400
         
-        # Adiciona venda
-        cursor.execute('''
-            INSERT INTO sales (id, property_id, sale_price, commission, client_name)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (
-            sale_id,
-            data['property_id'],
-            data['sale_price'],
-            data.get('commission', 0),
-            data.get('client_name', '')
-        ))
-        
-        # Atualiza status da propriedade para vendida
-        cursor.execute('''
-            UPDATE properties SET status = 'vendido' WHERE id = ?
-        ''', (data['property_id'],))
-        
-        conn.commit()
-        conn.close()
+        try:
+            operations = [
+                {**operation, 'data': with_stored_images(operation.get('data'))}
+                if isinstance(operation, dict) else operation
+                for operation in operations
+            ]
+            results = write_queue.submit(apply_batch, operations)
+        except BatchFailed as e:
+            return jsonify({
+                'success': False,
+                'error': f'A operação {e.index} falhou; nenhuma alteração foi gravada',
+                'failed_index': e.index,
+                'results': e.results
+            }), 404 if isinstance(e.error, PropertyNotFound) else 400
+        except ValueError as e:  # Imagem inválida
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        except WriteQueueFull as e:
+            return write_queue_full(e)
         
         return jsonify({
             'success': True,
-            'message': 'Venda registrada com sucesso',
-            'sale_id': sale_id
+            'results': results
         })
         
     except Exception as e:
@@ -336,60 +2990,637 @@ def add_sale():
             'error': str(e)
         }), 500
 
+# ==================== CONTADORES (VIEWS / LEADS) ====================
+
+def apply_counter_increments(conn, table, columns, rows):
+    """Grava um lote de contadores e sobe a versão dos contadores
+
+    Views/leads aparecem em GET /properties, e sem isso o GET condicional
+    seguiria respondendo 304 com contadores antigos.
+    """
+    apply_increments(conn, table, columns, rows)
+    conn.execute('''
+        UPDATE catalog_version
+        SET counters_version = counters_version + 1, counters_updated_at = ?
+        WHERE id = 1
+    ''', (time.time(),))
+
+# Os lotes passam pela fila de escritas sem subir a versão do catálogo
+# (submit_silent): um lote a cada poucos segundos invalidaria o ETag de
+# todas as rotas, inclusive /stats e relatórios, que não mostram contadores
+property_counters = WriteBehindCounters(
+    write_queue.submit_silent,
+    table='properties',
+    columns=('views', 'leads'),
+    apply=apply_counter_increments,
+    flush_interval=app.config['COUNTER_FLUSH_INTERVAL_MS'] / 1000,
+    flush_events=app.config['COUNTER_FLUSH_EVENTS']
+)
+
+@app.route('/properties/<property_id>/view', methods=['POST'])
+def register_view(property_id):
+    """Conta uma visualização (gravada em lote, sem esperar o banco)"""
+    property_counters.increment(property_id, 'views')
+    return jsonify({'success': True}), 202
+
+@app.route('/properties/<property_id>/lead', methods=['POST'])
+def register_lead(property_id):
+    """Conta um lead (gravado em lote, sem esperar o banco)"""
+    property_counters.increment(property_id, 'leads')
+    return jsonify({'success': True}), 202
+
+# ==================== FEED DE MUDANÇAS ====================
+
+def read_changes(conn, since, limit):
+    """Eventos com version > since, já com o imóvel atual para inserts/updates"""
+    rows = conn.execute('''
+        SELECT c.version, c.property_id, c.op, c.changed_at, p.*
+        FROM property_changes c
+        LEFT JOIN properties p ON p.id = c.property_id AND c.op != 'delete'
+        WHERE c.version > ?
+        ORDER BY c.version
+        LIMIT ?
+    ''', (since, limit)).fetchall()
+    
+    changes = []
+    for row in rows:
+        change = {
+            'version': row['version'],
+            'property_id': row['property_id'],
+            'op': row['op'],
+            'changed_at': row['changed_at']
+        }
+        if row['op'] != 'delete' and row['id'] is not None:
+            change['property'] = row_to_property(
+                {column: row[column] for column in PROPERTY_COLUMNS}
+            )
+        changes.append(change)
+    return changes
+
+def change_log_position(conn):
+    """Retorna (última versão, compactado até)"""
+    row = conn.execute('''
+        SELECT (SELECT COALESCE(MAX(version), 0) FROM property_changes),
+               (SELECT compacted_through FROM change_log_state WHERE id = 1)
+    ''').fetchone()
+    latest = max(row[0], row[1] or 0)
+    return latest, row[1] or 0
+
+@app.route('/changes', methods=['GET'])
+def get_changes():
+    """Retorna só o que mudou depois de ?since=<version>
+
+    Com wait=<segundos>, segura a requisição (long-poll) até surgir alguma
+    mudança ou o tempo acabar. Se since for anterior ao trecho já
+    compactado do log, a resposta vem com reset=true: o cliente deve
+    recarregar a listagem completa e continuar a partir de "version".
+    """
+    try:
+        conn = get_db()
+        since = request.args.get('since', 0, type=int)
+        limit = min(request.args.get('limit', 500, type=int), 5000)
+        wait = min(request.args.get('wait', 0, type=float), app.config['CHANGES_MAX_WAIT'])
+        
+        deadline = time.monotonic() + wait
+        latest, compacted_through = change_log_position(conn)
+        while latest <= since and time.monotonic() < deadline:
+            time.sleep(0.5)
+            latest, compacted_through = change_log_position(conn)
+        
+        if since < compacted_through or since > latest:
+            response = jsonify({
+                'success': True,
+                'reset': True,
+                'changes': [],
+                'version': latest
+            })
+        else:
+            changes = read_changes(conn, since, limit)
+            response = jsonify({
+                'success': True,
+                'reset': False,
+                'changes': changes,
+                'version': changes[-1]['version'] if changes else latest,
+                'has_more': len(changes) == limit
+            })
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/changes/stream', methods=['GET'])
+def stream_changes():
+    """Feed de mudanças via Server-Sent Events
+
+    Cada evento leva o número da versão no campo id, então o EventSource do
+    navegador retoma de onde parou (Last-Event-ID) ao reconectar. A conexão
+    é encerrada após CHANGES_STREAM_DURATION segundos para liberar o worker.
+    Ocupa uma thread do worker durante toda a conexão: no gunicorn use
+    workers gthread (gunicorn.conf.py), não síncronos.
+    """
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', 0, type=int)
+    duration = app.config['CHANGES_STREAM_DURATION']
+    
+    def generate():
+        conn = get_db()
+        deadline = time.monotonic() + duration
+        last_heartbeat = time.monotonic()
+        position = since
+        yield 'retry: 3000\n\n'
+        while time.monotonic() < deadline:
+            latest, compacted_through = change_log_position(conn)
+            if position < compacted_through or position > latest:
+                yield f'event: reset\nid: {latest}\ndata: {encode_json({"version": latest})}\n\n'
+                position = latest
+            elif latest > position:
+                for change in read_changes(conn, position, 500):
+                    position = change['version']
+                    yield f'id: {position}\ndata: {encode_json(change)}\n\n'
+                continue
+            elif time.monotonic() - last_heartbeat > 15:
+                last_heartbeat = time.monotonic()
+                yield ': heartbeat\n\n'
+            time.sleep(0.5)
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/stats', methods=['GET'])
+@conditional_get('private, no-cache')
 def get_stats():
-    """Retorna estatísticas do sistema"""
+    """Retorna estatísticas do sistema (mantidas por triggers)"""
     try:
-        conn = get_db()
-        cursor = conn.cursor()
+        return jsonify({
+            'success': True,
+            'stats': read_stats(get_db())
+        })
         
-        # Total de propriedades
-        cursor.execute('SELECT COUNT(*) FROM properties')
-        total_properties = cursor.fetchone()[0]
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/analytics/sales', methods=['GET'])
+@conditional_get('private, no-cache')
+def get_sales_analytics():
+    """Vendas, receita e comissão por período (lidas de sales_rollups)
+
+    Parâmetros: interval=day|week|month (padrão month), from/to
+    (AAAA-MM-DD, inclusive), category=<categoria> e by=category para
+    separar cada período por categoria.
+    """
+    try:
+        interval = request.args.get('interval', 'month')
+        if interval not in SALES_PERIODS:
+            return jsonify({
+                'success': False,
+                'error': f"interval deve ser um de: {', '.join(SALES_PERIODS)}"
+            }), 400
         
-        # Propriedades por categoria
-        cursor.execute('''
-            SELECT category, COUNT(*) as count 
-            FROM properties 
-            GROUP BY category
-        ''')
-        by_category = dict(cursor.fetchall())
+        where = ['period = ?', 'count != 0']
+        params = [interval]
+        for arg, operator in (('from', '>='), ('to', '<=')):
+            value = request.args.get(arg)
+            if not value:
+                continue
+            try:
+                datetime.strptime(value, '%Y-%m-%d')
+            except ValueError:
+                return jsonify({
+                    'success': False,
+                    'error': f'{arg} deve estar no formato AAAA-MM-DD'
+                }), 400
+            # Compara com o início do bucket que contém a data
+            where.append(f"bucket {operator} {SALES_PERIODS[interval].format('?')}")
+            params.append(value)
+        if request.args.get('category'):
+            where.append('category = ?')
+            params.append(request.args['category'])
         
-        # Propriedades por status
-        cursor.execute('''
-            SELECT status, COUNT(*) as count 
-            FROM properties 
-            GROUP BY status
-        ''')
-        by_status = dict(cursor.fetchall())
+        by_category = request.args.get('by') == 'category'
+        if by_category:
+            query = f'''
+                SELECT bucket, category, count, revenue, commission
+                FROM sales_rollups WHERE {' AND '.join(where)}
+                ORDER BY bucket, category
+            '''
+        else:
+            query = f'''
+                SELECT bucket, SUM(count) AS count, SUM(revenue) AS revenue,
+                       SUM(commission) AS commission
+                FROM sales_rollups WHERE {' AND '.join(where)}
+                GROUP BY bucket ORDER BY bucket
+            '''
         
-        # Total de vendas
-        cursor.execute('SELECT COUNT(*), SUM(sale_price) FROM sales')
-        sales_data = cursor.fetchone()
-        total_sales = sales_data[0] or 0
-        total_revenue = sales_data[1] or 0
+        series = []
+        totals = {'count': 0, 'revenue': 0, 'commission': 0}
+        for row in get_db().execute(query, params):
+            point = {'period': row['bucket']}
+            if by_category:
+                point['category'] = row['category']
+            for key in totals:
+                point[key] = row[key]
+                totals[key] += row[key]
+            series.append(point)
         
-        conn.close()
+        return jsonify({
+            'success': True,
+            'interval': interval,
+            'series': series,
+            'totals': totals
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def require_admin(view):
+    """Exige o header X-Admin-Token quando ADMIN_TOKEN está configurado"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = app.config.get('ADMIN_TOKEN')
+        if token and request.headers.get('X-Admin-Token') != token:
+            return jsonify({
+                'success': False,
+                'error': 'Acesso negado'
+            }), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+def rebuild_all_stats(conn):
+    """Recalcula estatísticas e rollups de vendas (roda no escritor)
+
+    Retorna as diferenças encontradas em relação a uma recontagem completa.
+    """
+    rollups_query = '''
+        SELECT period, bucket, category, count, ROUND(revenue, 2), ROUND(commission, 2)
+        FROM sales_rollups WHERE count != 0 ORDER BY 1, 2, 3
+    '''
+    
+    previous = read_stats(conn)
+    expected = count_stats(conn)
+    differences = {
+        key: {'rollup': previous[key], 'recount': expected[key]}
+        for key in expected
+        if previous[key] != expected[key]
+    }
+    
+    rebuild_stats(conn)
+    previous_rollups = [tuple(row) for row in conn.execute(rollups_query)]
+    rebuild_sales_rollups(conn)
+    rollups_consistent = previous_rollups == [tuple(row) for row in conn.execute(rollups_query)]
+    return {
+        'consistent': not differences,
+        'differences': differences,
+        'sales_rollups_consistent': rollups_consistent,
+        'stats': read_stats(conn)
+    }
+
+@app.route('/admin/stats/rebuild', methods=['POST'])
+@require_admin
+def rebuild_stats_endpoint():
+    """Recria as estatísticas do zero e confere com uma recontagem completa
+
+    Também recalcula os rollups de vendas de /analytics/sales.
+    """
+    try:
+        # Na fila de escritas, que também troca a versão do catálogo:
+        # clientes com ETag antigo recebem os números corrigidos
+        result = write_queue.submit(rebuild_all_stats)
         
         return jsonify({
             'success': True,
-            'stats': {
-                'total_properties': total_properties,
-                'total_sales': total_sales,
-                'total_revenue': total_revenue,
-                'by_category': by_category,
-                'by_status': by_status
-            }
+            **result
         })
         
+    except WriteQueueFull as e:
+        return write_queue_full(e)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+# ==================== MANUTENÇÃO ====================
+
+metrics.describe('maintenance_task_duration_seconds', 'histogram',
+                 'Duração das tarefas de manutenção do banco',
+                 buckets=(0.01, 0.1, 0.5, 1, 5, 30, 120, 600))
+metrics.describe('maintenance_task_failures_total', 'counter',
+                 'Tarefas de manutenção que falharam')
+
+# Variação de linhas (fração) a partir da qual as estatísticas de uma
+# tabela são consideradas velhas pelo "optimize"
+STATS_STALE_RATIO = 0.25
+
+def file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def checkpoint_wal(conn):
+    """Passa as páginas do WAL para o banco e, se der, zera o arquivo -wal
+
+    O autocheckpoint do SQLite copia as páginas mas nunca encolhe o
+    arquivo. PASSIVE copia o que puder sem esperar ninguém; só se ele
+    copiar o WAL inteiro (nenhum leitor preso a um retrato antigo, como
+    uma exportação longa) vem o TRUNCATE, que pega o lock de escrita e
+    espera no máximo MAINTENANCE_CHECKPOINT_BUSY_MS pelos leitores.
+    """
+    config = app.config
+    wal_path = config['DATABASE'] + '-wal'
+    before = file_size(wal_path)
+    busy, log_pages, checkpointed = conn.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchone()
+    mode = 'passive'
+    if not busy and checkpointed == log_pages:
+        conn.execute(f"PRAGMA busy_timeout = {int(config['MAINTENANCE_CHECKPOINT_BUSY_MS'])}")
+        try:
+            truncate = conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()
+        finally:
+            conn.execute(f"PRAGMA busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT'])}")
+        if not truncate[0]:
+            busy, log_pages, checkpointed = truncate
+            mode = 'truncate'
+    return {
+        'mode': mode,
+        'busy': bool(busy),
+        'log_pages': log_pages,
+        'checkpointed_pages': checkpointed,
+        'wal_bytes_before': before,
+        'wal_bytes_after': file_size(wal_path)
+    }
+
+def optimize_db(conn):
+    """Reanalisa, por amostragem, as tabelas cujas estatísticas envelheceram
+
+    Mesma ideia do PRAGMA optimize, que antes do SQLite 3.46 só considera
+    as tabelas consultadas pela própria conexão - e esta não consulta nada.
+    """
+    has_stats = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+    ).fetchone()
+    known = dict(conn.execute(
+        'SELECT tbl, MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 GROUP BY tbl'
+    ).fetchall()) if has_stats else {}
+    tables = [row[0] for row in conn.execute('''
+        SELECT DISTINCT tbl_name FROM sqlite_master
+        WHERE type = 'index' AND tbl_name NOT LIKE 'sqlite_%'
+    ''')]
+    stale = {}
+    for table in tables:
+        rows = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+        previous = known.get(table, 0)  # Tabela vazia no último ANALYZE: sem linha
+        if abs(rows - previous) > STATS_STALE_RATIO * max(rows, previous, 1):
+            stale[table] = {'rows': rows, 'analyzed_rows': previous}
+    if stale:
+        write_queue.submit_silent(analyze_tables, list(stale),
+                                  app.config['MAINTENANCE_ANALYSIS_LIMIT'])
+    return {'tables': len(tables), 'analyzed': stale}
+
+def analyze_tables(conn, tables, analysis_limit):
+    """ANALYZE das tabelas (todas, com tables=None); roda no escritor da fila
+
+    Grava em sqlite_stat1: pela fila, não disputa o lock de escrita com
+    o escritor. Não muda dados, então não sobe a versão do catálogo.
+    """
+    conn.execute(f'PRAGMA analysis_limit = {int(analysis_limit)}')
+    if tables is None:
+        conn.execute('ANALYZE')
+    for table in tables or ():
+        conn.execute(f'ANALYZE "{table}"')
+
+def analyze_db(conn):
+    """ANALYZE completo (sem amostragem) de todas as tabelas"""
+    write_queue.submit_silent(analyze_tables, None, 0)
+    return {'stat1_rows': conn.execute('SELECT COUNT(*) FROM sqlite_stat1').fetchone()[0]}
+
+def backup_files():
+    """Backups existentes do banco atual, do mais antigo ao mais novo"""
+    folder = app.config['BACKUP_DIR']
+    prefix = os.path.splitext(os.path.basename(app.config['DATABASE']))[0] + '-'
+    try:
+        names = os.listdir(folder)
+    except FileNotFoundError:
+        return []
+    return [os.path.join(folder, name) for name in sorted(names)
+            if name.startswith(prefix) and name.endswith('.db')]
+
+def backup_db(conn):
+    """Cópia consistente do banco pela API de backup do SQLite
+
+    Copia BACKUP_STEP_PAGES páginas por passo, com uma pausa entre eles,
+    para não disputar disco e CPU com as requests. A origem fica numa
+    transação de leitura do início ao fim: em WAL as escritas seguem
+    normalmente e o backup não recomeça a cada escrita (sem ela, o SQLite
+    reinicia a cópia quando outra conexão altera o banco).
+    """
+    config = app.config
+    os.makedirs(config['BACKUP_DIR'], exist_ok=True)
+    stem = os.path.splitext(os.path.basename(config['DATABASE']))[0]
+    path = os.path.join(config['BACKUP_DIR'], f'{stem}-{datetime.now():%Y%m%d-%H%M%S}.db')
+    partial = path + '.partial'
+    progress = {'steps': 0, 'pages': 0}
+    pause = config['BACKUP_STEP_SLEEP_MS'] / 1000
+
+    def on_step(status, remaining, total):
+        progress['steps'] += 1
+        progress['pages'] = total
+        if remaining and pause:
+            # O sleep= do backup() só vale quando o banco está ocupado
+            time.sleep(pause)
+
+    target = sqlite3.connect(partial)
+    try:
+        conn.execute('BEGIN')
+        try:
+            conn.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()  # Fixa o retrato
+            conn.backup(target, pages=config['BACKUP_STEP_PAGES'], progress=on_step)
+        finally:
+            conn.rollback()
+        check = target.execute('PRAGMA quick_check').fetchone()[0]
+    finally:
+        target.close()
+    if check != 'ok':
+        os.remove(partial)
+        raise RuntimeError(f'Backup corrompido (quick_check: {check})')
+    os.replace(partial, path)
+
+    removed = []
+    if config['BACKUP_KEEP'] > 0:
+        for old in backup_files()[:-config['BACKUP_KEEP']]:
+            os.remove(old)
+            removed.append(os.path.basename(old))
+    return {
+        'path': path,
+        'bytes': file_size(path),
+        'pages': progress['pages'],
+        'steps': progress['steps'],
+        'removed': removed
+    }
+
+def record_maintenance(task, seconds, ok):
+    if not app.config['METRICS_ENABLED']:
+        return
+    metrics.observe('maintenance_task_duration_seconds', {'task': task}, seconds)
+    if not ok:
+        metrics.inc('maintenance_task_failures_total', {'task': task})
+
+def maintenance_lock_path():
+    return app.config['DATABASE'] + '-maintenance.lock'
+
+# Todos os workers iniciam o agendador (gunicorn.conf.py), mas só o que
+# travar o arquivo <banco>-maintenance.lock executa as tarefas. As escritas
+# (histórico, ANALYZE) passam pela fila de escritas
+maintenance = MaintenanceScheduler(
+    connect_db,
+    {
+        'checkpoint': (app.config['MAINTENANCE_CHECKPOINT_INTERVAL'], checkpoint_wal),
+        'optimize': (app.config['MAINTENANCE_OPTIMIZE_INTERVAL'], optimize_db),
+        'analyze': (app.config['MAINTENANCE_ANALYZE_INTERVAL'], analyze_db),
+        'backup': (app.config['MAINTENANCE_BACKUP_INTERVAL'], backup_db),
+    },
+    lock_path=maintenance_lock_path,
+    check_interval=app.config['MAINTENANCE_CHECK_INTERVAL'],
+    on_run=record_maintenance,
+    # Histórico pelo escritor único (não é dado do catálogo: sem subir a versão)
+    submit=write_queue.submit_silent
+)
+
+@app.route('/admin/maintenance', methods=['GET'])
+@require_admin
+def maintenance_status():
+    """Estado da manutenção: tarefas, tempos, últimas execuções e backups"""
+    try:
+        conn = get_db()
+        database = app.config['DATABASE']
+        page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+        freelist = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        response = jsonify({
+            'success': True,
+            'leader_pid': maintenance.leader_pid(),
+            'tasks': maintenance.summary(conn),
+            'recent': maintenance.history(conn),
+            'database': {
+                'bytes': file_size(database),
+                'wal_bytes': file_size(database + '-wal'),
+                'page_count': page_count,
+                'freelist_count': freelist,
+                'schema_version': schema_version(conn)
+            },
+            'backups': [
+                {'name': os.path.basename(path), 'bytes': file_size(path),
+                 'created_at': datetime.fromtimestamp(os.path.getmtime(path)).isoformat()}
+                for path in reversed(backup_files())
+            ]
+        })
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+@app.cli.command('maintenance')
+@click.argument('task', type=click.Choice(sorted(maintenance.tasks)))
+def maintenance_command(task):
+    """Executa agora uma tarefa de manutenção (ex.: flask maintenance backup)"""
+    init_db()  # O histórico precisa da migração mais recente
+    result = maintenance.run(task)
+    click.echo(json.dumps(result, indent=2, ensure_ascii=False, default=str))
+    if not result['ok']:
+        raise SystemExit(1)
+
+# ==================== INICIALIZAÇÃO ====================
+
+# Rotas executadas em cada worker novo, em cada conexão do pool, para que
+# os statements mais usados já estejam preparados na primeira request
+WARMUP_PATHS = (
+    '/properties?limit=24',
+    '/properties?category=lancamentos&limit=24',
+    '/properties/facets',
+    '/stats',
+)
+
+def warm_caches(conn):
+    """Carrega os caches de leitura do processo
+
+    Com gunicorn --preload roda no mestre, antes do fork: os workers herdam
+    o índice de facetas pronto (copy-on-write) e só aplicam as mudanças
+    seguintes. A leitura do catálogo também deixa as páginas do banco no
+    cache do sistema operacional.
+    """
+    fts_available(conn)
+    geo_available(conn)
+    with facet_index.lock:
+        sync_facet_index(conn)
+
+def warm_worker():
+    """Abre as conexões do pool deste worker e prepara seus statements
+
+    Conexões SQLite não atravessam o fork, então isso roda em cada worker
+    (post_fork do gunicorn.conf.py), antes da primeira request.
+    """
+    if not app.config['WARMUP'] or app.config['SQLITE_POOL_SIZE'] <= 0:
+        return
+    started = time.perf_counter()
+    conns = [_pool.acquire() for _ in range(app.config['SQLITE_POOL_SIZE'])]
+    try:
+        for conn in conns:
+            for path in WARMUP_PATHS:
+                with app.test_request_context(path):
+                    g.db = conn
+                    try:
+                        app.view_functions[request.endpoint](**request.view_args)
+                    finally:
+                        g.pop('db', None)  # Volta ao pool só no fim
+    except Exception as e:
+        print(f"⚠️  Aquecimento do worker {os.getpid()} interrompido: {e}")
+    finally:
+        for conn in conns:
+            _pool.release(conn)
+    print(f"🔥 Worker {os.getpid()} aquecido em {(time.perf_counter() - started) * 1000:.0f} ms "
+          f"({len(conns)} conexões)")
+
+def create_app(config=None):
+    """Prepara a aplicação para servir e a retorna
+
+    Aplica as migrações pendentes e carrega os caches de leitura. No
+    gunicorn use "api:create_app()" (Procfile): com preload_app
+    (gunicorn.conf.py) isso roda uma única vez, no mestre, antes do fork.
+    config sobrescreve valores de app.config (ex.: DATABASE); o socket do
+    escritor e a trava da manutenção são calculados a partir dele no uso.
+    Tamanhos e intervalos dos serviços criados no import (fila de
+    escritas, contadores, limite de requests, agendador) vêm das
+    variáveis de ambiente.
+    """
+    if config:
+        app.config.update(config)
+    conn = connect_db(instrumented=False)  # Sem threads de métricas no mestre
+    try:
+        migrate_db(conn)
+        if app.config['WARMUP']:
+            warm_caches(conn)
+    finally:
+        conn.close()
+    return app
+
 if __name__ == '__main__':
     print("🚀 Iniciando API Backend...")
-    init_db()
+    create_app()
+    maintenance.start()
     print("✅ Servidor rodando em http://localhost:5001")
     app.run(host='0.0.0.0', port=5001, debug=True)
@@ -0,0 +1,329 @@
+"""
+SERVIDOR ASYNCIO (OPCIONAL)
+Serve o mesmo app do api.py (mesmas rotas e respostas) num loop asyncio,
+sem dependências extras. O loop só cuida das conexões: cada request roda
+num pool de threads limitado, então o SQLite nunca bloqueia o loop, e
+conexões ociosas (keep-alive, clientes lentos) não prendem nenhuma thread.
+
+- --threads: tamanho do pool que executa o app (e o SQLite);
+- --max-concurrency: requests em execução ao mesmo tempo; as demais
+  esperam na fila sem ocupar thread (e, se a espera passar de
+  SHED_QUEUE_MS, leituras públicas recebem 503);
+- SIGTERM/SIGINT: para de aceitar conexões, termina as requests em
+  andamento (até --shutdown-timeout s) e sai; os contadores de
+  views/leads são descarregados no encerramento, como no gunicorn;
+- --workers N: N processos compartilhando o mesmo socket (pré-fork).
+
+Uso:
+    python async_server.py --port 5001 --threads 32 --max-concurrency 64
+"""
+
+import argparse
+import asyncio
+import contextvars
+import io
+import os
+import signal
+import socket
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import unquote
+
+from api import create_app, maintenance, warm_worker
+
+_END = object()
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message=''):
+        super().__init__(message)
+        self.status = status
+
+
+class AsyncServer:
+    """Servidor HTTP/1.1 que entrega cada request ao app WSGI num pool de threads"""
+
+    def __init__(self, wsgi_app, threads=32, max_concurrency=64, shutdown_timeout=30,
+                 keepalive_timeout=75, max_body_size=64 * 1024 * 1024):
+        self.app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='async-app')
+        self.limit = asyncio.Semaphore(max_concurrency)
+        self.shutdown_timeout = shutdown_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.max_body_size = max_body_size
+        self.server = None
+        self.closing = False
+        self.active = set()  # Tarefas de conexões abertas
+        self.busy = set()    # ... das que estão no meio de uma request
+
+    async def serve(self, host=None, port=None, sock=None):
+        self.server = await asyncio.start_server(
+            self._handle_connection, host=host, port=port, sock=sock,
+            limit=64 * 1024, backlog=2048
+        )
+        loop = asyncio.get_running_loop()
+        stopped = asyncio.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stopped.set)
+        await stopped.wait()
+        await self.shutdown()
+
+    async def shutdown(self):
+        """Para de aceitar conexões e espera as requests em andamento"""
+        self.closing = True
+        self.server.close()
+        # Conexões paradas entre requests (keep-alive) podem fechar já
+        for task in self.active - self.busy:
+            task.cancel()
+        if self.busy:
+            _, pending = await asyncio.wait(self.busy, timeout=self.shutdown_timeout)
+            for task in pending:
+                task.cancel()
+        if self.active:
+            await asyncio.wait(self.active, timeout=5)
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    async def _handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self.active.add(task)
+        try:
+            while not self.closing:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader, writer),
+                                                     self.keepalive_timeout)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except HTTPError as e:
+                    await self._send_error(writer, e.status)
+                    break
+                if request is None:
+                    break
+                self.busy.add(task)
+                try:
+                    keep_alive = await self._respond(writer, *request)
+                finally:
+                    self.busy.discard(task)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.active.discard(task)
+            writer.close()
+
+    async def _read_request(self, reader, writer):
+        """Lê request line, headers e corpo; None quando o cliente fecha"""
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.IncompleteReadError as e:
+            if not e.partial.strip():
+                return None
+            raise
+        except asyncio.LimitOverrunError:
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, version = lines[0].split(' ')
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST)
+        headers = []
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, sep, value = line.partition(':')
+            if not sep:
+                raise HTTPError(HTTPStatus.BAD_REQUEST)
+            headers.append((name.strip().lower(), value.strip()))
+        header_map = dict(headers)
+
+        if 'chunked' in header_map.get('transfer-encoding', '').lower():
+            raise HTTPError(HTTPStatus.LENGTH_REQUIRED)
+        try:
+            length = int(header_map.get('content-length') or 0)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST)
+        if length > self.max_body_size:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        if length and header_map.get('expect', '').lower() == '100-continue':
+            writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+        body = await reader.readexactly(length) if length else b''
+        return method, target, version, headers, body
+
+    async def _respond(self, writer, method, target, version, headers, body):
+        """Executa o app para uma request; retorna se a conexão continua aberta"""
+        header_map = dict(headers)
+        connection = header_map.get('connection', '').lower()
+        keep_alive = (version == 'HTTP/1.1' and connection != 'close') or connection == 'keep-alive'
+        environ = self._environ(writer, method, target, version, headers, body)
+        response = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            if exc_info and response.get('sent'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['status'] = status
+            response['headers'] = response_headers
+            return lambda data: None  # write() legado não é suportado
+
+        # Toda a request roda no mesmo Context (o de Flask/métricas é
+        # baseado em contextvars), mesmo passando por threads diferentes
+        context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+
+        def call_app():
+            result = self.app(environ, start_response)
+            iterator = iter(result)
+            return result, iterator, next(iterator, _END)
+
+        def close(result):
+            if hasattr(result, 'close'):
+                result.close()
+
+        async with self.limit:
+            result, iterator, chunk = await loop.run_in_executor(self.executor, context.run, call_app)
+            try:
+                response_headers = list(response['headers'])
+                names = {name.lower() for name, _ in response_headers}
+                chunked = 'content-length' not in names and method != 'HEAD' and version == 'HTTP/1.1'
+                if 'content-length' not in names and not chunked:
+                    keep_alive = False
+                if chunked:
+                    response_headers.append(('Transfer-Encoding', 'chunked'))
+                if self.closing or not keep_alive:
+                    keep_alive = False
+                    response_headers.append(('Connection', 'close'))
+                elif version == 'HTTP/1.0':
+                    response_headers.append(('Connection', 'keep-alive'))
+                head = f"HTTP/1.1 {response['status']}\r\n" + ''.join(
+                    f'{name}: {value}\r\n' for name, value in response_headers
+                ) + '\r\n'
+                writer.write(head.encode('latin-1'))
+                response['sent'] = True
+
+                while chunk is not _END:
+                    if chunk and method != 'HEAD':
+                        writer.write(b'%x\r\n%s\r\n' % (len(chunk), chunk) if chunked else chunk)
+                        await writer.drain()  # Respeita clientes lentos (backpressure)
+                    chunk = await loop.run_in_executor(self.executor, context.run, next, iterator, _END)
+                if chunked:
+                    writer.write(b'0\r\n\r\n')
+                await writer.drain()
+            finally:
+                # close() dispara o teardown do Flask (devolve a conexão do pool)
+                await loop.run_in_executor(self.executor, context.run, close, result)
+        return keep_alive
+
+    def _environ(self, writer, method, target, version, headers, body):
+        path, _, query = target.partition('?')
+        sockname = writer.get_extra_info('sockname') or ('', 0)
+        peername = writer.get_extra_info('peername') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': unquote(path, 'latin-1'),
+            'QUERY_STRING': query,
+            'SERVER_NAME': str(sockname[0]),
+            'SERVER_PORT': str(sockname[1]),
+            'SERVER_PROTOCOL': version,
+            'REMOTE_ADDR': str(peername[0]),
+            'REMOTE_PORT': str(peername[1]),
+            'CONTENT_LENGTH': str(len(body)) if body else '',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in headers:
+            if name == 'content-type':
+                environ['CONTENT_TYPE'] = value
+            elif name != 'content-length':
+                key = 'HTTP_' + name.upper().replace('-', '_')
+                environ[key] = f'{environ[key]},{value}' if key in environ else value
+        # Sem proxy à frente, a espera por vaga no pool conta como fila
+        # para o controle de admissão do app
+        environ.setdefault('HTTP_X_REQUEST_START', f't={time.time():.6f}')
+        return environ
+
+    async def _send_error(self, writer, status):
+        status = HTTPStatus(status)
+        body = status.phrase.encode()
+        writer.write(
+            f'HTTP/1.1 {status.value} {status.phrase}\r\nContent-Type: text/plain\r\n'
+            f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode() + body
+        )
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+
+def run(args, sock, app):
+    if not app.config['SHED_CAPACITY']:
+        app.config['SHED_CAPACITY'] = args.workers * args.max_concurrency
+    warm_worker()  # Conexões do pool deste processo (depois do fork)
+    maintenance.start()
+    server = AsyncServer(
+        app, threads=args.threads, max_concurrency=args.max_concurrency,
+        shutdown_timeout=args.shutdown_timeout, keepalive_timeout=args.keepalive_timeout
+    )
+    asyncio.run(server.serve(sock=sock))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5001)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('ASYNC_WORKERS', 1)))
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('ASYNC_THREADS', 32)))
+    parser.add_argument('--max-concurrency', type=int,
+                        default=int(os.environ.get('ASYNC_MAX_CONCURRENCY', 64)))
+    parser.add_argument('--shutdown-timeout', type=float,
+                        default=float(os.environ.get('ASYNC_SHUTDOWN_TIMEOUT', 30)))
+    parser.add_argument('--keepalive-timeout', type=float,
+                        default=float(os.environ.get('ASYNC_KEEPALIVE_TIMEOUT', 75)))
+    args = parser.parse_args()
+
+    # Migrações e caches antes do fork, como o preload do gunicorn
+    app = create_app()
+    app.config['SERVER_PID'] = os.getpid()  # Socket do escritor é por mestre
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.setblocking(False)
+    print(f"✅ Servidor asyncio em http://{args.host}:{args.port} "
+          f"({args.workers} processo(s), {args.threads} threads, "
+          f"até {args.max_concurrency} requests simultâneas)")
+
+    if args.workers <= 1:
+        run(args, sock, app)
+        return
+
+    children = []
+    for _ in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            run(args, sock, app)
+            sys.exit(0)  # Roda os atexit do filho (contadores, métricas)
+        children.append(pid)
+
+    def forward(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for pid in children:
+        os.waitpid(pid, 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""
+BENCHMARK - CONTROLE DE ADMISSÃO SOB PICO DE LEITURAS
+Sobe a API com o comando do Procfile e simula um anúncio compartilhado em
+massa: muitos clientes (IPs diferentes no X-Forwarded-For) lendo
+GET /properties?category=... e /properties/facets sem parar, alguns
+long-polls (GET /changes?wait=...) parados nos workers, enquanto o
+painel grava (POST/PUT /properties, POST /sales) num ritmo fixo. Toda
+request leva X-Request-Start com o instante do envio, como faria o
+roteador do Heroku ou o nginx à frente da API.
+
+Roda duas vezes, sem e com o controle de admissão, e mostra a latência e
+as falhas das escritas do painel e quanto das leituras públicas foi
+atendido, limitado (429) ou descartado (503).
+
+Uso:
+    python benchmarks/bench_admission.py [--readers 48] [--long-polls 2] [--workers 4]
+        [--duration 15]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from load_test import (procfile_command, wait_until_healthy, percentile,  # noqa: E402
+                       new_property, CATEGORIES)
+from seed_data import seed_database  # noqa: E402
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+WITHOUT_ADMISSION = {'RATE_LIMIT_RPS': '0', 'SHED_PUBLIC_SHARE': '1', 'SHED_QUEUE_MS': '0'}
+
+
+def request(port, method, path, body=None, headers=None, timeout=60):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    headers = dict(headers or {}, **{'X-Request-Start': f't={time.time():.6f}'})
+    try:
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        data = response.read()
+        return response.status, data, response.getheader('Retry-After')
+    finally:
+        conn.close()
+
+
+def public_path(rng):
+    category = rng.choice(CATEGORIES)
+    return rng.choice((
+        f'/properties?category={category}&limit=24',
+        f'/properties/facets?category={category}',
+        f'/properties?category={category}&limit=24&sort=price_asc',
+    ))
+
+
+def run_spike(port, readers, long_polls, duration, writes_per_second, ids, since, seed):
+    stop_at = time.monotonic() + duration
+    lock = threading.Lock()
+    public = {'ok': [], 429: 0, 503: 0, 'errors': 0}
+    dashboard = {'ok': [], 'errors': 0}
+
+    def reader(index):
+        rng = random.Random(seed * 1000 + index)
+        # Cada leitor é um cliente diferente (IP próprio)
+        headers = {'X-Forwarded-For': f'10.0.{index // 250}.{index % 250 + 1}'}
+        while time.monotonic() < stop_at:
+            began = time.perf_counter()
+            try:
+                status, _, retry_after = request(port, 'GET', public_path(rng), headers=headers)
+            except OSError:
+                status = retry_after = None
+            elapsed = time.perf_counter() - began
+            with lock:
+                if status == 200:
+                    public['ok'].append(elapsed)
+                elif status in (429, 503):
+                    public[status] += 1
+                else:
+                    public['errors'] += 1
+            if retry_after:
+                time.sleep(float(retry_after))  # Cliente que respeita o Retry-After
+
+    def long_poll(index):
+        headers = {'X-Forwarded-For': f'10.1.0.{index + 1}'}
+        while time.monotonic() < stop_at:
+            try:
+                status, _, _ = request(port, 'GET', f'/changes?since={since}&wait=20', headers=headers)
+            except OSError:
+                status = None
+            if status != 200:
+                time.sleep(0.5)
+
+    def writer():
+        rng = random.Random(seed)
+        interval = 1 / writes_per_second
+        next_at = time.monotonic()
+        while time.monotonic() < stop_at:
+            kind = rng.choice(('create', 'update', 'sale'))
+            if kind == 'create':
+                method, path, body = 'POST', '/properties', new_property(rng)
+            elif kind == 'update':
+                method, path, body = 'PUT', f'/properties/{rng.choice(ids)}', new_property(rng)
+            else:
+                method, path = 'POST', '/sales'
+                body = {'property_id': rng.choice(ids), 'sale_price': 500000,
+                        'commission': 5000, 'client_name': 'Cliente teste'}
+            began = time.perf_counter()
+            try:
+                status, _, _ = request(port, method, path, json.dumps(body).encode(),
+                                    {'Content-Type': 'application/json'})
+            except OSError:
+                status = None
+            elapsed = time.perf_counter() - began
+            if status in (200, 201):
+                dashboard['ok'].append(elapsed)
+            else:
+                dashboard['errors'] += 1
+            next_at += interval
+            time.sleep(max(0.0, next_at - time.monotonic()))
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=long_poll, args=(i,), daemon=True) for i in range(long_polls)]
+    threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        if not thread.daemon:
+            thread.join()
+    public['ok'].sort()
+    dashboard['ok'].sort()
+    return public, dashboard
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', type=int, default=48, help='clientes lendo ao mesmo tempo')
+    parser.add_argument('--long-polls', type=int, default=2, help='long-polls em /changes')
+    parser.add_argument('--writes', type=float, default=5, help='escritas do painel por segundo')
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--properties', type=int, default=20000)
+    parser.add_argument('--port', type=int, default=5080)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, 'bench.db')
+        seed_database(database, args.properties, 300)
+        # Long-polls esperam por mudanças a partir da posição atual do feed
+        conn = sqlite3.connect(database)
+        since = conn.execute('SELECT COALESCE(MAX(version), 0) FROM property_changes').fetchone()[0]
+        conn.close()
+        base_env = dict(os.environ, DATABASE=database, PORT=str(args.port))
+
+        print(f"{'admissão':<10}{'painel p50':>11}{'p99':>8}{'máx':>8}{'falhas':>8}"
+              f"{'leituras/s':>12}{'p99':>8}{'429':>7}{'503':>7}{'erros':>7}")
+        for name, overrides in (('sem', WITHOUT_ADMISSION), ('com', {})):
+            env = dict(base_env, METRICS_DIR=os.path.join(tmp, f'metrics-{name}'), **overrides)
+            server = subprocess.Popen(procfile_command(args.port, args.workers), cwd=ROOT, env=env,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                wait_until_healthy(f'http://127.0.0.1:{args.port}')
+                _, body, _ = request(args.port, 'GET', '/properties?limit=200&fields=id')
+                ids = [p['id'] for p in json.loads(body)['properties']]
+                public, dashboard = run_spike(args.port, args.readers, args.long_polls,
+                                              args.duration, args.writes, ids, since, 42)
+            finally:
+                server.terminate()
+                server.wait(timeout=60)
+            writes = dashboard['ok']
+            print(f"{name:<10}{percentile(writes, 0.5) * 1000:>11.0f}{percentile(writes, 0.99) * 1000:>8.0f}"
+                  f"{(writes[-1] if writes else 0) * 1000:>8.0f}{dashboard['errors']:>8}"
+                  f"{len(public['ok']) / args.duration:>12.0f}{percentile(public['ok'], 0.99) * 1000:>8.0f}"
+                  f"{public[429]:>7}{public[503]:>7}{public['errors']:>7}")
+
+
+if __name__ == '__main__':
+    main()
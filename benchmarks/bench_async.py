@@ -0,0 +1,174 @@
+"""
+BENCHMARK - SERVIDOR ASYNCIO x SERVIDORES SÍNCRONOS
+Sobe a API de três formas sobre o mesmo banco sintético e abre muitas
+conexões keep-alive simultâneas:
+- gunicorn: comando do Procfile (workers síncronos);
+- werkzeug: app.run(), como no backend/production_server.py;
+- async: async_server.py (loop asyncio + pool de threads).
+
+Uma parte das conexões fica em long-poll (GET /changes?wait=...), como
+um painel esperando novidades, e o resto faz leituras rápidas
+(/properties, /stats, /health). Mostra vazão e latência das leituras
+rápidas e quantas falharam (timeout/conexão recusada).
+
+Uso:
+    python benchmarks/bench_async.py [--connections 50,200,1000] [--long-poll 0.2]
+        [--servers gunicorn,werkzeug,async] [--duration 10]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from load_test import procfile_command, wait_until_healthy, percentile  # noqa: E402
+import api  # noqa: E402
+from seed_data import seed_database  # noqa: E402
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+CATEGORIES = ('lancamentos', 'mais-procurados', 'beira-mar', 'pronto-morar')
+WERKZEUG_COMMAND = ('from api import app; import os; '
+                    "app.run(host='127.0.0.1', port=int(os.environ['PORT']), debug=False)")
+
+
+def server_command(name, port, args):
+    if name == 'gunicorn':
+        return procfile_command(port, args.workers)
+    if name == 'werkzeug':
+        return [sys.executable, '-c', WERKZEUG_COMMAND]
+    return [sys.executable, 'async_server.py', '--port', str(port), '--workers', str(args.workers),
+            '--threads', str(args.threads), '--max-concurrency', str(args.threads * 2)]
+
+
+def fast_request(rng):
+    return rng.choice((
+        f'/properties?category={rng.choice(CATEGORIES)}&limit=24',
+        f'/properties?category={rng.choice(CATEGORIES)}&limit=24&fields=title,price,cover_image',
+        '/stats',
+        '/health',
+    ))
+
+
+async def http_get(state, host, port, path, timeout):
+    """GET com conexão reaproveitada; devolve o status (reabre se preciso)"""
+    if state.get('writer') is None:
+        state['reader'], state['writer'] = await asyncio.wait_for(
+            asyncio.open_connection(host, port), timeout)
+    reader, writer = state['reader'], state['writer']
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n'.encode())
+
+    async def read_response():
+        head = await reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        status = int(lines[0].split()[1])
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if 'content-length' in headers:
+            await reader.readexactly(int(headers['content-length']))
+        elif headers.get('transfer-encoding') == 'chunked':
+            while True:
+                size = int((await reader.readuntil(b'\r\n')).strip(), 16)
+                await reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        else:
+            await reader.read()
+            headers['connection'] = 'close'
+        return status, headers
+
+    try:
+        status, headers = await asyncio.wait_for(read_response(), timeout)
+    except BaseException:
+        writer.close()
+        state['writer'] = None
+        raise
+    if headers.get('connection', '').lower() == 'close':
+        writer.close()
+        state['writer'] = None
+    return status
+
+
+async def run_clients(port, connections, long_poll_share, duration, since, seed):
+    latencies, errors, long_polls = [], [0], [0]
+    stop_at = time.monotonic() + duration
+
+    async def client(index):
+        rng = random.Random(seed * 10000 + index)
+        state = {}
+        is_long_poll = index < connections * long_poll_share
+        while time.monotonic() < stop_at:
+            if is_long_poll:
+                path, timeout = f'/changes?since={since}&wait=5', 30
+            else:
+                path, timeout = fast_request(rng), 15
+            began = time.perf_counter()
+            try:
+                status = await http_get(state, '127.0.0.1', port, path, timeout)
+                ok = status < 500
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                ok = False
+                await asyncio.sleep(0.1)
+            if is_long_poll:
+                long_polls[0] += ok
+            elif ok:
+                latencies.append(time.perf_counter() - began)
+            else:
+                errors[0] += 1
+        if state.get('writer'):
+            state['writer'].close()
+
+    await asyncio.gather(*(client(i) for i in range(connections)))
+    return sorted(latencies), errors[0], long_polls[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--servers', default='gunicorn,werkzeug,async')
+    parser.add_argument('--connections', default='50,200,1000')
+    parser.add_argument('--long-poll', type=float, default=0.2, help='fração das conexões em long-poll')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=2, help='processos (gunicorn e async)')
+    parser.add_argument('--threads', type=int, default=16, help='threads do pool do async_server')
+    parser.add_argument('--properties', type=int, default=5000)
+    parser.add_argument('--port', type=int, default=5078)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, 'bench.db')
+        seed_database(database, args.properties, 300)
+        # Long-polls esperam por mudanças que não chegam: seguram a conexão
+        # (e, nos servidores síncronos, o worker) por wait segundos
+        conn = api.connect_db()
+        since = api.change_log_position(conn)[0]
+        conn.close()
+        env = dict(os.environ, DATABASE=database, PORT=str(args.port),
+                   METRICS_DIR=os.path.join(tmp, 'metrics'))
+
+        print(f"{'servidor':<10}{'conexões':>9}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}"
+              f"{'falhas':>8}{'long-polls':>12}")
+        for name in args.servers.split(','):
+            server = subprocess.Popen(server_command(name, args.port, args), cwd=ROOT, env=env,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                wait_until_healthy(f'http://127.0.0.1:{args.port}')
+                for connections in (int(c) for c in args.connections.split(',')):
+                    values, errors, long_polls = asyncio.run(run_clients(
+                        args.port, connections, args.long_poll, args.duration, since, 42))
+                    print(f'{name:<10}{connections:>9}{len(values) / args.duration:>9.0f}'
+                          f'{percentile(values, 0.50) * 1000:>9.1f}{percentile(values, 0.99) * 1000:>9.1f}'
+                          f'{errors:>8}{long_polls:>12}')
+            finally:
+                server.terminate()
+                server.wait(timeout=60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+BENCHMARK - PARTIDA A FRIO DOS WORKERS
+Sobe a API repetidas vezes sobre o mesmo banco sintético e mede:
+- partida: do spawn do gunicorn até o primeiro /health com 200;
+- primeiras requests: latência das primeiras chamadas a cada rota pesada
+  (a primeira de cada worker paga conexões, statements e índice de
+  facetas se nada foi aquecido);
+- memória: PSS somado do mestre e dos workers (/proc/<pid>/smaps_rollup).
+
+Compara o comando antigo (gunicorn api:app, sem preload nem aquecimento)
+com o comando atual do Procfile (create_app() + gunicorn.conf.py).
+
+Uso:
+    python benchmarks/bench_cold_start.py [--runs 5] [--workers 4] [--properties 20000]
+"""
+
+import argparse
+import http.client
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from load_test import procfile_command, percentile  # noqa: E402
+from seed_data import seed_database  # noqa: E402
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+FIRST_REQUESTS = (
+    '/properties?category=lancamentos&limit=24',
+    '/properties/facets?category=beira-mar',
+    '/properties/facets?min_price=300000&max_price=900000',
+    '/properties?limit=24&sort=price_asc',
+    '/stats',
+)
+
+
+def legacy_command(port, workers):
+    # -c /dev/null: ignora o gunicorn.conf.py (sem preload nem post_fork)
+    return ['gunicorn', '-c', '/dev/null', '--bind', f'127.0.0.1:{port}',
+            '--workers', str(workers), 'api:app']
+
+
+def get(port, path, timeout=30):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        conn.request('GET', path)
+        response = conn.getresponse()
+        response.read()
+        return response.status
+    finally:
+        conn.close()
+
+
+def wait_healthy(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if get(port, '/health', timeout=2) == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError('API não respondeu ao /health')
+
+
+def process_tree(pid):
+    pids = [pid]
+    for child in os.listdir(f'/proc/{pid}/task'):
+        try:
+            with open(f'/proc/{pid}/task/{child}/children') as f:
+                pids.extend(int(p) for p in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def pss_mb(pid):
+    total = 0
+    for p in process_tree(pid):
+        try:
+            with open(f'/proc/{p}/smaps_rollup') as f:
+                for line in f:
+                    if line.startswith('Pss:'):
+                        total += int(line.split()[1])
+        except OSError:
+            pass
+    return total / 1024
+
+
+def measure(command, env, port, workers):
+    started = time.perf_counter()
+    server = subprocess.Popen(command, cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_healthy(port)
+        ready = time.perf_counter() - started
+        # Uma rodada por worker: sem keep-alive cada conexão pode cair num
+        # worker diferente, então as primeiras pegam workers ainda frios
+        first = []
+        for _ in range(workers):
+            for path in FIRST_REQUESTS:
+                began = time.perf_counter()
+                status = get(port, path)
+                if status != 200:
+                    raise RuntimeError(f'{path} respondeu {status}')
+                first.append(time.perf_counter() - began)
+        memory = pss_mb(server.pid) if os.path.exists('/proc/self/smaps_rollup') else 0
+        return ready, sorted(first), memory
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--properties', type=int, default=20000)
+    parser.add_argument('--port', type=int, default=5079)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, 'bench.db')
+        seed_database(database, args.properties, 300)
+        env = dict(os.environ, DATABASE=database, PORT=str(args.port),
+                   METRICS_DIR=os.path.join(tmp, 'metrics'))
+
+        print(f"{'comando':<10}{'partida ms':>12}{'1ª req p50':>12}{'1ª req máx':>12}"
+              f"{'total 1ªs ms':>14}{'PSS MB':>9}")
+        for name, command in (('antigo', legacy_command(args.port, args.workers)),
+                              ('Procfile', procfile_command(args.port, args.workers))):
+            readies, firsts, totals, memories = [], [], [], []
+            for _ in range(args.runs):
+                ready, first, memory = measure(command, env, args.port, args.workers)
+                readies.append(ready)
+                firsts.extend(first)
+                totals.append(sum(first))
+                memories.append(memory)
+            firsts.sort()
+            readies.sort()
+            totals.sort()
+            print(f'{name:<10}{percentile(readies, 0.5) * 1000:>12.0f}'
+                  f'{percentile(firsts, 0.5) * 1000:>12.1f}{firsts[-1] * 1000:>12.1f}'
+                  f'{percentile(totals, 0.5) * 1000:>14.0f}{sum(memories) / len(memories):>9.0f}')
+
+
+if __name__ == '__main__':
+    main()
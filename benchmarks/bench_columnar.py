@@ -0,0 +1,139 @@
+"""
+BENCHMARK - FORMATO COLUNAR x FORMATO DE LINHAS
+Compara GET /properties (lista de objetos) com GET /properties?format=columnar
+(uma lista por campo + dicionários) sobre o mesmo banco sintético:
+- tamanho da resposta, sem compressão e com gzip (como a API envia);
+- tempo de parse em Python (json.loads) e, se o node estiver instalado,
+  no V8: JSON.parse e JSON.parse + decodeProperties() de js/api-config.js,
+  que é o que a página de categoria executa.
+
+Também confere que o colunar decodificado é igual ao formato de linhas.
+
+Uso:
+    python benchmarks/bench_columnar.py [--properties 20000] [--repeat 20]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from load_test import CATEGORIES  # noqa: E402
+from seed_data import seed_database  # noqa: E402
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+QUERIES = [f'category={category}' for category in CATEGORIES[:2]] + [
+    'category=lancamentos&limit=24',
+    'category=beira-mar&fields=id,title,price,location,category,status,cover_image',
+]
+
+# Carrega js/api-config.js num contexto com "window" e mede no V8
+NODE_SCRIPT = r'''
+const fs = require('fs');
+const vm = require('vm');
+const [configPath, rowsPath, columnarPath, repeat] = process.argv.slice(1);
+const context = { window: { location: { hostname: 'bench' } }, console: { log() {} } };
+vm.createContext(context);
+vm.runInContext(fs.readFileSync(configPath, 'utf8') + '\nthis.decodeProperties = decodeProperties;', context);
+const decode = context.decodeProperties;
+const rows = fs.readFileSync(rowsPath, 'utf8');
+const columnar = fs.readFileSync(columnarPath, 'utf8');
+function best(fn) {
+    let fastest = Infinity;
+    for (let i = 0; i < Number(repeat); i++) {
+        const start = process.hrtime.bigint();
+        fn();
+        fastest = Math.min(fastest, Number(process.hrtime.bigint() - start) / 1e6);
+    }
+    return fastest;
+}
+const same = JSON.stringify(decode(JSON.parse(columnar)).properties) === JSON.stringify(JSON.parse(rows).properties);
+console.log(JSON.stringify({
+    rows: best(() => JSON.parse(rows)),
+    columnar: best(() => JSON.parse(columnar)),
+    decoded: best(() => decode(JSON.parse(columnar))),
+    same
+}));
+'''
+
+
+def best_of(repeat, fn):
+    fastest = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        fastest = min(fastest, time.perf_counter() - start)
+    return fastest
+
+
+def decode_columnar(payload):
+    """Mesmo algoritmo do decodeProperties() de js/api-config.js"""
+    columns, dictionaries = payload['columns'], payload['dictionaries']
+    properties = [{} for _ in range(payload['count'])]
+    for name, values in columns.items():
+        dictionary = dictionaries.get(name)
+        for item, value in zip(properties, values):
+            item[name] = dictionary[value] if dictionary else value
+    return properties
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--properties', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    node = shutil.which('node')
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, 'bench.db')
+        os.environ.update(DATABASE=database, METRICS_DIR=os.path.join(tmp, 'metrics'))
+        seed_database(database, args.properties, 300)
+        import api
+        client = api.app.test_client()
+
+        print(f"{'consulta':<36}{'imóveis':>8}{'linhas KB':>11}{'colunar KB':>12}{'gzip l/c KB':>14}"
+              f"{'py l/c ms':>13}{'js l/c+dec ms':>18}")
+        for query in QUERIES:
+            bodies = {}
+            for name, suffix in (('rows', ''), ('columnar', '&format=columnar')):
+                response = client.get(f'/properties?{query}{suffix}')
+                assert response.status_code == 200, response.data[:200]
+                bodies[name] = response.get_data()
+            rows = json.loads(bodies['rows'])
+            columnar = json.loads(bodies['columnar'])
+            assert decode_columnar(columnar) == rows['properties'], 'colunar difere das linhas'
+
+            sizes = {name: len(body) / 1024 for name, body in bodies.items()}
+            gzipped = {name: len(gzip.compress(body, api.app.config['COMPRESS_LEVEL'])) / 1024
+                       for name, body in bodies.items()}
+            python = {name: best_of(args.repeat, lambda body=body: json.loads(body)) * 1000
+                      for name, body in bodies.items()}
+
+            javascript = '-'
+            if node:
+                paths = {}
+                for name, body in bodies.items():
+                    paths[name] = os.path.join(tmp, f'{name}.json')
+                    with open(paths[name], 'wb') as f:
+                        f.write(body)
+                result = json.loads(subprocess.check_output([
+                    node, '-e', NODE_SCRIPT, os.path.join(ROOT, 'js', 'api-config.js'),
+                    paths['rows'], paths['columnar'], str(args.repeat)
+                ]))
+                assert result['same'], 'decodeProperties difere das linhas'
+                javascript = f"{result['rows']:.1f}/{result['decoded']:.1f}"
+
+            print(f"{query[:35]:<36}{rows['count']:>8}{sizes['rows']:>11.0f}{sizes['columnar']:>12.0f}"
+                  f"{gzipped['rows']:>7.0f}/{gzipped['columnar']:<6.0f}"
+                  f"{python['rows']:>6.1f}/{python['columnar']:<6.1f}{javascript:>18}")
+
+
+if __name__ == '__main__':
+    main()
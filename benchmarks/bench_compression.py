@@ -0,0 +1,65 @@
+"""
+BENCHMARK - COMPRESSÃO DAS RESPOSTAS DA API
+Mostra os bytes trafegados com e sem gzip (Accept-Encoding) nas rotas
+de listagem e do dashboard, com um catálogo sintético.
+
+Uso:
+    python benchmarks/bench_compression.py [--rows 500]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import api  # noqa: E402
+
+URLS = (
+    '/properties',
+    '/properties?category=beira-mar',
+    '/properties?fields=title,price,location,bedrooms,cover_image',
+    '/properties?stream=1',
+    '/properties/export',
+    '/stats',
+)
+
+
+def seed(client, rows):
+    for i in range(rows):
+        client.post('/properties', json={
+            'title': f'Apartamento {i} com vista para o mar',
+            'price': 350000 + i * 1500,
+            'location': ('Ponta Verde', 'Jatiúca', 'Pajuçara', 'Cruz das Almas')[i % 4] + ' - Maceió/AL',
+            'category': ('lancamentos', 'mais-procurados', 'beira-mar', 'pronto-morar')[i % 4],
+            'bedrooms': 1 + i % 4,
+            'bathrooms': 1 + i % 3,
+            'area': 45 + i % 120,
+            'description': 'Nascente, andar alto, a poucos metros da praia. ' * 3,
+            'features': ['piscina', 'varanda gourmet', 'academia', 'portaria 24h'],
+            'images': [f'https://marcelo-imoveis-api.onrender.com/images/{i:064x}.jpg'],
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        api.app.config['DATABASE'] = os.path.join(tmp, 'bench.db')
+        api.init_db()
+        client = api.app.test_client()
+        seed(client, args.rows)
+
+        print(f"{'rota':<64}{'sem gzip':>12}{'gzip':>10}{'redução':>10}")
+        for url in URLS:
+            plain = len(client.get(url).data)
+            compressed = len(client.get(url, headers={'Accept-Encoding': 'gzip'}).data)
+            print(f'{url:<64}{plain:>12,}{compressed:>10,}{1 - compressed / plain:>10.0%}')
+        api._pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
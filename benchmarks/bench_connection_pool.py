@@ -0,0 +1,88 @@
+"""
+BENCHMARK - POOL DE CONEXÕES SQLITE
+Compara requests/segundo em GET /properties com a conexão antiga
+(uma sqlite3.connect por request, sem PRAGMAs) e com o pool + WAL.
+
+Uso:
+    python benchmarks/bench_connection_pool.py [--rows 500] [--seconds 5] [--limit 20]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import api  # noqa: E402
+
+
+def legacy_connect():
+    """Conexão como era antes: sem pool e sem PRAGMAs"""
+    conn = sqlite3.connect(api.app.config['DATABASE'])
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def seed(rows):
+    conn = api.connect_db()
+    conn.executemany(
+        'INSERT INTO properties (id, title, price, location, category, features, images) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+        [
+            (f'prop-{i}', f'Imóvel {i}', 250000 + i * 1000, 'Ponta Verde - Maceió/AL',
+             ('lancamentos', 'mais-procurados', 'beira-mar', 'pronto-morar')[i % 4],
+             '["piscina", "varanda"]', '[]')
+            for i in range(rows)
+        ]
+    )
+    conn.commit()
+    conn.close()
+
+
+def run(client, url, seconds):
+    deadline = time.perf_counter() + seconds
+    count = 0
+    while time.perf_counter() < deadline:
+        response = client.get(url)
+        assert response.status_code == 200, response.data
+        count += 1
+    return count / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=500)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    url = f'/properties?category=beira-mar&limit={args.limit}'
+    client = api.app.test_client()
+    original_connect = api.connect_db
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, pool_size in (('antes (connect por request)', 0), ('depois (pool + WAL)', 8)):
+            api.app.config['DATABASE'] = os.path.join(tmp, f'bench-{pool_size}.db')
+            api.app.config['SQLITE_POOL_SIZE'] = pool_size
+            api.connect_db = original_connect
+            api.init_db()
+            seed(args.rows)
+            if pool_size == 0:
+                api.connect_db = legacy_connect
+
+            run(client, url, 0.5)  # aquecimento
+            results[label] = run(client, url, args.seconds)
+            api.connect_db = original_connect
+            api._pool.close_all()
+
+    print(f'GET {url} ({args.rows} imóveis)')
+    for label, rps in results.items():
+        print(f'  {label:<30} {rps:10.1f} req/s')
+
+
+if __name__ == '__main__':
+    main()
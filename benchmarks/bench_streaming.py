@@ -0,0 +1,80 @@
+"""
+BENCHMARK - LISTAGEM EM STREAMING
+Compara GET /properties normal (lista montada em memória + jsonify) com
+GET /properties?stream=1 (fetchmany + JSON incremental) numa tabela
+sintética: tempo até o primeiro byte, tempo total e pico de memória.
+
+Uso:
+    python benchmarks/bench_streaming.py [--rows 100000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import api  # noqa: E402
+
+
+def seed(rows):
+    conn = api.connect_db()
+    conn.executemany(
+        'INSERT INTO properties (id, title, price, location, category, description, '
+        'features, images, date_added) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        (
+            (f'prop-{i:07d}', f'Apartamento {i} na Ponta Verde', 250000 + i * 10,
+             'Ponta Verde - Maceió/AL', 'beira-mar',
+             'Apartamento amplo, nascente, a 100 m da praia. ' * 4,
+             '["piscina", "varanda gourmet", "academia"]',
+             '["/uploads/a.jpg", "/uploads/b.jpg"]',
+             f'2025-{1 + i % 12:02d}-{1 + i % 28:02d} 12:00:00')
+            for i in range(rows)
+        )
+    )
+    conn.commit()
+    conn.close()
+
+
+def measure(client, url):
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(url, buffered=False)
+    chunks = response.iter_encoded()
+    first = next(chunks)
+    ttfb = time.perf_counter() - start
+    size = len(first) + sum(len(chunk) for chunk in chunks)
+    total = time.perf_counter() - start
+    response.close()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return ttfb, total, peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        api.app.config['DATABASE'] = os.path.join(tmp, 'bench.db')
+        api.init_db()
+        seed(args.rows)
+        client = api.app.test_client()
+        client.get('/properties?limit=1')  # aquecimento
+
+        print(f'GET /properties ({args.rows} imóveis, encoder: '
+              f"{'orjson' if api.orjson else 'json'})")
+        for label, url in (('normal', '/properties'), ('stream=1', '/properties?stream=1')):
+            ttfb, total, peak, size = measure(client, url)
+            print(f'  {label:<10} primeiro byte {ttfb * 1000:8.1f} ms   '
+                  f'total {total * 1000:8.1f} ms   pico {peak / 2**20:7.1f} MiB   '
+                  f'{size / 2**20:6.1f} MiB')
+        api._pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,419 @@
+"""
+TESTE DE CARGA DA API
+Sobe a API com o mesmo comando do Procfile (gunicorn 'api:create_app()') sobre um
+banco sintético e dispara uma mistura realista de leituras e escritas
+em todas as rotas. Mostra vazão e latência p50/p95/p99 por rota e salva
+o resultado em JSON para comparar execuções (regressões).
+
+Uso:
+    python benchmarks/load_test.py --properties 10000 --workers 4 --concurrency 16 --duration 30
+    python benchmarks/load_test.py --url http://localhost:5001 --duration 30
+    python benchmarks/load_test.py ... --compare benchmarks/results/<anterior>.json
+
+Observação: /changes/stream (SSE) mantém a conexão aberta por minutos e
+ocuparia um worker síncrono inteiro; ele fica fora da mistura.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import shlex
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+CATEGORIES = ('lancamentos', 'mais-procurados', 'beira-mar', 'pronto-morar')
+SEARCHES = ('ponta verde', 'varanda gourmet', 'jatiuca', 'cobertura', 'piscina', 'pajucara')
+TINY_PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 64
+
+
+class Catalog:
+    """Ids conhecidos pelo teste (os criados durante a carga podem ser apagados)"""
+
+    def __init__(self, ids):
+        self.ids = list(ids)
+        self.created = []
+        self.image_names = []
+        self.lock = threading.Lock()
+
+    def any_id(self, rng):
+        with self.lock:
+            return rng.choice(self.ids) if self.ids else 'inexistente'
+
+    def add(self, property_id):
+        with self.lock:
+            self.ids.append(property_id)
+            self.created.append(property_id)
+
+    def pop_created(self, rng):
+        with self.lock:
+            if not self.created:
+                return None
+            property_id = self.created.pop(rng.randrange(len(self.created)))
+            self.ids.remove(property_id)
+            return property_id
+
+
+def new_property(rng):
+    return {
+        'title': f'Imóvel teste de carga {uuid.uuid4().hex[:8]}',
+        'price': rng.randrange(200, 3000) * 1000,
+        'location': rng.choice(('Ponta Verde', 'Jatiúca', 'Pajuçara', 'Farol')) + ' - Maceió/AL',
+        'category': rng.choice(CATEGORIES),
+        'bedrooms': rng.randint(1, 4),
+        'bathrooms': rng.randint(1, 3),
+        'area': rng.randint(40, 200),
+        'features': ['piscina', 'varanda gourmet'],
+    }
+
+
+def multipart(field, filename, data):
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; '
+            f'filename="{filename}"\r\nContent-Type: application/octet-stream\r\n\r\n').encode()
+    body += data + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+# Cada operação: (rótulo, peso, função rng, catálogo -> (método, caminho, corpo, headers))
+def op_list_category(rng, catalog):
+    return 'GET', f'/properties?category={rng.choice(CATEGORIES)}&limit=24', None, {}
+
+
+def op_list_cards(rng, catalog):
+    return ('GET', f'/properties?category={rng.choice(CATEGORIES)}&limit=24'
+            '&fields=title,price,location,bedrooms,cover_image', None, {})
+
+
+def op_list_filtered(rng, catalog):
+    price_min = rng.randrange(200, 800) * 1000
+    return ('GET', f'/properties?price_min={price_min}&price_max={price_min * 2}'
+            f'&bedrooms={rng.randint(1, 3)}&sort=price_asc&limit=24', None, {})
+
+
+def op_list_all(rng, catalog):
+    return 'GET', '/properties', None, {'Accept-Encoding': 'gzip'}
+
+
+def op_search(rng, catalog):
+    return 'GET', f"/properties?q={rng.choice(SEARCHES).replace(' ', '+')}&limit=24", None, {}
+
+
+def op_stats(rng, catalog):
+    return 'GET', '/stats', None, {}
+
+
+def op_health(rng, catalog):
+    return 'GET', '/health', None, {}
+
+
+def op_changes(rng, catalog):
+    return 'GET', '/changes?since=0&limit=100', None, {}
+
+
+def op_export(rng, catalog):
+    return 'GET', f'/properties/export?category={rng.choice(CATEGORIES)}', None, {}
+
+
+def op_view(rng, catalog):
+    return 'POST', f'/properties/{catalog.any_id(rng)}/view', b'', {}
+
+
+def op_lead(rng, catalog):
+    return 'POST', f'/properties/{catalog.any_id(rng)}/lead', b'', {}
+
+
+def op_create(rng, catalog):
+    return 'POST', '/properties', json.dumps(new_property(rng)).encode(), {'Content-Type': 'application/json'}
+
+
+def op_update(rng, catalog):
+    data = new_property(rng)
+    return ('PUT', f'/properties/{catalog.any_id(rng)}', json.dumps(data).encode(),
+            {'Content-Type': 'application/json'})
+
+
+def op_delete(rng, catalog):
+    property_id = catalog.pop_created(rng) or 'inexistente'
+    return 'DELETE', f'/properties/{property_id}', None, {}
+
+
+def op_sale(rng, catalog):
+    body = {'property_id': catalog.any_id(rng), 'sale_price': rng.randrange(200, 2000) * 1000,
+            'commission': 5000, 'client_name': 'Cliente teste'}
+    return 'POST', '/sales', json.dumps(body).encode(), {'Content-Type': 'application/json'}
+
+
+def op_import(rng, catalog):
+    lines = '\n'.join(json.dumps(new_property(rng)) for _ in range(20))
+    return 'POST', '/properties/import', lines.encode(), {'Content-Type': 'application/x-ndjson'}
+
+
+def op_upload(rng, catalog):
+    body, content_type = multipart('file', 'foto.png', TINY_PNG + os.urandom(32))
+    return 'POST', '/images', body, {'Content-Type': content_type}
+
+
+def op_image(rng, catalog):
+    name = rng.choice(catalog.image_names) if catalog.image_names else '0' * 64 + '.png'
+    return 'GET', f'/images/{name}', None, {}
+
+
+def op_rebuild_stats(rng, catalog):
+    return 'POST', '/admin/stats/rebuild', b'', {}
+
+
+OPERATIONS = (
+    ('GET /properties?category', 30, op_list_category),
+    ('GET /properties?fields', 15, op_list_cards),
+    ('GET /properties?price_min', 8, op_list_filtered),
+    ('GET /properties (tudo, gzip)', 1, op_list_all),
+    ('GET /properties?q', 6, op_search),
+    ('GET /stats', 6, op_stats),
+    ('GET /health', 2, op_health),
+    ('GET /changes', 4, op_changes),
+    ('GET /properties/export', 0.5, op_export),
+    ('GET /images/<name>', 4, op_image),
+    ('POST /properties/<id>/view', 12, op_view),
+    ('POST /properties/<id>/lead', 1, op_lead),
+    ('POST /properties', 3, op_create),
+    ('PUT /properties/<id>', 2, op_update),
+    ('DELETE /properties/<id>', 1.5, op_delete),
+    ('POST /sales', 1, op_sale),
+    ('POST /properties/import', 0.3, op_import),
+    ('POST /images', 0.5, op_upload),
+    ('POST /admin/stats/rebuild', 0.1, op_rebuild_stats),
+)
+
+
+class Connection:
+    """Conexão HTTP reaproveitada por thread (reabre se o servidor fechar)"""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.conn = None
+
+    def request(self, method, path, body, headers):
+        for attempt in (1, 2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                if response.getheader('Connection', '').lower() == 'close':
+                    self.conn.close()
+                    self.conn = None
+                return response.status, data
+            except (http.client.HTTPException, ConnectionError, OSError):
+                self.conn.close()
+                self.conn = None
+                if attempt == 2:
+                    raise
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_load(base_url, catalog, concurrency, duration, warmup, seed):
+    parts = urlsplit(base_url)
+    labels, weights, builders = zip(*OPERATIONS)
+    latencies = defaultdict(list)
+    statuses = defaultdict(lambda: defaultdict(int))
+    lock = threading.Lock()
+    start_at = time.monotonic() + warmup
+    stop_at = start_at + duration
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        connection = Connection(parts.hostname, parts.port or 80)
+        local_latencies = defaultdict(list)
+        local_statuses = defaultdict(lambda: defaultdict(int))
+        while True:
+            now = time.monotonic()
+            if now >= stop_at:
+                break
+            i = rng.choices(range(len(labels)), weights=weights)[0]
+            method, path, body, headers = builders[i](rng, catalog)
+            began = time.perf_counter()
+            try:
+                status, data = connection.request(method, path, body, headers)
+            except Exception:
+                status, data = 'erro', b''
+            elapsed = time.perf_counter() - began
+            if status in (200, 201) and builders[i] is op_create:
+                catalog.add(json.loads(data)['property_id'])
+            elif status == 201 and builders[i] is op_upload:
+                catalog.image_names.append(json.loads(data)['images'][0]['name'])
+            if now >= start_at:
+                local_latencies[labels[i]].append(elapsed)
+                local_statuses[labels[i]][str(status)] += 1
+        with lock:
+            for label, values in local_latencies.items():
+                latencies[label].extend(values)
+            for label, counts in local_statuses.items():
+                for status, count in counts.items():
+                    statuses[label][status] += count
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    endpoints = {}
+    for label in labels:
+        values = sorted(latencies.get(label, []))
+        errors = sum(count for status, count in statuses[label].items()
+                     if not status.isdigit() or int(status) >= 500)
+        endpoints[label] = {
+            'requests': len(values),
+            'rps': len(values) / duration,
+            'p50_ms': percentile(values, 0.50) * 1000,
+            'p95_ms': percentile(values, 0.95) * 1000,
+            'p99_ms': percentile(values, 0.99) * 1000,
+            'errors': errors,
+            'statuses': dict(statuses[label]),
+        }
+    all_values = sorted(v for values in latencies.values() for v in values)
+    total = {
+        'requests': len(all_values),
+        'rps': len(all_values) / duration,
+        'p50_ms': percentile(all_values, 0.50) * 1000,
+        'p95_ms': percentile(all_values, 0.95) * 1000,
+        'p99_ms': percentile(all_values, 0.99) * 1000,
+        'errors': sum(e['errors'] for e in endpoints.values()),
+    }
+    return endpoints, total
+
+
+def print_report(endpoints, total, previous=None):
+    header = f"{'rota':<32}{'req':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'erros':>7}"
+    if previous:
+        header += f"{'Δ p95':>9}{'Δ req/s':>9}"
+    print(header)
+    rows = list(endpoints.items()) + [('TOTAL', total)]
+    for label, data in rows:
+        line = (f"{label:<32}{data['requests']:>8}{data['rps']:>9.1f}{data['p50_ms']:>9.1f}"
+                f"{data['p95_ms']:>9.1f}{data['p99_ms']:>9.1f}{data['errors']:>7}")
+        if previous:
+            before = previous['total'] if label == 'TOTAL' else previous['endpoints'].get(label)
+            if before and before['p95_ms'] and before['rps']:
+                p95_delta = data['p95_ms'] / before['p95_ms'] - 1
+                rps_delta = data['rps'] / before['rps'] - 1
+                flag = '  ⚠️' if p95_delta > 0.10 or rps_delta < -0.10 else ''
+                line += f'{p95_delta:>+9.0%}{rps_delta:>+9.0%}{flag}'
+        print(line)
+
+
+def procfile_command(port, workers):
+    """Comando "web" do Procfile com a porta e o número de workers"""
+    with open(os.path.join(ROOT, 'Procfile')) as f:
+        for line in f:
+            if line.startswith('web:'):
+                command = line[len('web:'):].strip().replace('$PORT', str(port))
+                return shlex.split(command) + ['--workers', str(workers)]
+    raise RuntimeError('Procfile sem processo "web"')
+
+
+def wait_until_healthy(base_url, timeout=30):
+    parts = urlsplit(base_url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=2)
+            conn.request('GET', '/health')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError('API não respondeu ao /health')
+
+
+def fetch_ids(base_url):
+    parts = urlsplit(base_url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=60)
+    conn.request('GET', '/properties?fields=id&limit=2000')
+    return [p['id'] for p in json.loads(conn.getresponse().read())['properties']]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='usa um servidor já rodando em vez de subir o gunicorn')
+    parser.add_argument('--properties', type=int, default=10000)
+    parser.add_argument('--sales', type=int, default=1500)
+    parser.add_argument('--workers', type=int, default=4, help='workers do gunicorn')
+    parser.add_argument('--port', type=int, default=5077)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--warmup', type=float, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--name', default='load', help='prefixo do arquivo de resultado')
+    parser.add_argument('--compare', help='JSON de uma execução anterior')
+    args = parser.parse_args()
+
+    server = None
+    tmp = tempfile.TemporaryDirectory()
+    base_url = args.url
+    try:
+        if not base_url:
+            from seed_data import seed_database
+            database = os.path.join(tmp.name, 'load.db')
+            seed_database(database, args.properties, args.sales, args.seed)
+            env = dict(os.environ, DATABASE=database, PORT=str(args.port),
+                       UPLOAD_FOLDER=os.path.join(tmp.name, 'uploads'))
+            command = procfile_command(args.port, args.workers)
+            print(f"🚀 {' '.join(command)}")
+            server = subprocess.Popen(command, cwd=ROOT, env=env,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            base_url = f'http://127.0.0.1:{args.port}'
+        wait_until_healthy(base_url)
+
+        catalog = Catalog(fetch_ids(base_url))
+        print(f'🔥 {args.concurrency} clientes por {args.duration:.0f}s '
+              f'(aquecimento {args.warmup:.0f}s) em {base_url}')
+        endpoints, total = run_load(base_url, catalog, args.concurrency,
+                                    args.duration, args.warmup, args.seed)
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=30)
+        tmp.cleanup()
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_report(endpoints, total, previous)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    result_path = os.path.join(RESULTS_DIR, f"{args.name}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(result_path, 'w') as f:
+        json.dump({
+            'date': datetime.now().isoformat(),
+            'config': {k: v for k, v in vars(args).items() if k != 'compare'},
+            'endpoints': endpoints,
+            'total': total,
+        }, f, indent=2, ensure_ascii=False)
+    print(f'💾 Resultado salvo em {os.path.relpath(result_path, ROOT)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+GERADOR DE DADOS SINTÉTICOS
+Popula o banco com N imóveis e vendas realistas de Maceió (bairros,
+categorias, tipos e faixas de preço), de forma reproduzível (--seed).
+
+Uso:
+    python benchmarks/seed_data.py --properties 10000 --sales 1500 [--database properties.db]
+"""
+
+import argparse
+import os
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import api  # noqa: E402
+
+# Bairro -> preço médio do m² (R$), se fica na orla e centro aproximado (lat, lon)
+NEIGHBOURHOODS = {
+    'Ponta Verde': (11500, True, -9.6630, -35.7060),
+    'Pajuçara': (10500, True, -9.6680, -35.7190),
+    'Jatiúca': (9800, True, -9.6500, -35.7050),
+    'Cruz das Almas': (8200, True, -9.6310, -35.6990),
+    'Guaxuma': (7800, True, -9.5880, -35.6760),
+    'Ipioca': (6500, True, -9.5350, -35.6050),
+    'Mangabeiras': (7200, False, -9.6480, -35.7150),
+    'Farol': (5800, False, -9.6500, -35.7330),
+    'Gruta de Lourdes': (5600, False, -9.6180, -35.7280),
+    'Pinheiro': (4800, False, -9.6270, -35.7430),
+    'Serraria': (4500, False, -9.5910, -35.7200),
+    'Antares': (3600, False, -9.5850, -35.7500),
+    'Benedito Bentes': (2900, False, -9.5480, -35.7230),
+}
+
+# Tipo -> (peso, área média m², desvio)
+TYPES = {
+    'apartamento': (60, 85, 35),
+    'cobertura': (6, 220, 60),
+    'casa': (18, 160, 60),
+    'flat': (8, 40, 10),
+    'terreno': (4, 360, 120),
+    'sala comercial': (4, 45, 20),
+}
+
+CATEGORIES = ('lancamentos', 'mais-procurados', 'beira-mar', 'pronto-morar')
+STATUSES = (('disponivel', 80), ('reservado', 8), ('vendido', 12))
+FEATURES = (
+    'piscina', 'varanda gourmet', 'academia', 'portaria 24h', 'salão de festas',
+    'playground', 'vista para o mar', 'nascente', 'elevador', 'vaga coberta',
+    'espaço pet', 'coworking', 'energia solar', 'quadra poliesportiva'
+)
+
+
+def weighted(rng, pairs):
+    items, weights = zip(*pairs)
+    return rng.choices(items, weights=weights)[0]
+
+
+def make_property(rng, now):
+    neighbourhood = rng.choice(list(NEIGHBOURHOODS))
+    price_m2, seaside, lat, lon = NEIGHBOURHOODS[neighbourhood]
+    kind = weighted(rng, [(t, w[0]) for t, w in TYPES.items()])
+    _, mean_area, sd_area = TYPES[kind]
+    area = max(20, round(rng.gauss(mean_area, sd_area)))
+    # Preço ~ lognormal em torno de área x m² do bairro
+    price = round(area * price_m2 * rng.lognormvariate(0, 0.18), -3)
+    bedrooms = 0 if kind in ('terreno', 'sala comercial') else max(1, min(5, round(area / 45)))
+
+    if seaside and rng.random() < 0.5:
+        category = 'beira-mar'
+    else:
+        category = rng.choice(CATEGORIES)
+
+    added = now - timedelta(days=rng.expovariate(1 / 240), seconds=rng.randrange(86400))
+    # ~10% dos anúncios sem coordenadas, como os cadastrados antes do mapa
+    located = rng.random() < 0.9
+    return {
+        'id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+        'title': f"{kind.capitalize()} {'frente mar ' if seaside and rng.random() < 0.3 else ''}"
+                 f"em {neighbourhood} com {bedrooms} quarto{'s' if bedrooms != 1 else ''}",
+        'price': price,
+        'location': f'{neighbourhood} - Maceió/AL',
+        'category': category,
+        'status': weighted(rng, STATUSES),
+        'bedrooms': bedrooms,
+        'bathrooms': max(1, bedrooms - rng.randint(0, 1)) if bedrooms else 1,
+        'area': area,
+        'type': kind,
+        'description': f'{kind.capitalize()} de {area} m² em {neighbourhood}, '
+                       f"{'a poucos metros da praia' if seaside else 'perto de comércio e escolas'}.",
+        'features': rng.sample(FEATURES, rng.randint(2, 7)),
+        'images': [],
+        'views': int(rng.paretovariate(1.5) * 20),
+        'leads': int(rng.paretovariate(2.5) * 2),
+        'latitude': round(rng.gauss(lat, 0.004), 6) if located else None,
+        'longitude': round(rng.gauss(lon, 0.004), 6) if located else None,
+        'date_added': added.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def seed(conn, properties, sales, rng):
+    now = datetime.now()
+    rows = [make_property(rng, now) for _ in range(properties)]
+    conn.executemany(
+        api.INSERT_PROPERTY_SQL,
+        [api.property_values(row, row['id'], row['date_added']) for row in rows]
+    )
+
+    sold = [row for row in rows if row['status'] == 'vendido'] or rows
+    sale_rows = []
+    for _ in range(sales):
+        row = rng.choice(sold)
+        sale_price = round(row['price'] * rng.uniform(0.9, 1.0), -3)
+        sale_date = now - timedelta(days=rng.uniform(0, 540))
+        sale_rows.append((
+            str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            row['id'],
+            sale_price,
+            round(sale_price * 0.05, 2),
+            rng.choice(('Ana', 'Bruno', 'Carla', 'Diego', 'Eduarda', 'Felipe')) + ' ' +
+            rng.choice(('Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Costa')),
+            sale_date.strftime('%Y-%m-%d %H:%M:%S'),
+        ))
+    conn.executemany('''
+        INSERT INTO sales (id, property_id, sale_price, commission, client_name, sale_date)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', sale_rows)
+    api.bump_catalog_version(conn)
+    conn.commit()
+
+
+def seed_database(database, properties, sales, seed_value=42, reset=False):
+    """Cria/abre o banco em database e gera os dados; retorna o total de imóveis"""
+    api.app.config['DATABASE'] = database
+    api.init_db()
+    conn = api.connect_db()
+    if reset:
+        conn.execute('DELETE FROM sales')
+        conn.execute('DELETE FROM properties')
+        conn.commit()
+    seed(conn, properties, sales, random.Random(seed_value))
+    total = conn.execute('SELECT COUNT(*) FROM properties').fetchone()[0]
+    conn.close()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--properties', type=int, default=10000)
+    parser.add_argument('--sales', type=int, default=1500)
+    parser.add_argument('--database', default=api.app.config['DATABASE'])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reset', action='store_true', help='apaga imóveis e vendas antes')
+    args = parser.parse_args()
+
+    total = seed_database(args.database, args.properties, args.sales, args.seed, args.reset)
+    print(f'✅ {args.properties} imóveis e {args.sales} vendas gerados '
+          f'({total} imóveis em {args.database})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""
+BUILD DOS ARQUIVOS ESTÁTICOS
+Gera a pasta dist/ publicada pelo Netlify:
+- copia páginas, css, js e assets;
+- cria cópias de css/js com o hash do conteúdo no nome (static/...),
+  que podem ser cacheadas como imutáveis, e reescreve as referências
+  nas páginas HTML;
+- grava versões pré-comprimidas (.gz e, se o módulo brotli existir, .br)
+  dos arquivos de texto, para servidores com gzip_static/brotli_static;
+- salva o manifest.json (original -> com hash) e mostra quantos bytes
+  cada página carrega antes e depois da compressão.
+
+Uso:
+    python build_static.py [--out dist]
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+import shutil
+
+try:
+    import brotli  # Opcional: gera também os arquivos .br
+except ImportError:
+    brotli = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# O que vai para o site publicado
+SITE_DIRS = ('assets', 'css', 'js', 'html')
+SITE_FILES = ('_redirects',)
+FINGERPRINT_EXTENSIONS = ('.css', '.js')
+COMPRESS_EXTENSIONS = ('.html', '.css', '.js', '.svg', '.json', '.txt')
+COMPRESS_MIN_SIZE = 1024
+
+ASSET_REF_PATTERN = re.compile(r'''(?P<attr>(?:src|href)=["'])(?P<path>[^"'#?:]+\.(?:css|js))(?P<end>["'?#])''')
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def list_site_files():
+    """Caminhos relativos (com /) de tudo que vai para o dist"""
+    files = [name for name in os.listdir(ROOT) if name.endswith('.html')]
+    files += [name for name in SITE_FILES if os.path.exists(os.path.join(ROOT, name))]
+    for directory in SITE_DIRS:
+        for base, _, names in os.walk(os.path.join(ROOT, directory)):
+            for name in names:
+                if name.startswith('.'):
+                    continue
+                full = os.path.join(base, name)
+                files.append(os.path.relpath(full, ROOT).replace(os.sep, '/'))
+    return sorted(files)
+
+
+def write_file(out, relative, data):
+    path = os.path.join(out, *relative.split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def fingerprint(files, out):
+    """Copia css/js para static/<nome>.<hash>.<ext>; retorna o manifest"""
+    manifest = {}
+    for relative in files:
+        if not relative.endswith(FINGERPRINT_EXTENSIONS):
+            continue
+        with open(os.path.join(ROOT, relative), 'rb') as f:
+            data = f.read()
+        stem, extension = posixpath.splitext(relative)
+        hashed = f'static/{stem}.{content_hash(data)}{extension}'
+        write_file(out, hashed, data)
+        manifest[relative] = hashed
+    return manifest
+
+
+def resolve_reference(page, path):
+    """Arquivo do site (relativo à raiz) a que a página se refere
+
+    Resolve como o navegador: relativo à pasta da página ou, começando
+    com /, à raiz do site; ".." não sobe além da raiz (../js/a.js numa
+    página da raiz é /js/a.js).
+    """
+    target = posixpath.join('/' + posixpath.dirname(page), path)
+    return posixpath.normpath(target).lstrip('/')
+
+
+def rewrite_html(html, page, manifest):
+    """Troca referências a css/js da página pelas versões com hash"""
+    page_dir = posixpath.dirname(page)
+
+    def replace(match):
+        hashed = manifest.get(resolve_reference(page, match.group('path')))
+        if not hashed:
+            return match.group(0)
+        new_path = posixpath.relpath(hashed, page_dir or '.')
+        return f"{match.group('attr')}{new_path}{match.group('end')}"
+
+    return ASSET_REF_PATTERN.sub(replace, html)
+
+
+def precompress(out):
+    """Grava .gz/.br ao lado de cada arquivo de texto"""
+    for base, _, names in os.walk(out):
+        for name in names:
+            if not name.endswith(COMPRESS_EXTENSIONS):
+                continue
+            path = os.path.join(base, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) < COMPRESS_MIN_SIZE:
+                continue
+            with open(path + '.gz', 'wb') as f:
+                f.write(gzip.compress(data, 9, mtime=0))
+            if brotli is not None:
+                with open(path + '.br', 'wb') as f:
+                    f.write(brotli.compress(data))
+
+
+def page_weight(out, page):
+    """(bytes originais, bytes gzip) da página mais os css/js locais dela
+
+    Só conta arquivos do próprio build (dentro de out).
+    """
+    with open(os.path.join(out, page), 'rb') as f:
+        html = f.read()
+    paths = [page]
+    for match in ASSET_REF_PATTERN.finditer(html.decode('utf-8', 'replace')):
+        target = resolve_reference(page, match.group('path'))
+        if target and os.path.isfile(os.path.join(out, target)):
+            paths.append(target)
+    raw = compressed = 0
+    for path in paths:
+        full = os.path.join(out, path)
+        size = os.path.getsize(full)
+        raw += size
+        compressed += os.path.getsize(full + '.gz') if os.path.exists(full + '.gz') else size
+    return raw, compressed
+
+
+def build(out):
+    if os.path.exists(out):
+        shutil.rmtree(out)
+    files = list_site_files()
+    manifest = fingerprint(files, out)
+
+    for relative in files:
+        with open(os.path.join(ROOT, relative), 'rb') as f:
+            data = f.read()
+        if relative.endswith('.html'):
+            data = rewrite_html(data.decode('utf-8'), relative, manifest).encode('utf-8')
+        write_file(out, relative, data)
+
+    write_file(out, 'manifest.json', json.dumps(manifest, indent=2).encode('utf-8'))
+    precompress(out)
+    return files, manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--out', default=os.path.join(ROOT, 'dist'))
+    args = parser.parse_args()
+
+    files, manifest = build(args.out)
+    print(f"✅ {len(files)} arquivos copiados, {len(manifest)} css/js com hash em {args.out}")
+    print(f"{'página':<24}{'original':>12}{'gzip':>12}{'redução':>10}")
+    for page in sorted(f for f in files if f.endswith('.html')):
+        raw, compressed = page_weight(args.out, page)
+        if raw:
+            print(f'{page:<24}{raw:>12,}{compressed:>12,}{1 - compressed / raw:>10.0%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+CONTADORES COM ESCRITA ADIADA (WRITE-BEHIND)
+Acumula incrementos de views/leads em memória e grava tudo numa única
+transação a cada N ms ou M eventos, para que o tráfego das páginas não
+dispute o lock de escrita do SQLite a cada visita.
+"""
+
+import atexit
+import os
+import threading
+import time
+from collections import defaultdict
+
+
+def apply_increments(conn, table, columns, rows):
+    """Soma os incrementos [(*valores, id)] às colunas (roda no escritor)"""
+    assignments = ', '.join(f'{c} = {c} + ?' for c in columns)
+    conn.executemany(f'UPDATE {table} SET {assignments} WHERE id = ?', rows)
+
+
+class WriteBehindCounters:
+    """Buffer de incrementos por (id, coluna) descarregado em lote
+
+    A semântica é "pelo menos uma vez": se a gravação falhar, os
+    incrementos voltam para o buffer e entram no próximo lote; no
+    encerramento do processo o buffer é descarregado uma última vez.
+    Cada lote é gravado por submit(apply, table, columns, rows), que deve
+    executá-lo numa transação e esperar o commit (ex.: WriteQueue.submit).
+    apply é apply_increments ou uma função de módulo que o chame e grave
+    algo a mais na mesma transação.
+    """
+
+    def __init__(self, submit, table, columns, flush_interval=1.0, flush_events=500,
+                 apply=apply_increments):
+        self.submit = submit
+        self.apply = apply
+        self.table = table
+        self.columns = tuple(columns)
+        self.flush_interval = flush_interval
+        self.flush_events = flush_events
+
+        self._lock = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._pending = defaultdict(lambda: [0] * len(self.columns))
+        self._pending_events = 0
+        self._thread = None
+        self._thread_pid = None
+        self.flushed_events = 0
+        self.last_flush = None
+        self.last_error = None
+
+        atexit.register(self.close)
+
+    def increment(self, key, column, amount=1):
+        """Soma amount ao contador; retorna o número de eventos pendentes"""
+        index = self.columns.index(column)
+        with self._lock:
+            self._ensure_thread()
+            self._pending[key][index] += amount
+            self._pending_events += 1
+            if self._pending_events >= self.flush_events:
+                self._lock.notify()
+            return self._pending_events
+
+    def pending(self):
+        with self._lock:
+            return self._pending_events
+
+    def flush(self):
+        """Grava todos os incrementos pendentes numa transação"""
+        with self._flush_lock:
+            with self._lock:
+                batch, events = self._pending, self._pending_events
+                self._pending = defaultdict(lambda: [0] * len(self.columns))
+                self._pending_events = 0
+            if not batch:
+                return 0
+
+            try:
+                self.submit(self.apply, self.table, self.columns,
+                            [(*amounts, key) for key, amounts in batch.items()])
+            except Exception as e:
+                self.last_error = str(e)
+                self._restore(batch, events)
+                raise
+
+            self.flushed_events += events
+            self.last_flush = time.time()
+            self.last_error = None
+            return events
+
+    def close(self):
+        """Descarrega o que restou (chamado no encerramento do processo)"""
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"⚠️  Contadores não gravados no encerramento: {e}")
+
+    def _restore(self, batch, events):
+        with self._lock:
+            for key, amounts in batch.items():
+                pending = self._pending[key]
+                for i, amount in enumerate(amounts):
+                    pending[i] += amount
+            self._pending_events += events
+
+    def _ensure_thread(self):
+        # Chamado com self._lock; recria a thread após um fork do gunicorn
+        if self._thread_pid != os.getpid() or not self._thread.is_alive():
+            self._thread_pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='counters-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                self._lock.wait_for(
+                    lambda: self._pending_events >= self.flush_events,
+                    timeout=self.flush_interval
+                )
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️  Falha ao gravar contadores (nova tentativa no próximo lote): {e}")
@@ -0,0 +1,245 @@
+"""
+ÍNDICE DE FACETAS EM MEMÓRIA
+Para cada valor de cada faceta (categoria, tipo, quartos...) guarda um
+bitmap - um int do Python com um bit por imóvel. Filtrar vira AND/OR entre
+bitmaps e contar vira popcount, sem GROUP BY no banco a cada request.
+Faixas numéricas (preço, área) têm um bitmap por intervalo e a coluna com
+o valor exato de cada imóvel, usada só nos intervalos cortados pelo filtro.
+Internamente cada intervalo é dividido em partes menores, para que esse
+trecho conferido um a um fique pequeno.
+"""
+
+import bisect
+import math
+import threading
+from operator import itemgetter
+
+if hasattr(int, 'bit_count'):
+    popcount = int.bit_count
+else:  # Python < 3.10
+    def popcount(bitmap):
+        return bin(bitmap).count('1')
+
+
+def bitmap_from_slots(slots, size):
+    """Monta de uma vez o bitmap com os bits das posições dadas"""
+    bits = bytearray((size + 7) // 8)
+    for slot in slots:
+        bits[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(bits, 'little')
+
+
+class FacetIndex:
+    """Bitmaps por valor de faceta sobre registros identificados por id
+
+    values: {faceta: coluna ou função(linha) -> valor};
+    ranges: {faceta: (coluna, limites crescentes dos intervalos)}, cada
+    intervalo fechado dividido em resolution partes iguais nos bitmaps.
+    Cada registro ocupa uma posição (bit); posições liberadas por exclusões
+    são reaproveitadas. Não sincroniza sozinho: quem consulta ou atualiza
+    segura self.lock.
+    """
+
+    def __init__(self, values, ranges, resolution=16):
+        self.extractors = {
+            name: extract if callable(extract) else itemgetter(extract)
+            for name, extract in values.items()
+        }
+        self.ranges = {name: (column, tuple(edges)) for name, (column, edges) in ranges.items()}
+        # Limites internos (mais finos) e o intervalo exibido de cada parte
+        self._edges = {}
+        self._display = {}
+        for name, (_, edges) in self.ranges.items():
+            fine, display = [], []
+            for i, low in enumerate(edges):
+                parts = resolution if i + 1 < len(edges) else 1
+                step = (edges[i + 1] - low) / parts if parts > 1 else 0
+                fine.extend(low + step * part for part in range(parts))
+                display.extend([i] * parts)
+            self._edges[name] = tuple(fine)
+            self._display[name] = tuple(display)
+        self.lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.version = None
+        self.all = 0
+        self._slots = {}   # id -> posição
+        self._ids = []     # posição -> id (None = livre)
+        self._free = []
+        names = (*self.extractors, *self.ranges)
+        self._bitmaps = {name: {} for name in names}
+        self._columns = {name: [] for name in names}     # valor de cada posição
+        self._members = {name: {} for name in self.ranges}  # parte -> posições
+        self._intervals = {name: {} for name in self.ranges}  # bitmap de cada intervalo exibido
+
+    def __len__(self):
+        return len(self._slots)
+
+    def _values(self, row):
+        for name, extract in self.extractors.items():
+            yield name, extract(row)
+        for name, (column, _) in self.ranges.items():
+            number = row[column]
+            if not isinstance(number, (int, float)) or math.isnan(number):
+                number = None
+            yield name, number
+
+    def _key(self, name, value):
+        """Chave do bitmap: o próprio valor ou o índice do intervalo"""
+        if name not in self.ranges or value is None:
+            return value
+        return max(0, bisect.bisect_right(self._edges[name], value) - 1)
+
+    def _bounds(self, name, key):
+        edges = self._edges[name]
+        low = edges[key] if key > 0 else -math.inf
+        high = edges[key + 1] if key + 1 < len(edges) else math.inf
+        return low, high
+
+    def load(self, rows, version=None):
+        """Reconstrói o índice inteiro a partir de todas as linhas"""
+        self._reset()
+        groups = {name: {} for name in self._bitmaps}
+        for row in rows:
+            slot = len(self._ids)
+            self._ids.append(row['id'])
+            self._slots[row['id']] = slot
+            for name, value in self._values(row):
+                self._columns[name].append(value)
+                key = self._key(name, value)
+                if key is not None:
+                    groups[name].setdefault(key, []).append(slot)
+
+        size = len(self._ids)
+        for name, slots_by_key in groups.items():
+            self._bitmaps[name] = {
+                key: bitmap_from_slots(slots, size) for key, slots in slots_by_key.items()
+            }
+            if name in self.ranges:
+                self._members[name] = {key: set(slots) for key, slots in slots_by_key.items()}
+                intervals = self._intervals[name]
+                for key, bitmap in self._bitmaps[name].items():
+                    interval = self._display[name][key]
+                    intervals[interval] = intervals.get(interval, 0) | bitmap
+        self.all = (1 << size) - 1
+        self.version = version
+
+    def upsert(self, row):
+        """Inclui ou atualiza um registro, trocando só os bits que mudaram"""
+        slot = self._slots.get(row['id'])
+        if slot is None:
+            slot = self._free.pop() if self._free else self._grow()
+            self._slots[row['id']] = slot
+            self._ids[slot] = row['id']
+            self.all |= 1 << slot
+        for name, value in self._values(row):
+            old_key = self._key(name, self._columns[name][slot])
+            key = self._key(name, value)
+            self._columns[name][slot] = value
+            if old_key == key:
+                continue
+            if old_key is not None:
+                self._unset(name, old_key, slot)
+            if key is not None:
+                self._set(name, key, slot)
+
+    def remove(self, record_id):
+        """Tira o registro do índice (ids desconhecidos são ignorados)"""
+        slot = self._slots.pop(record_id, None)
+        if slot is None:
+            return
+        for name, column in self._columns.items():
+            key = self._key(name, column[slot])
+            if key is not None:
+                self._unset(name, key, slot)
+            column[slot] = None
+        self._ids[slot] = None
+        self.all ^= 1 << slot
+        self._free.append(slot)
+
+    def _grow(self):
+        self._ids.append(None)
+        for column in self._columns.values():
+            column.append(None)
+        return len(self._ids) - 1
+
+    def _set(self, name, key, slot):
+        bitmaps = self._bitmaps[name]
+        bitmaps[key] = bitmaps.get(key, 0) | (1 << slot)
+        if name in self.ranges:
+            self._members[name].setdefault(key, set()).add(slot)
+            intervals = self._intervals[name]
+            interval = self._display[name][key]
+            intervals[interval] = intervals.get(interval, 0) | (1 << slot)
+
+    def _unset(self, name, key, slot):
+        bitmaps = self._bitmaps[name]
+        bitmap = bitmaps[key] ^ (1 << slot)
+        if bitmap:
+            bitmaps[key] = bitmap
+        else:
+            del bitmaps[key]
+        if name in self.ranges:
+            members = self._members[name][key]
+            members.discard(slot)
+            if not members:
+                del self._members[name][key]
+            intervals = self._intervals[name]
+            interval = self._display[name][key]
+            intervals[interval] ^= 1 << slot
+
+    def match(self, name, predicate):
+        """Bitmap dos registros cujo valor da faceta satisfaz predicate(valor)"""
+        result = 0
+        for key, bitmap in self._bitmaps[name].items():
+            if predicate(key):
+                result |= bitmap
+        return result
+
+    def match_range(self, name, minimum=None, maximum=None):
+        """Bitmap dos registros com minimum <= valor <= maximum (limites opcionais)"""
+        column = self._columns[name]
+        result = 0
+        partial = []
+        for key, bitmap in self._bitmaps[name].items():
+            low, high = self._bounds(name, key)
+            if (maximum is not None and low > maximum) or (minimum is not None and high <= minimum):
+                continue
+            if (minimum is None or low >= minimum) and (maximum is None or high <= maximum):
+                result |= bitmap
+                continue
+            # Intervalo cortado pelo filtro: confere o valor exato
+            partial.extend(
+                slot for slot in self._members[name][key]
+                if (minimum is None or column[slot] >= minimum)
+                and (maximum is None or column[slot] <= maximum)
+            )
+        if partial:
+            result |= bitmap_from_slots(partial, len(self._ids))
+        return result
+
+    def from_ids(self, ids):
+        """Bitmap de um conjunto de ids (ex.: resultado de uma consulta SQL)"""
+        slots = self._slots
+        return bitmap_from_slots((slots[i] for i in ids if i in slots), len(self._ids))
+
+    def counts(self, name, within):
+        """{valor: registros de within com esse valor}"""
+        return {
+            key: popcount(bitmap & within)
+            for key, bitmap in self._bitmaps[name].items()
+        }
+
+    def range_counts(self, name, within):
+        """Lista [{min, max, count}] com todos os intervalos da faceta, em ordem"""
+        edges = self.ranges[name][1]
+        intervals = self._intervals[name]
+        return [
+            {
+                'min': edges[i],
+                'max': edges[i + 1] if i + 1 < len(edges) else None,
+                'count': popcount(intervals.get(i, 0) & within)
+            }
+            for i in range(len(edges))
+        ]
@@ -0,0 +1,54 @@
+"""
+CONFIGURAÇÃO DO GUNICORN
+Lida automaticamente pelo gunicorn iniciado na raiz do projeto (comando do
+Procfile). Aqui fica só o que é do servidor; a API continua configurada
+pelas variáveis de ambiente (DATABASE, SQLITE_*, ...).
+"""
+
+import os
+
+# O comando do Procfile roda atrás do roteador da plataforma (Heroku/
+# Render), que acrescenta o IP do cliente ao X-Forwarded-For: um proxy
+# confiável para o limite por cliente. Sem proxy à frente (gunicorn
+# exposto direto), rode com TRUSTED_PROXIES=0.
+os.environ.setdefault('TRUSTED_PROXIES', '1')
+
+# create_app() (migrações + caches de leitura) roda uma vez no mestre e os
+# workers herdam a memória já pronta (copy-on-write)
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') not in ('0', 'false')
+
+# Workers com threads (gthread), não síncronos: o long-poll e o SSE de
+# /changes seguram a request por até CHANGES_MAX_WAIT e
+# CHANGES_STREAM_DURATION segundos, e o mestre mata o worker síncrono que
+# ficar mais de timeout segundos numa request (levando junto o escritor
+# da fila e a manutenção, se forem dele). No gthread as requests rodam em
+# threads e o worker continua avisando o mestre que está vivo.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+
+
+def post_fork(server, worker):
+    import api
+    from gunicorn.workers.sync import SyncWorker
+    config = api.app.config
+    config['SERVER_PID'] = server.pid  # Socket do escritor é por mestre
+    # Worker síncrono (GUNICORN_WORKER_CLASS=sync e GUNICORN_THREADS=1; com
+    # mais threads o gunicorn usa gthread): long-poll e SSE
+    # terminam antes do timeout para o worker não ser morto
+    if isinstance(worker, SyncWorker) and server.cfg.timeout:
+        limit = max(1, server.cfg.timeout - 5)
+        config['CHANGES_MAX_WAIT'] = min(config['CHANGES_MAX_WAIT'], limit)
+        config['CHANGES_STREAM_DURATION'] = min(config['CHANGES_STREAM_DURATION'], limit)
+    # Capacidade do descarte de carga: uma request por thread de cada worker
+    if not config['SHED_CAPACITY']:
+        config['SHED_CAPACITY'] = server.cfg.workers * server.cfg.threads
+    # Long-poll/SSE ocupam no máximo metade das threads de cada worker
+    config['CHANGES_MAX_CONNECTIONS'] = min(config['CHANGES_MAX_CONNECTIONS'],
+                                            max(1, server.cfg.threads // 2))
+    api.feed_connections.total = config['CHANGES_MAX_CONNECTIONS']
+    # Conexões SQLite não atravessam o fork: cada worker abre e aquece as suas
+    api.warm_worker()
+    # Threads também não: cada worker inicia o seu agendador de manutenção
+    # (só o eleito executa as tarefas)
+    api.maintenance.start()
@@ -0,0 +1,112 @@
+"""
+ARMAZENAMENTO DE IMAGENS ENDEREÇADO POR CONTEÚDO
+Cada arquivo é gravado em disco com o nome igual ao SHA-256 do conteúdo
+(uploads/ab/abcdef....jpg). O mesmo arquivo enviado duas vezes vira uma
+única cópia, e a URL nunca muda de conteúdo - por isso pode ser servida
+com cache "immutable".
+"""
+
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+
+# Assinaturas (magic bytes) dos formatos aceitos -> extensão
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+
+IMAGE_MIMETYPES = {
+    'jpg': 'image/jpeg',
+    'png': 'image/png',
+    'gif': 'image/gif',
+    'webp': 'image/webp',
+}
+
+DATA_URL_PATTERN = re.compile(r'^data:image/[\w.+-]+;base64,(?P<data>.+)$', re.DOTALL)
+
+# Nome público: <sha256>.<ext>
+IMAGE_NAME_PATTERN = re.compile(r'^(?P<digest>[0-9a-f]{64})\.(?P<ext>jpg|png|gif|webp)$')
+
+
+class ImageError(ValueError):
+    """Conteúdo que não é uma imagem aceita"""
+
+
+def detect_extension(data):
+    """Descobre o formato pelos primeiros bytes; levanta ImageError"""
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    for signature, extension in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return extension
+    raise ImageError('Formato de imagem não suportado (use JPG, PNG, WebP ou GIF)')
+
+
+def image_path(name):
+    """Caminho relativo em disco (com subpasta pelos 2 primeiros caracteres)"""
+    return os.path.join(name[:2], name)
+
+
+def store_image(folder, data, max_size):
+    """Grava a imagem (se ainda não existir) e retorna o nome público"""
+    if not data:
+        raise ImageError('Arquivo vazio')
+    if len(data) > max_size:
+        raise ImageError(f'Imagem maior que o limite de {max_size // (1024 * 1024)} MB')
+
+    extension = detect_extension(data)
+    name = f'{hashlib.sha256(data).hexdigest()}.{extension}'
+    path = os.path.join(folder, image_path(name))
+
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Grava num temporário e renomeia: leitores nunca veem arquivo pela metade
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    return name
+
+
+def decode_data_url(value):
+    """Retorna os bytes de um data URL de imagem, ou None se não for um"""
+    if not isinstance(value, str) or not value.startswith('data:'):
+        return None
+    match = DATA_URL_PATTERN.match(value)
+    if not match:
+        raise ImageError('Data URL inválido')
+    try:
+        return base64.b64decode(match.group('data'), validate=False)
+    except (binascii.Error, ValueError):
+        raise ImageError('Data URL com base64 inválido')
+
+
+def externalize_images(images, folder, max_size, url_for_name):
+    """Troca data URLs inline da lista por URLs de arquivos gravados
+
+    Retorna (nova lista, quantidade convertida). Itens que já são URLs
+    ficam como estão.
+    """
+    if not isinstance(images, list):
+        return images, 0
+    result = []
+    converted = 0
+    for image in images:
+        data = decode_data_url(image)
+        if data is None:
+            result.append(image)
+            continue
+        result.append(url_for_name(store_image(folder, data, max_size)))
+        converted += 1
+    return result, converted
@@ -30,4 +30,32 @@ const API_ENDPOINTS = {
 // 🧪 EXEMPLO DE USO:
 // fetch(API_ENDPOINTS.LOGIN, { ... })
 
+// 📦 FORMATO COLUNAR (GET /properties?format=columnar)
+// Em vez de repetir as chaves em cada imóvel, a API manda uma lista por
+// campo em "columns"; category, status, type e location vêm como índices
+// na lista de valores de "dictionaries". decodeProperties devolve o mesmo
+// envelope do formato normal ({ success, properties, count, next_cursor }).
+function decodeProperties(payload) {
+    if (!payload || payload.format !== 'columnar') return payload;
+
+    const { columns = {}, dictionaries = {}, format, ...envelope } = payload;
+    const properties = new Array(payload.count);
+    for (let i = 0; i < properties.length; i++) properties[i] = {};
+
+    // Uma coluna por vez: todos os objetos recebem as chaves na mesma ordem
+    Object.keys(columns).forEach(name => {
+        const values = columns[name];
+        const dictionary = dictionaries[name];
+        for (let i = 0; i < properties.length; i++) {
+            properties[i][name] = dictionary ? dictionary[values[i]] : values[i];
+        }
+    });
+
+    return { ...envelope, properties };
+}
+
+// 🧪 EXEMPLO DE USO:
+// const data = decodeProperties(await (await fetch(`${url}?category=beira-mar&format=columnar`)).json());
+// data.properties.forEach(...)
+
 console.log('🔧 API Config carregado:', API_CONFIG.BASE_URL);
@@ -112,11 +112,15 @@ class CategoryLoader {
 
     async loadCategoryProperties() {
         try {
-            // Carrega TODOS os imóveis da categoria (sem limite)
-            const response = await fetch(`${this.apiUrl}?category=${this.currentCategory}`);
+            // Carrega TODOS os imóveis da categoria (sem limite), no formato
+            // colunar quando o decodificador de api-config.js está na página
+            const columnar = typeof decodeProperties === 'function';
+            const format = columnar ? '&format=columnar' : '';
+            const response = await fetch(`${this.apiUrl}?category=${this.currentCategory}${format}`);
             if (!response.ok) throw new Error('API não disponível');
             
-            const data = await response.json();
+            const payload = await response.json();
+            const data = columnar ? decodeProperties(payload) : payload;
             const properties = data.properties || [];
             
             if (properties.length === 0) {
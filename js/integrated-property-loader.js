@@ -124,10 +124,14 @@ class IntegratedPropertyLoader {
     async loadFromAPI() {
         try {
             const baseUrl = window.Config ? window.Config.apiBaseURL : 'http://localhost:5001';
-            const response = await fetch(`${baseUrl}/properties?category=${this.currentCategory}`);
+            // Formato colunar (menor) quando o decodificador de api-config.js está na página
+            const columnar = typeof decodeProperties === 'function';
+            const format = columnar ? '&format=columnar' : '';
+            const response = await fetch(`${baseUrl}/properties?category=${this.currentCategory}${format}`);
             
             if (response.ok) {
-                const data = await response.json();
+                const payload = await response.json();
+                const data = columnar ? decodeProperties(payload) : payload;
                 console.log(`✅ Carregado ${data.properties?.length || 0} imóveis da API para ${this.currentCategory}`);
                 return data.properties || [];
             }
@@ -0,0 +1,227 @@
+"""
+MANUTENÇÃO EM SEGUNDO PLANO
+Agendador dentro da própria API para as tarefas periódicas do banco
+(checkpoint do WAL, PRAGMA optimize/ANALYZE, backups). Cada tarefa tem um
+intervalo; o histórico de execuções fica numa tabela do próprio banco, então
+o agendamento sobrevive a reinícios e deploys.
+
+Todos os workers iniciam o agendador, mas só um executa as tarefas: o que
+conseguir a trava do arquivo lock_path (o mesmo esquema da fila de
+escritas). Se ele sair, outro assume na verificação seguinte. Sem fcntl
+(Windows) cada processo executa as suas.
+
+Com submit (ex.: a fila de escritas), o histórico é gravado por ele e não
+pela conexão do agendador, para não disputar o lock de escrita com o
+escritor único.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def record_run(conn, table, history_size, row):
+    """Grava uma execução no histórico e descarta as mais antigas"""
+    conn.execute(f'''
+        INSERT INTO {table} (task, started_at, duration_ms, ok, details)
+        VALUES (?, ?, ?, ?, ?)
+    ''', row)
+    conn.execute(f'''
+        DELETE FROM {table} WHERE id <= (
+            SELECT id FROM {table} ORDER BY id DESC LIMIT 1 OFFSET ?
+        )
+    ''', (history_size,))
+
+
+class MaintenanceScheduler:
+    """Executa task(conn) -> dict a cada intervalo, num único processo
+
+    tasks: {nome: (intervalo em segundos, função)}; com intervalo <= 0 a
+    tarefa só roda quando chamada por run(). O dict retornado vai para o
+    histórico (coluna details, em JSON).
+    on_run(nome, segundos, ok) é chamado depois de cada execução.
+    lock_path pode ser uma função, chamada a cada uso (ex.: para seguir o
+    banco configurado em app.config).
+    submit(func, *args) grava o histórico numa transação e espera o commit
+    (ex.: WriteQueue.submit); sem ele, a conexão do agendador grava.
+    """
+
+    def __init__(self, connect, tasks, lock_path, history_table='maintenance_runs',
+                 check_interval=30.0, history_size=200, on_run=None, submit=None):
+        self.connect = connect
+        self.submit = submit
+        self.tasks = dict(tasks)
+        self._lock_path = lock_path
+        self.history_table = history_table
+        self.check_interval = check_interval
+        self.history_size = history_size
+        self.on_run = on_run
+
+        self._lock = threading.RLock()  # Uma tarefa por vez neste processo
+        self._pid = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock_file = None
+        self._conn = None
+
+        atexit.register(self.stop)
+
+    def start(self):
+        """Inicia a thread do agendador neste processo (chamar após o fork)"""
+        scheduled = any(interval > 0 for interval, _ in self.tasks.values())
+        if not scheduled or (self._pid == os.getpid() and self._thread.is_alive()):
+            return
+        self._pid = os.getpid()
+        self._lock_file = None
+        self._conn = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name='maintenance', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def lock_path(self):
+        return self._lock_path() if callable(self._lock_path) else self._lock_path
+
+    def is_leader(self):
+        return self._lock_file is not None and self._pid == os.getpid()
+
+    def leader_pid(self):
+        """PID do processo que executa as tarefas (None se ninguém assumiu)"""
+        try:
+            with open(self.lock_path) as f:
+                pid = int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return None
+        if not pid:
+            return None
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return None
+        except PermissionError:
+            pass
+        return pid
+
+    def history(self, conn, task=None, limit=20):
+        """Execuções mais recentes (de uma tarefa ou de todas)"""
+        where, params = ('WHERE task = ?', (task,)) if task else ('', ())
+        rows = conn.execute(f'''
+            SELECT task, started_at, duration_ms, ok, details FROM {self.history_table}
+            {where} ORDER BY id DESC LIMIT ?
+        ''', (*params, limit)).fetchall()
+        return [
+            {'task': row[0], 'started_at': row[1], 'duration_ms': row[2],
+             'ok': bool(row[3]), 'details': json.loads(row[4]) if row[4] else {}}
+            for row in rows
+        ]
+
+    def summary(self, conn):
+        """Por tarefa: intervalo, última execução, próxima e tempos do histórico"""
+        stats = {
+            row[0]: row[1:]
+            for row in conn.execute(f'''
+                SELECT task, COUNT(*), SUM(ok = 0), AVG(duration_ms), MAX(duration_ms),
+                       MAX(started_at)
+                FROM {self.history_table} GROUP BY task
+            ''')
+        }
+        summary = {}
+        for name, (interval, _) in self.tasks.items():
+            runs, failures, average, slowest, last = stats.get(name, (0, 0, None, None, None))
+            latest = self.history(conn, name, 1)
+            summary[name] = {
+                'interval': interval if interval > 0 else None,
+                'runs': runs,
+                'failures': failures or 0,
+                'avg_ms': round(average, 1) if average is not None else None,
+                'max_ms': round(slowest, 1) if slowest is not None else None,
+                'last_run': latest[0] if latest else None,
+                # None: na próxima verificação (ou nunca, se desligada)
+                'next_run': last + interval if last and interval > 0 else None
+            }
+        return summary
+
+    def run(self, name):
+        """Executa a tarefa agora neste processo e grava no histórico"""
+        task = self.tasks[name][1]
+        with self._lock:
+            if self._conn is None:
+                self._conn = self.connect()
+            conn = self._conn
+            started_at = time.time()
+            start = time.perf_counter()
+            try:
+                details, ok = task(conn) or {}, True
+            except Exception as e:
+                details, ok = {'error': str(e)}, False
+                if conn.in_transaction:
+                    conn.rollback()
+            elapsed = time.perf_counter() - start
+            row = (name, started_at, elapsed * 1000, int(ok), json.dumps(details, default=str))
+            if self.submit is not None:
+                self.submit(record_run, self.history_table, self.history_size, row)
+            else:
+                record_run(conn, self.history_table, self.history_size, row)
+                conn.commit()
+        if self.on_run:
+            self.on_run(name, elapsed, ok)
+        if not ok:
+            print(f"⚠️  Manutenção '{name}' falhou: {details['error']}")
+        return {'task': name, 'started_at': started_at, 'duration_ms': elapsed * 1000,
+                'ok': ok, 'details': details}
+
+    def due(self, conn, now=None):
+        """Tarefas vencidas, pela última execução gravada no histórico"""
+        now = time.time() if now is None else now
+        last = dict(conn.execute(
+            f'SELECT task, MAX(started_at) FROM {self.history_table} GROUP BY task'
+        ).fetchall())
+        return [name for name, (interval, _) in self.tasks.items()
+                if interval > 0 and now - (last.get(name) or 0) >= interval]
+
+    # ----- thread do agendador -----
+
+    def _loop(self):
+        stop = self._stop
+        while not stop.wait(self.check_interval):
+            if not self._elect():
+                continue
+            try:
+                with self._lock:
+                    if self._conn is None:
+                        self._conn = self.connect()
+                    due = self.due(self._conn)
+                for name in due:
+                    if stop.is_set():
+                        break
+                    self.run(name)
+            except Exception as e:
+                print(f"⚠️  Falha no agendador de manutenção: {e}")
+                self._conn = None
+
+    def _elect(self):
+        """Tenta ficar com a trava de manutenção; True se este processo venceu"""
+        if self.is_leader() or fcntl is None:
+            return True
+        lock_file = open(self.lock_path, 'a+')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        lock_file.truncate(0)
+        lock_file.write(str(os.getpid()))
+        lock_file.flush()
+        self._lock_file = lock_file
+        print(f"🧹 Worker {os.getpid()} executa a manutenção do banco")
+        return True
@@ -0,0 +1,224 @@
+"""
+MÉTRICAS NO FORMATO PROMETHEUS
+Contadores, gauges e histogramas mantidos em memória por processo. Cada
+worker do gunicorn grava (numa thread em segundo plano, a cada
+flush_interval s) um retrato dos seus números em METRICS_DIR/<pid>.json,
+e quem atende o /metrics soma os arquivos de todos os workers - assim a raspagem mostra o total do serviço,
+independente de qual worker respondeu.
+"""
+
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+
+from writer import private_directory
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+
+
+def _key(name, labels):
+    return name + '|' + ','.join(f'{k}={v}' for k, v in sorted(labels.items()))
+
+
+def _split_key(key):
+    name, _, raw = key.partition('|')
+    labels = dict(item.split('=', 1) for item in raw.split(',') if item)
+    return name, labels
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        f'{k}="' + str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for k, v in labels.items()
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+class Metrics:
+    """Registro de métricas de um processo, agregável entre workers"""
+
+    def __init__(self, directory=None, flush_interval=1.0):
+        self._directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._help = {}
+        self._types = {}
+        self._buckets = {}
+        self._thread = None
+        self._thread_pid = None
+        self._reset()
+        atexit.register(self.flush)
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._dirty = False
+
+    @property
+    def directory(self):
+        # Padrão: uma pasta por processo mestre (os workers do gunicorn
+        # têm o mesmo pai) dentro de uma pasta só do usuário: num /tmp
+        # compartilhado, outro usuário poderia criá-la antes e plantar
+        # retratos ou links. Em produção prefira definir METRICS_DIR.
+        if not self._directory:
+            runtime = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+            if hasattr(os, 'getuid'):
+                parent = private_directory(os.path.join(runtime, f'api-metrics-{os.getuid()}'))
+                self._directory = private_directory(os.path.join(parent, str(os.getppid())))
+            else:
+                self._directory = os.path.join(runtime, f'api-metrics-{os.getppid()}')
+        return self._directory
+
+    def _check_fork(self):
+        # Um worker recém-criado não herda os números do processo pai
+        if self._pid != os.getpid():
+            self._reset()
+
+    def _touch(self):
+        # Chamado com self._lock; recria a thread após um fork do gunicorn
+        self._dirty = True
+        if self._thread_pid != os.getpid() or not self._thread.is_alive():
+            self._thread_pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='metrics-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            if self._dirty:
+                self.flush()
+
+    def describe(self, name, kind, help_text, buckets=None):
+        self._types[name] = kind
+        self._help[name] = help_text
+        if buckets:
+            self._buckets[name] = tuple(buckets)
+
+    def inc(self, name, labels=None, value=1.0):
+        key = _key(name, labels or {})
+        with self._lock:
+            self._check_fork()
+            self._counters[key] = self._counters.get(key, 0.0) + value
+            self._touch()
+
+    def gauge_add(self, name, labels=None, value=1.0):
+        key = _key(name, labels or {})
+        with self._lock:
+            self._check_fork()
+            self._gauges[key] = self._gauges.get(key, 0.0) + value
+            self._touch()
+
+    def observe(self, name, labels, value):
+        key = _key(name, labels or {})
+        buckets = self._buckets[name]
+        with self._lock:
+            self._check_fork()
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * len(buckets) + [0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram[i] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+            self._touch()
+
+    def snapshot(self):
+        with self._lock:
+            self._check_fork()
+            return {
+                'pid': self._pid,
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges),
+                'histograms': {k: list(v) for k, v in self._histograms.items()},
+            }
+
+    def flush(self):
+        """Grava o retrato deste processo para os outros workers lerem"""
+        self._dirty = False
+        snapshot = self.snapshot()
+        tmp_path = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{snapshot['pid']}.json")
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            print(f"⚠️  Métricas deste worker não gravadas: {e}")
+
+    def _load_snapshots(self):
+        own = self.snapshot()
+        snapshots = [own]
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            names = []
+        for name in names:
+            if not name.endswith('.json') or name == f"{own['pid']}.json":
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not _pid_alive(snapshot['pid']):
+                # Contadores de workers encerrados continuam valendo
+                # (senão o total "andaria para trás"); gauges não
+                snapshot['gauges'] = {}
+            snapshots.append(snapshot)
+        return snapshots
+
+    def render(self):
+        """Texto no formato de exposição do Prometheus (todos os workers)"""
+        counters, gauges, histograms = {}, {}, {}
+        for snapshot in self._load_snapshots():
+            for key, value in snapshot['counters'].items():
+                counters[key] = counters.get(key, 0.0) + value
+            for key, value in snapshot['gauges'].items():
+                gauges[key] = gauges.get(key, 0.0) + value
+            for key, values in snapshot['histograms'].items():
+                total = histograms.setdefault(key, [0] * len(values))
+                for i, value in enumerate(values):
+                    total[i] += value
+
+        lines = []
+        for name in sorted(self._types):
+            kind = self._types[name]
+            lines.append(f'# HELP {name} {self._help[name]}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'histogram':
+                for key in sorted(k for k in histograms if _split_key(k)[0] == name):
+                    labels = _split_key(key)[1]
+                    values = histograms[key]
+                    for bound, count in zip(self._buckets[name], values):
+                        lines.append(f'{name}_bucket{_format_labels({**labels, "le": bound})} {count}')
+                    lines.append(f'{name}_bucket{_format_labels({**labels, "le": "+Inf"})} {values[-1]}')
+                    lines.append(f'{name}_sum{_format_labels(labels)} {values[-2]}')
+                    lines.append(f'{name}_count{_format_labels(labels)} {values[-1]}')
+            else:
+                source = counters if kind == 'counter' else gauges
+                for key in sorted(k for k in source if _split_key(k)[0] == name):
+                    lines.append(f'{name}{_format_labels(_split_key(key)[1])} {source[key]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,209 @@
+"""
+TESTES - GET /properties
+Sobem a API sobre um banco temporário (create_app) e usam o test client
+do Flask. Rodar da raiz do projeto: python -m pytest -q
+"""
+
+import io
+import os
+import sys
+import tempfile
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+# Antes de importar a API: escritor sem socket compartilhado e métricas
+# numa pasta própria
+os.environ.setdefault('WRITE_QUEUE_SOCKET', 'off')
+os.environ.setdefault('METRICS_DIR', tempfile.mkdtemp(prefix='api-tests-metrics-'))
+
+import api  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def client():
+    with tempfile.TemporaryDirectory() as tmp:
+        app = api.create_app({'DATABASE': os.path.join(tmp, 'test.db'), 'WARMUP': False})
+        client = app.test_client()
+        for i in range(3):
+            response = client.post('/properties', json={
+                'title': f'Apartamento {i}',
+                'price': 300000 + i * 1000,
+                'location': 'Ponta Verde - Maceió/AL',
+                'category': 'lancamentos',
+            })
+            assert response.get_json()['success'], response.get_json()
+        yield client
+
+
+def test_limit_pagina_a_lista(client):
+    data = client.get('/properties?limit=2').get_json()
+    assert data['count'] == 2
+    assert data['next_cursor']
+
+
+@pytest.mark.parametrize('limit', ['0', '-1'])
+def test_limit_nao_positivo_retorna_400(client, limit):
+    for suffix in ('', '&stream=1'):
+        response = client.get(f'/properties?limit={limit}{suffix}')
+        assert response.status_code == 400
+        assert response.get_json()['success'] is False
+
+
+def test_snippet_escapa_o_texto_do_imovel(client):
+    response = client.post('/properties', json={
+        'title': 'Casa <img src=x onerror=alert(1)> beira-mar',
+        'price': 500000,
+        'location': 'Pajuçara - Maceió/AL',
+        'category': 'beira-mar',
+    })
+    assert response.get_json()['success']
+    properties = client.get('/properties?q=casa').get_json()['properties']
+    assert properties
+    snippet = properties[0]['snippet']
+    assert '<img' not in snippet
+    assert '&lt;img' in snippet
+    assert '<mark>Casa</mark>' in snippet
+
+
+def test_contadores_gravados_invalidam_o_etag(client):
+    response = client.get('/properties')
+    etag = response.headers['ETag']
+    property_id = response.get_json()['properties'][0]['id']
+    assert client.get('/properties', headers={'If-None-Match': etag}).status_code == 304
+
+    client.post(f'/properties/{property_id}/view')
+    api.property_counters.flush()
+
+    response = client.get('/properties', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    views = {p['id']: p['views'] for p in response.get_json()['properties']}
+    assert views[property_id] == 1
+
+
+def test_create_app_usa_o_banco_configurado(client, monkeypatch):
+    database = api.app.config['DATABASE']
+    assert api.maintenance.lock_path == database + '-maintenance.lock'
+    monkeypatch.setitem(api.app.config, 'WRITE_QUEUE_SOCKET', '')
+    socket_path = api.write_queue_socket()
+    assert socket_path == os.path.join(database + '-writer', f'{os.getpid()}.sock')
+    assert os.stat(os.path.dirname(socket_path)).st_mode & 0o777 == 0o700
+
+
+def test_if_modified_since_nao_esconde_escrita_no_mesmo_segundo(client):
+    last_modified = client.get('/stats').headers['Last-Modified']
+    response = client.post('/properties', json={
+        'title': 'Cobertura', 'price': 900000,
+        'location': 'Jatiúca - Maceió/AL', 'category': 'lancamentos',
+    })
+    assert response.get_json()['success']
+    response = client.get('/stats', headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 200
+
+
+def test_importacao_reporta_linha_com_valor_nao_escalar(client, monkeypatch):
+    monkeypatch.setitem(api.app.config, 'IMPORT_CHUNK_SIZE', 2)
+    rows = [
+        {'title': 'Flat 1', 'price': 1, 'location': 'Centro', 'category': 'x'},
+        {'title': {'a': 1}, 'price': 1, 'location': 'Centro', 'category': 'x'},
+        {'id': ['x'], 'title': 'Flat 2', 'price': 1, 'location': 'Centro', 'category': 'x'},
+        {'title': 'Flat 3', 'price': 1, 'location': ['Centro'], 'category': 'x'},
+        {'title': 'Flat 4', 'price': [1], 'location': 'Centro', 'category': 'x'},
+        {'title': 'Flat 5', 'price': 1, 'location': 'Centro', 'category': 'x'},
+    ]
+    body = '\n'.join(api.json.dumps(row) for row in rows)
+    response = client.post('/properties/import', data=body,
+                           content_type='application/x-ndjson')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert (data['imported'], data['failed']) == (2, 4)
+    assert [e['line'] for e in data['errors']] == [2, 3, 4, 5]
+
+
+def test_feed_limita_conexoes_por_cliente(client, monkeypatch):
+    monkeypatch.setattr(api.feed_connections, 'per_client', 1)
+    assert api.REQUEST_PRIORITIES['stream_changes'] == 'feed'
+    stream = client.get('/changes/stream')
+    try:
+        response = client.get('/changes')
+        assert response.status_code == 503
+        assert response.headers['Retry-After']
+        other = client.get('/changes', environ_base={'REMOTE_ADDR': '10.0.0.2'})
+        assert other.status_code == 200
+    finally:
+        stream.close()
+    assert client.get('/changes').status_code == 200
+    assert len(api.feed_connections) == 0
+
+
+def test_contadores_nao_invalidam_o_etag_de_stats(client):
+    property_id = client.get('/properties').get_json()['properties'][0]['id']
+    etag = client.get('/stats').headers['ETag']
+
+    client.post(f'/properties/{property_id}/view')
+    api.property_counters.flush()
+
+    assert client.get('/stats', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_upload_le_no_maximo_o_limite_da_imagem(client, monkeypatch):
+    monkeypatch.setitem(api.app.config, 'MAX_IMAGE_SIZE', 1024)
+    sizes = []
+
+    def read(self, size=-1):
+        sizes.append(size)
+        return self.stream.read(size)
+
+    monkeypatch.setattr(FileStorage, 'read', read, raising=False)
+    response = client.post('/images', data={
+        'file': (io.BytesIO(b'\x89PNG\r\n\x1a\n' + b'0' * 100000), 'grande.png'),
+    }, content_type='multipart/form-data')
+    assert response.status_code == 415
+    assert 1025 in sizes and -1 not in sizes  # Nunca lê o arquivo inteiro
+
+
+def test_pasta_padrao_das_metricas_e_privada(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(tmp_path))
+    directory = api.Metrics().directory
+    assert os.path.dirname(os.path.dirname(directory)) == str(tmp_path)
+    assert os.stat(directory).st_mode & 0o777 == 0o700
+    assert os.stat(os.path.dirname(directory)).st_mode & 0o777 == 0o700
+
+
+def test_lote_com_falha_nao_devolve_ids_desfeitos(client):
+    response = client.post('/batch', json={'operations': [
+        {'op': 'create', 'data': {'title': 'Loft', 'price': 1, 'location': 'Centro',
+                                  'category': 'lancamentos'}},
+        {'op': 'delete', 'id': 'nao-existe'},
+    ]})
+    assert response.status_code == 404
+    first, failed = response.get_json()['results']
+    assert first == {'index': 0, 'op': 'create', 'success': False, 'rolled_back': True}
+    assert failed['success'] is False and failed['error']
+
+
+def test_manutencao_grava_pelo_escritor(client, monkeypatch):
+    submitted = []
+    submit = api.write_queue.submit_silent
+
+    def tracked(func, *args, **kwargs):
+        submitted.append(func.__name__)
+        return submit(func, *args, **kwargs)
+
+    monkeypatch.setattr(api.maintenance, 'submit', tracked)
+    monkeypatch.setattr(api.write_queue, 'submit_silent', tracked)
+    etag = client.get('/stats').headers['ETag']
+
+    assert api.maintenance.run('analyze')['ok']
+    checkpoint = api.maintenance.run('checkpoint')
+    assert checkpoint['ok'] and checkpoint['details']['mode'] == 'truncate'
+    assert submitted == ['analyze_tables', 'record_run', 'record_run']
+    conn = api.connect_db()
+    try:
+        assert [run['task'] for run in api.maintenance.history(conn, limit=2)] == [
+            'checkpoint', 'analyze']
+    finally:
+        conn.close()
+    assert client.get('/stats', headers={'If-None-Match': etag}).status_code == 304
@@ -0,0 +1,383 @@
+"""
+FILA DE ESCRITAS COM GROUP COMMIT
+Todas as escritas passam por uma única thread escritora, dona de uma
+conexão própria. As que chegam juntas (dentro de uma janela curta) são
+gravadas numa só transação - um commit para o lote inteiro - e cada
+request recebe o resultado (ou o erro) da sua parte. A fila tem
+profundidade máxima: cheia, quem chega espera até submit_timeout por uma
+vaga e, se não abrir, recebe WriteQueueFull.
+
+Com vários workers (gunicorn -w N), informe socket_path: o primeiro worker
+que precisar escrever vira o escritor (trava o arquivo <socket>.lock) e os
+demais enviam suas escritas a ele por um socket Unix. Se ele sair, outro
+worker assume a trava na próxima escrita. Sem fcntl (Windows), cada
+processo grava com sua própria thread.
+
+As mensagens do socket são pickle, então socket e trava devem ficar numa
+pasta só do usuário (private_directory) e os dois lados conferem se o
+outro processo é do mesmo usuário (SO_PEERCRED) antes de ler qualquer coisa.
+"""
+
+import atexit
+import contextvars
+import os
+import pickle
+import queue
+import select
+import socket
+import sqlite3
+import stat
+import struct
+import threading
+import time
+from concurrent.futures import Future
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+_HEADER = struct.Struct('!I')
+
+
+class WriteQueueFull(Exception):
+    """Fila de escritas cheia: o cliente deve tentar de novo mais tarde"""
+
+
+def private_directory(path):
+    """Cria (se preciso) e retorna uma pasta acessível só ao usuário atual
+
+    Levanta PermissionError se ela já existir com outro dono, com acesso
+    para grupo/outros ou como link: outro usuário poderia criar a trava ou
+    se passar pelo escritor.
+    """
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(f'{path} precisa ser uma pasta do usuário atual com permissão 0700')
+    return path
+
+
+def _same_user(sock):
+    """True se o processo do outro lado do socket é do mesmo usuário"""
+    if not hasattr(socket, 'SO_PEERCRED'):
+        return True  # Sem SO_PEERCRED (macOS): vale a permissão da pasta
+    credentials = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+    _, uid, _ = struct.unpack('3i', credentials)
+    return uid == os.getuid()
+
+
+def _open_private(path, flags):
+    return os.open(path, flags | getattr(os, 'O_NOFOLLOW', 0), 0o600)
+
+
+def _send(sock, payload):
+    data = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _receive(sock):
+    def read(size):
+        chunks = []
+        while size:
+            chunk = sock.recv(size)
+            if not chunk:
+                raise ConnectionError('Conexão com o escritor encerrada')
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+    size, = _HEADER.unpack(read(_HEADER.size))
+    return pickle.loads(read(size))
+
+
+class WriteQueue:
+    """Executa func(conn, ...) na thread escritora, em lotes transacionais
+
+    Cada escrita roda num SAVEPOINT próprio: se ela falhar, só ela é
+    desfeita e as demais do lote seguem. O resultado só é entregue depois
+    do COMMIT; se o commit falhar, todas as escritas do lote recebem o erro.
+    Escritas locais rodam no contexto (contextvars) de quem as enviou e
+    entram nas métricas da rota de origem. As enviadas por outro worker
+    atravessam o socket: func precisa ser uma função de módulo e
+    argumentos, resultado e exceções precisam ser serializáveis (pickle).
+    socket_path pode ser uma função: é chamada no primeiro uso de cada
+    processo (depois do fork), para calcular o caminho já no worker.
+    """
+
+    def __init__(self, connect, max_depth=256, max_batch=64, batch_window=0.002,
+                 submit_timeout=5.0, before_commit=None, on_batch=None, socket_path=None,
+                 after_commit=None):
+        self.connect = connect
+        self.max_depth = max_depth
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.submit_timeout = submit_timeout
+        self.before_commit = before_commit  # before_commit(conn), uma vez por lote
+        self.on_batch = on_batch            # on_batch(tamanho, [espera de cada escrita])
+        self.after_commit = after_commit    # after_commit(), no processo que enviou a escrita
+        self._socket_path = socket_path if fcntl is not None else None
+        self._socket_pid = None
+        self._resolved_socket = None
+
+        self._lock = threading.Lock()
+        self._pid = None
+        self._jobs = None
+        self._thread = None
+        self._conn = None
+        self._leader_pid = None
+        self._lock_file = None
+        self._local = threading.local()
+        self.batches = 0
+        self.committed = 0
+        self.rejected = 0
+        self.last_error = None
+
+        atexit.register(self.close)
+
+    def submit(self, func, *args, **kwargs):
+        """Envia a escrita e espera o commit; retorna o que func retornar
+
+        Exceções levantadas por func são relançadas aqui. Levanta
+        WriteQueueFull se a fila continuar cheia por submit_timeout s.
+        """
+        return self._submit_and_notify(func, args, kwargs, True)
+
+    def submit_silent(self, func, *args, **kwargs):
+        """Como submit, mas esta escrita sozinha não chama before_commit
+
+        Para escritas que não devem contar como mudança do lote (ex.:
+        contadores de views/leads, que não alteram a versão do catálogo).
+        Se o lote tiver outras escritas, before_commit roda por causa delas.
+        """
+        return self._submit_and_notify(func, args, kwargs, False)
+
+    def _submit_and_notify(self, func, args, kwargs, hooked):
+        result = self._submit(func, args, kwargs, hooked)
+        if self.after_commit:
+            self.after_commit()
+        return result
+
+    def _submit(self, func, args, kwargs, hooked):
+        if self.socket_path is None or self.is_leader():
+            return self._submit_local(contextvars.copy_context(), func, args, kwargs, hooked)
+
+        deadline = time.monotonic() + self.submit_timeout
+        while True:
+            try:
+                return self._submit_remote(func, args, kwargs, hooked)
+            except (FileNotFoundError, ConnectionRefusedError):
+                # Ninguém escutando: tenta virar o escritor
+                if self._elect():
+                    return self._submit_local(contextvars.copy_context(), func, args, kwargs,
+                                              hooked)
+                if time.monotonic() >= deadline:
+                    raise WriteQueueFull('Escritor indisponível, tente novamente')
+                time.sleep(0.01)
+
+    @property
+    def socket_path(self):
+        if self._socket_pid != os.getpid():
+            path = self._socket_path
+            if callable(path):
+                try:
+                    path = path()
+                except OSError as e:
+                    print(f"⚠️  Socket do escritor indisponível, cada processo grava sozinho: {e}")
+                    path = None
+            self._resolved_socket, self._socket_pid = path, os.getpid()
+        return self._resolved_socket
+
+    def is_leader(self):
+        return self._leader_pid == os.getpid()
+
+    def depth(self):
+        jobs = self._jobs
+        return jobs.qsize() if jobs is not None and self._pid == os.getpid() else 0
+
+    def close(self, timeout=10.0):
+        """Espera as escritas já enfileiradas (chamado no encerramento)"""
+        jobs = self._jobs
+        if jobs is None or self._pid != os.getpid():
+            return
+        deadline = time.monotonic() + timeout
+        while jobs.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    # ----- escritor (thread local) -----
+
+    def _submit_local(self, context, func, args, kwargs, hooked):
+        future = Future()
+        job = (context, func, args, kwargs, future, time.monotonic(), hooked)
+        try:
+            self._ensure_thread().put(job, timeout=self.submit_timeout)
+        except queue.Full:
+            self.rejected += 1
+            raise WriteQueueFull('Fila de escritas cheia, tente novamente')
+        return future.result()
+
+    def _ensure_thread(self):
+        # Recria fila, conexão e thread após um fork do gunicorn
+        with self._lock:
+            if self._pid != os.getpid() or not self._thread.is_alive():
+                if self._pid != os.getpid():
+                    self._jobs = queue.Queue(maxsize=self.max_depth)
+                    self._conn = None
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, args=(self._jobs,),
+                                                name='write-queue', daemon=True)
+                self._thread.start()
+            return self._jobs
+
+    def _run(self, jobs):
+        while True:
+            batch = [jobs.get()]
+            # Janela curta para juntar as escritas que chegam em seguida
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(jobs.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception as e:
+                print(f"⚠️  Falha inesperada na fila de escritas: {e}")
+                if self._conn is not None and self._conn.in_transaction:
+                    self._conn.rollback()
+                for job in batch:
+                    if not job[4].done():
+                        job[4].set_exception(e)
+            finally:
+                for _ in batch:
+                    jobs.task_done()
+
+    def _write(self, batch):
+        if self._conn is None:
+            self._conn = self.connect()
+        conn = self._conn
+        outcomes = []
+        try:
+            # IMMEDIATE: pega o lock de escrita já no início, sem o risco de
+            # "database is locked" ao promover uma leitura a escrita
+            conn.execute('BEGIN IMMEDIATE')
+            hooked = False
+            for context, func, args, kwargs, future, _, job_hooked in batch:
+                conn.execute('SAVEPOINT write_job')
+                try:
+                    result = context.run(func, conn, *args, **kwargs)
+                except Exception as e:
+                    conn.execute('ROLLBACK TO write_job')
+                    conn.execute('RELEASE write_job')
+                    outcomes.append((future, None, e))
+                else:
+                    conn.execute('RELEASE write_job')
+                    outcomes.append((future, result, None))
+                    hooked = hooked or job_hooked
+            if self.before_commit and hooked:
+                self.before_commit(conn)
+            conn.commit()
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.rollback()
+            self.last_error = str(e)
+            for job in batch:
+                job[4].set_exception(e)
+            return
+
+        self.batches += 1
+        self.committed += sum(1 for _, _, error in outcomes if error is None)
+        self.last_error = None
+        if self.on_batch:
+            now = time.monotonic()
+            self.on_batch(len(batch), [now - job[5] for job in batch])
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    # ----- vários workers: um escritor eleito, os demais enviam pelo socket -----
+
+    def _elect(self):
+        """Tenta ficar com a trava de escritor; True se este processo venceu"""
+        with self._lock:
+            if self.is_leader():
+                return True
+            lock_file = open(self.socket_path + '.lock', 'a', opener=_open_private)
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+            # A trava garante que nenhum outro escritor usa o socket antigo
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            server.bind(self.socket_path)
+            os.chmod(self.socket_path, 0o600)
+            server.listen(128)
+            self._lock_file = lock_file
+            self._leader_pid = os.getpid()
+        threading.Thread(target=self._serve, args=(server,), name='write-queue-server',
+                         daemon=True).start()
+        print(f"✍️  Worker {os.getpid()} é o escritor da fila ({self.socket_path})")
+        return True
+
+    def _serve(self, server):
+        while True:
+            client, _ = server.accept()
+            threading.Thread(target=self._serve_client, args=(client,),
+                             name='write-queue-client', daemon=True).start()
+
+    def _serve_client(self, client):
+        with client:
+            if not _same_user(client):
+                return
+            while True:
+                try:
+                    func, args, kwargs, hooked = _receive(client)
+                except (ConnectionError, OSError, EOFError):
+                    return
+                try:
+                    reply = (True, self._submit_local(contextvars.Context(), func, args, kwargs,
+                                                      hooked))
+                except Exception as e:
+                    reply = (False, e)
+                try:
+                    _send(client, reply)
+                except (pickle.PicklingError, TypeError, AttributeError):
+                    _send(client, (False, RuntimeError(str(reply[1]))))
+                except OSError:
+                    return
+
+    def _submit_remote(self, func, args, kwargs, hooked):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None and select.select([sock], [], [], 0)[0]:
+            # Socket "legível" entre escritas = escritor encerrou a conexão
+            sock.close()
+            sock = None
+        if sock is None or getattr(self._local, 'pid', None) != os.getpid():
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.socket_path)
+                if not _same_user(sock):
+                    raise ConnectionRefusedError('Socket do escritor pertence a outro usuário')
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock, self._local.pid = sock, os.getpid()
+        try:
+            _send(sock, (func, args, kwargs, hooked))
+            ok, value = _receive(sock)
+        except OSError:
+            # O escritor saiu no meio da escrita: não dá para saber se ela
+            # foi gravada, então não repete
+            self._local.sock = None
+            sock.close()
+            raise ConnectionError('Conexão com o escritor perdida; confira antes de repetir')
+        if not ok:
+            raise value
+        return value